@@ -11,11 +11,20 @@ import random
 
 
 
+# parquet 이 있으면 parquet, 없으면 csv 로 불러오기
+def load_frame(data_dir, name):
+    path = os.path.join(data_dir, name)
+    if os.path.exists(path + '.parquet'):
+        return pd.read_parquet(path + '.parquet')
+    return pd.read_csv(path + '.csv')
+
+
 # 데이터 로드 함수(train, test) from directory
 def get_data(args):
-    train_data = pd.read_csv(os.path.join(args.data_dir, f'FE{args.fe_num}', 'train_data.csv'))    # train + test(not -1)
-    test_data = pd.read_csv(os.path.join(args.data_dir, f'FE{args.fe_num}', 'test_data.csv'))    # test
-    sub_test_data = pd.read_csv(os.path.join(args.data_dir, f'FE{args.fe_num}', 'sub_test_data.csv'))    # sub test
+    data_dir = os.path.join(args.data_dir, f'FE{args.fe_num}')
+    train_data = load_frame(data_dir, 'train_data')    # train + test(not -1)
+    test_data = load_frame(data_dir, 'test_data')    # test
+    sub_test_data = load_frame(data_dir, 'sub_test_data')    # sub test
     # train_data = train_data.drop(['interaction_c'], axis=1)
     # test_data = test_data.drop(['interaction_c'], axis=1)
     # train_data 중복 제거
@@ -33,7 +42,7 @@ def get_data(args):
 # 데이터 스플릿 함수
 def data_split(train_data, args):
     if args.valid_exp:
-        test_data = pd.read_csv(os.path.join(args.data_dir, f'FE{args.fe_num}', 'test_data.csv'))    # 
+        test_data = load_frame(os.path.join(args.data_dir, f'FE{args.fe_num}'), 'test_data')    # 
         
         # drop unused coloumns
         elim_col = ['user_correct_answer', 
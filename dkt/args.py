@@ -22,7 +22,7 @@ def parse_args():
         default=['05', '19'],
         nargs='+',
         type=str,
-        help='feature engineering data file path (ex) 00'
+        help='feature engineering data file path (ex) 00, 컬럼 이름이나 fe_20 처럼 함수 이름도 가능 (feature_registry.json)'
     )
     
     parser.add_argument(
@@ -57,6 +57,10 @@ def parse_args():
         '--new', default=1
     )
     parser.add_argument("--max_seq_len", default=64, type=int, help="max sequence length" )
+    parser.add_argument("--stride", default=0, type=int, help="0 보다 크면 학습 때 유저 시퀀스 전체를 stride 간격 max_seq_len window 들로 잘라 사용" )
+    parser.add_argument("--bucket", default=0, type=int, help="1 이면 학습/검증 배치를 길이가 비슷한 유저끼리 묶고 배치 최대 길이까지만 패딩" )
+    parser.add_argument("--mmap", default=0, type=int, help="1 이면 유저 시퀀스를 data_dir/.seq_cache 에 .npy 로 저장하고 memmap 으로 읽음 (worker 들이 메모리 공유), 입력 파일/컬럼이 바뀌면 새 폴더를 만들고 예전 폴더는 남으므로 .seq_cache 는 직접 지워야 함" )
+    parser.add_argument("--tensorize", default=0, type=int, help="1 이면 데이터셋 전체를 패딩된 tensor 로 미리 만들고 worker 없이 배치를 index 로 잘라 사용" )
     parser.add_argument("--num_workers", default=8, type=int, help="number of workers")
     parser.add_argument('--leak', default=0, type=int)
     # parser.add_argument('--emb_separate', default=0, type=int, help='embedding 을 각 피처의 nunique 값으로 세분화함.')
@@ -0,0 +1,213 @@
+import time
+import argparse
+
+import numpy as np
+import pandas as pd
+import torch
+import torch.nn as nn
+
+from src.modules import MultiHeadAttention, TriuMask, packed_rnn, push_window
+
+
+def timeit(func, repeat, rounds=5):
+    # 워밍업 후 repeat 번씩 rounds 번 재서 가장 빠른 round 의 평균 (ms), 다른 프로세스 영향을 줄이려고 min 사용
+    for _ in range(3):
+        func()
+    times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        times.append((time.perf_counter() - start) / repeat * 1000)
+    return min(times)
+
+
+# ------------------------------------------------------------------ attention
+def reference_attention(heads, q_x, kv_x, attn_mask, scale, softmax_dim):
+    # 예전 모델들의 계산: head 마다 Q/K/V Linear, matmul, div, mask 더하기, softmax 를 따로
+    Zs = []
+    for Q_layer, K_layer, V_layer in heads:
+        Q, K, V = Q_layer(q_x), K_layer(kv_x), V_layer(kv_x)
+        score = torch.div(torch.matmul(Q, K.transpose(-2, -1)), scale ** -1)
+        if attn_mask is not None:
+            score = score + attn_mask
+        score = torch.softmax(score, dim=softmax_dim)
+        Zs.append(torch.matmul(score, V))
+    return torch.cat(Zs, dim=-1)
+
+
+def load_heads(attention_layer:MultiHeadAttention, heads):
+    # head 별 Q/K/V Linear 가중치를 합친 가중치로 복사 (순서: Q 의 head 0, 1, ..., K ..., V ...)
+    weights = [[head[i].weight.t() for head in heads] for i in range(3)]
+    biases = [[head[i].bias.view(1, -1) for head in heads] for i in range(3)] if heads[0][0].bias is not None else None
+    with torch.no_grad():
+        if hasattr(attention_layer, 'qkv_weight'):
+            attention_layer.qkv_weight.copy_(torch.stack(sum(weights, [])))
+            if biases is not None:
+                attention_layer.qkv_bias.copy_(torch.stack(sum(biases, [])))
+        else:
+            attention_layer.q_weight.copy_(torch.stack(weights[0]))
+            attention_layer.kv_weight.copy_(torch.stack(weights[1] + weights[2]))
+            if biases is not None:
+                attention_layer.q_bias.copy_(torch.stack(biases[0]))
+                attention_layer.kv_bias.copy_(torch.stack(biases[1] + biases[2]))
+
+
+def attention_cases(B, S, hidden_dim, attention_dim, n_heads):
+    head_dim = (attention_dim // 3) * 2
+    pad_mask = (torch.rand(B, S) > 0.3).long()
+    sakt_mask = TriuMask(B, S - 1)(B, S - 1)
+    causal_mask = TriuMask(S - 1, S - 1, diagonal=0)(S - 1, S - 1).t() # SAKT (Lq, Lk)
+    return [
+        # name, q_dim, kv_dim (None: self-attention), head_dim, n_heads, bias, scale, query_softmax, 입력 모양, mask
+        ('SelfAttention', hidden_dim, None, attention_dim, 1, False, None, True, (B, S), None),
+        ('SelfAttention4/5', hidden_dim, None, attention_dim, 2, False, None, True, (B, S), None),
+        ('SelfAttention6', hidden_dim, None, attention_dim, 2, False, None, False, (B, S),
+            ((pad_mask * 1_000_000) - 1_000_000).unsqueeze(1).float()),
+        ('SAKT', attention_dim, attention_dim + hidden_dim, head_dim, n_heads, True, None, False, (B, S - 1),
+            causal_mask),
+        ('SAKT2', attention_dim, attention_dim, attention_dim // 2, 2, False, None, False, (B, S - 1),
+            sakt_mask.unsqueeze(1)),
+        ('new_dkt SAKT', attention_dim, attention_dim, head_dim, n_heads, True, None, False, (S - 1, B),
+            sakt_mask.transpose(0, 1).unsqueeze(-1)),
+        ('new_dkt LastQuery', attention_dim, None, head_dim, n_heads, True, attention_dim ** -0.5, False, (B, S),
+            ((pad_mask.unsqueeze(-1) * 10000) - 10000) + torch.where(torch.arange(B) == B - 1, 1., -10000.).view(B, 1, 1)),
+    ]
+
+
+def bench_attention(args):
+    torch.manual_seed(0)
+    print(f'{"model":<20}{"max diff":>12}{"old ms":>10}{"new ms":>10}{"speedup":>10}')
+    for name, q_dim, kv_dim, head_dim, n_heads, bias, scale, query_softmax, shape, attn_mask in \
+            attention_cases(args.batch_size, args.seq_len, args.hidden_dim, args.attention_dim, args.n_heads):
+        heads = [
+            [nn.Linear(q_dim, head_dim, bias=bias)] + [nn.Linear(kv_dim or q_dim, head_dim, bias=bias) for _ in range(2)]
+            for _ in range(n_heads)
+        ]
+        attention_layer = MultiHeadAttention(
+            q_dim, head_dim, n_heads, kv_dim=kv_dim, bias=bias, scale=scale, query_softmax=query_softmax
+        )
+        load_heads(attention_layer, heads)
+
+        q_x = torch.randn(*shape, q_dim, requires_grad=True)
+        kv_x = q_x if kv_dim is None else torch.randn(*shape, kv_dim, requires_grad=True)
+        scale = head_dim ** -0.5 if scale is None else scale
+        softmax_dim = 1 if query_softmax else -1
+
+        old = lambda: reference_attention(heads, q_x, kv_x, attn_mask, scale, softmax_dim)
+        new = lambda: attention_layer(q_x, None if kv_dim is None else kv_x, attn_mask=attn_mask)
+        diff = (old() - new()).abs().max().item()
+
+        if args.backward:
+            t_old = timeit(lambda: old().sum().backward(), args.repeat)
+            t_new = timeit(lambda: new().sum().backward(), args.repeat)
+        else:
+            with torch.no_grad():
+                t_old, t_new = timeit(old, args.repeat), timeit(new, args.repeat)
+        print(f'{name:<20}{diff:>12.2e}{t_old:>10.3f}{t_new:>10.3f}{t_old / t_new:>9.2f}x')
+
+
+# ------------------------------------------------------------------ rnn
+def sample_lengths(args, n):
+    '''
+    배치에 들어갈 유저 시퀀스 길이 (max_seq_len 에서 자름)
+    --lengths_from 에 원본 데이터 (csv / parquet) 를 주면 실제 유저별 풀이 수에서, 없으면 lognormal (중앙값 --median_len) 에서 뽑음
+    '''
+    rng = np.random.default_rng(0)
+    if args.lengths_from:
+        read = pd.read_parquet if args.lengths_from.endswith('.parquet') else pd.read_csv
+        counts = read(args.lengths_from, columns=['userID']) if read is pd.read_parquet else read(args.lengths_from, usecols=['userID'])
+        lengths = rng.choice(counts['userID'].value_counts().values, n)
+    else:
+        lengths = np.ceil(rng.lognormal(np.log(args.median_len), 1.0, n))
+    return torch.as_tensor(np.clip(lengths, 1, args.seq_len), dtype=torch.int64)
+
+
+def bench_rnn(args):
+    torch.manual_seed(0)
+    B, S, F = args.batch_size, args.seq_len, args.hidden_dim
+    n_batches = 10
+    lengths = sample_lengths(args, B * n_batches).view(n_batches, B)
+    masks = (torch.arange(S).view(1, 1, S) >= (S - lengths).unsqueeze(-1)).long().to(args.device) # 왼쪽 패딩
+    xs = torch.randn(n_batches, B, S, F, device=args.device)
+    print(f'lengths: mean {lengths.float().mean():.1f}, median {lengths.median().item()}, '
+          f'full length (= {S}) {(lengths == S).float().mean() * 100:.0f}%, padding {(1 - masks.float().mean()) * 100:.0f}%')
+
+    print(f'{"model":<8}{"max diff":>12}{"padded seq/s":>15}{"packed seq/s":>15}{"speedup":>10}')
+    for name, cls in [('LSTM', nn.LSTM), ('GRU', nn.GRU)]:
+        rnn = cls(F, F, args.n_layers, batch_first=True).to(args.device)
+
+        # 패딩 없이 유저 하나씩 돌린 결과와 비교 (실제 step 위치만)
+        hs, _ = packed_rnn(rnn, xs[0], masks[0])
+        diff = max(
+            (hs[i, S - L:] - rnn(xs[0, i:i + 1, S - L:])[0][0]).abs().max().item()
+            for i, L in enumerate(lengths[0].tolist()[:16])
+        )
+
+        def run(func):
+            def epoch():
+                for x, mask in zip(xs, masks):
+                    out = func(x, mask)
+                    if args.backward:
+                        out.sum().backward()
+                if xs.is_cuda:
+                    torch.cuda.synchronize()
+            return epoch
+
+        padded = run(lambda x, mask: rnn(x)[0])
+        packed = run(lambda x, mask: packed_rnn(rnn, x, mask)[0])
+        with torch.set_grad_enabled(bool(args.backward)):
+            t_padded, t_packed = timeit(padded, max(args.repeat // n_batches, 1)), timeit(packed, max(args.repeat // n_batches, 1))
+        n = B * n_batches * 1000 # ms -> s
+        print(f'{name:<8}{diff:>12.2e}{n / t_padded:>15.0f}{n / t_packed:>15.0f}{t_padded / t_packed:>9.2f}x')
+
+
+# ------------------------------------------------------------------ kv cache
+def bench_kv_cache(args):
+    # 새 풀이 하나 점수: window 전체 forward 의 마지막 줄 (L x L) vs cache 된 key / value 에 새 query 한 줄 (L)
+    torch.manual_seed(0)
+    B, F, D, H = args.batch_size, args.hidden_dim, args.attention_dim, args.n_heads
+    print(f'{"window":<8}{"max diff":>12}{"full ms":>10}{"cache ms":>10}{"speedup":>10}')
+    for L in [16, 32, 64, 128, 256]:
+        attention_layer = MultiHeadAttention(F, D, H).eval()
+        x = torch.randn(B, L, F)
+        attn_mask = torch.zeros(B, 1, L)
+        # 마지막 풀이 전까지의 cache (맨 앞 칸은 push_window 로 밀려날 자리)
+        k, v = attention_layer.project_kv(x[:, :-1])
+        k, v = [torch.cat([t.new_zeros(H, B, 1, D), t], dim=2) for t in (k, v)]
+
+        def cached():
+            new_k, new_v = attention_layer.project_kv(x[:, -1:])
+            return attention_layer.attend(x[:, -1:], push_window(k, new_k), push_window(v, new_v), attn_mask=attn_mask)[:, 0]
+
+        full = lambda: attention_layer(x, attn_mask=attn_mask)[:, -1]
+        with torch.no_grad():
+            diff = (full() - cached()).abs().max().item()
+            t_full, t_cached = timeit(full, args.repeat), timeit(cached, args.repeat)
+        print(f'{L:<8}{diff:>12.2e}{t_full:>10.3f}{t_cached:>10.3f}{t_full / t_cached:>9.2f}x')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('target', choices=['attention', 'rnn', 'kv_cache'])
+    parser.add_argument('--batch_size', default=64, type=int)
+    parser.add_argument('--seq_len', default=64, type=int)
+    parser.add_argument('--hidden_dim', default=64, type=int)
+    parser.add_argument('--attention_dim', default=64, type=int)
+    parser.add_argument('--n_heads', default=2, type=int)
+    parser.add_argument('--n_layers', default=1, type=int)
+    parser.add_argument('--lengths_from', default='', type=str, help='rnn: 유저별 시퀀스 길이를 뽑을 원본 데이터 (csv / parquet, userID 컬럼)')
+    parser.add_argument('--median_len', default=40, type=int, help='rnn: --lengths_from 이 없을 때 lognormal 길이 분포의 중앙값')
+    parser.add_argument('--repeat', default=50, type=int)
+    parser.add_argument('--backward', default=0, type=int, help='1 이면 forward + backward 시간')
+    parser.add_argument('--threads', default=1, type=int)
+    parser.add_argument('--device', default='cpu', type=str, help='rnn: cpu 또는 cuda (cuDNN 은 pack 된 시퀀스를 길이만큼만 계산)')
+    args = parser.parse_args()
+
+    torch.set_num_threads(args.threads)
+    if args.target == 'attention':
+        bench_attention(args)
+    elif args.target == 'rnn':
+        bench_rnn(args)
+    elif args.target == 'kv_cache':
+        bench_kv_cache(args)
@@ -2,7 +2,7 @@ import os
 import datetime
 
 from args import parse_args
-from src.dataloader import DKTDataset, load_data
+from src.dataloader import DKTDataset, WindowDataset, TensorizedDataset, load_data, batch_loader
 from src.utils import setSeeds
 from src.model import LSTM, GRU, SelfAttention, SelfAttention2, SelfAttention3, SelfAttention4, SelfAttention5, SelfAttention6, SAKT, SAKT2
 from src.lightning_model import DKTLightning
@@ -32,29 +32,43 @@ def main(args):
 
     train_data, _, test_data = load_data(args)
 
-    train_data, valid_data = train_test_split(train_data, test_size=0.3)
+    # 유저 번호만 나누고 시퀀스 데이터는 공유
+    train_index, valid_index = train_test_split(np.arange(len(train_data)), test_size=0.3)
+    train_data, valid_data = train_data.subset(train_index), train_data.subset(valid_index)
 
-    train_dataset = DKTDataset(train_data, args)
+    # stride 를 주면 학습 유저의 전체 풀이 기록을 window 로 나눠 학습 (검증/추론은 마지막 window)
+    train_dataset = WindowDataset(train_data, args) if args.stride > 0 else DKTDataset(train_data, args)
     valid_dataset = DKTDataset(valid_data, args)
     test_dataset = DKTDataset(test_data, args)
 
-    train_loader = DataLoader(
+    num_workers = args.num_workers
+    if args.tensorize:
+        # 전체를 패딩된 tensor 로 한 번만 만들고, 배치는 worker 없이 index 로 자름
+        pin_memory = args.device == 'cuda' and torch.cuda.is_available()
+        train_dataset, valid_dataset, test_dataset = [
+            TensorizedDataset(dataset, pin_memory) for dataset in (train_dataset, valid_dataset, test_dataset)
+        ]
+        num_workers = 0
+
+    train_loader = batch_loader(
         train_dataset,
-        num_workers=args.num_workers,
+        args.batch_size,
         shuffle=True,
-        batch_size=args.batch_size,
+        num_workers=num_workers,
+        bucket=args.bucket,
     )
-    valid_loader = DataLoader(
+    valid_loader = batch_loader(
         valid_dataset,
-        num_workers=args.num_workers,
+        args.batch_size,
         shuffle=False,
-        batch_size=args.batch_size,
+        num_workers=num_workers,
+        bucket=args.bucket,
     )
-    test_loader = DataLoader(
+    test_loader = batch_loader(
         test_dataset,
-        num_workers=args.num_workers,
+        args.batch_size,
         shuffle=False,
-        batch_size=args.batch_size,
+        num_workers=num_workers,
     )
 
     if args.model == 'LSTM':
@@ -132,8 +146,8 @@ def main(args):
     #     if i != 4:
     #         continue
     #     # train_data_fold ready
-    #     train_data_fold = train_data.iloc[train_index]
-    #     valid_data_fold = train_data.iloc[valid_index]
+    #     train_data_fold = train_data.subset(train_index)
+    #     valid_data_fold = train_data.subset(valid_index)
 
     #     # train_data_fold dataset ready
     #     train_dataset = DKTDataset(train_data_fold, args)
@@ -1,193 +1,237 @@
 import os
+import sys
 from datetime import datetime
 
 import numpy as np
 import pandas as pd
+import torch
 
-from torch.utils.data import Dataset
+from torch.utils.data import Dataset, DataLoader, BatchSampler, RandomSampler, SequentialSampler
 from sklearn.preprocessing import OrdinalEncoder
 from typing import Tuple
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from fe.vocab import CategoryVocab
+from fe.registry import FeatureRegistry, KEY_COLS
+from fe.sequences import PackedSequences, LengthBucketSampler, gather_padded, cache_key, mmap_splits
+
 
 def load_data(args):
-    if args.new:
-        train_df = pd.read_csv(os.path.join(args.data_dir, 'le_EDA_new_train_data.csv'))
-        num = train_df['userID'].nunique()
-        print(f'this train is new!{num}')
+    registry_name = 'new_feature_registry.json' if args.new else 'feature_registry.json'
+    if os.path.exists(os.path.join(args.data_dir, registry_name)):
+        # 피쳐 레지스트리가 있으면 --fe 로 고른 컬럼만 parquet 에서 읽음
+        registry = FeatureRegistry.load(args.data_dir, registry_name)
+        cols = registry.resolve(args.fe)
+        sources = [os.path.join(args.data_dir, registry_name), registry.path('train'), registry.path('test')]
+        read_frames = lambda: (registry.read('train', cols), registry.read('test', cols))
     else:
-        train_df = pd.read_csv(os.path.join(args.data_dir, 'le_EDA_train_data.csv'))
-        num = train_df['userID'].nunique()
-        print(f'this train is basic!{num}')
-    test_df = pd.read_csv(os.path.join(args.data_dir, 'le_EDA_test_data.csv'))
-    
-    if args.merge:
-        train_df = pd.concat([train_df, test_df[test_df['answerCode'] != -1]])
-    
-    feature_config = {}
+        # 예전 전처리 결과 (le_EDA_*.csv + feature_config.txt), 고른 컬럼만 파싱
+        feature_config = {}
 
-    if args.new:
-        f = open(os.path.join(args.data_dir, 'new_feature_config.txt'), 'r')
-    else:
-        f = open(os.path.join(args.data_dir, 'feature_config.txt'), 'r')
+        config_path = os.path.join(args.data_dir, 'new_feature_config.txt' if args.new else 'feature_config.txt')
+        f = open(config_path, 'r')
 
-    for line in f:
-        num, name = line.split(',')
-        feature_config[num] = name.strip()
-    f.close()
+        for line in f:
+            num, name = line.split(',')
+            feature_config[num] = name.strip()
+        f.close()
 
-    if args.fe[0] == 'all':
-        cols = list(feature_config.values())
-    else:
-        cols = [feature_config[num] for num in args.fe]
+        if args.fe[0] == 'all':
+            cols = list(feature_config.values())
+        else:
+            cols = [feature_config[num] for num in args.fe]
 
-    train_df = train_df[['userID', 'answerCode'] + cols]
-    test_df = test_df[['userID', 'answerCode'] + cols]
+        train_path = os.path.join(args.data_dir, 'le_EDA_new_train_data.csv' if args.new else 'le_EDA_train_data.csv')
+        test_path = os.path.join(args.data_dir, 'le_EDA_test_data.csv')
+        sources = [config_path, train_path, test_path]
+        read_frames = lambda: (pd.read_csv(train_path, usecols=KEY_COLS + cols), pd.read_csv(test_path, usecols=KEY_COLS + cols))
 
-    cate_cols = [col_name for col_name in train_df.columns if col_name[-2:] == '_c']
+    cate_cols = [col_name for col_name in cols if col_name[-2:] == '_c']
     args.cate_num = len(cate_cols)
-    args.cont_num = len(train_df.columns) - args.cate_num - 2 # userID, answerCode
-
-    args.offsets = []
-    offset = 0
-    for cate_col in cate_cols:
-        train_df[cate_col] += offset
-        test_df[cate_col] += offset
-        offset = train_df[cate_col].max()
-        args.offsets.append(offset + 1)
-
-    offset = int(offset + 1) # 도합
-    args.offset = offset + 1 # 시계열 패딩 
+    args.cont_num = len(cols) - args.cate_num
 
-    valid_df = test_df[test_df['answerCode'] != -1]
-    print(train_df.columns)
+    # 전처리에서 저장한 카테고리 사전(vocab.json)으로, 고른 컬럼들만 offset 을 이어 붙임
+    # 0 은 시계열 패딩, 1 은 결측/unknown
+    vocab_path = os.path.join(args.data_dir, 'new_vocab.json' if args.new else 'vocab.json')
+    vocab = CategoryVocab.load(vocab_path).subset(cate_cols)
 
-    train_data = train_df.groupby('userID').apply(
-            lambda df: tuple([df[col] for col in df.columns if col != 'userID'])
-        )
+    args.offsets = [vocab.offsets[col] + len(vocab.categories[col]) - 1 for col in cate_cols] # 컬럼별 마지막 코드
+    args.offset = vocab.size # 임베딩 테이블 크기
 
-    valid_data = valid_df.groupby('userID').apply(
-            lambda df: tuple([df[col] for col in df.columns if col != 'userID'])
-        )
+    def build():
+        train_df, test_df = read_frames()
 
-    test_data = test_df.groupby('userID').apply(
-            lambda df: tuple([df[col] for col in df.columns if col != 'userID'])
-        )
-    return train_data, valid_data, test_data
+        num = train_df['userID'].nunique()
+        if args.new:
+            print(f'this train is new!{num}')
+        else:
+            print(f'this train is basic!{num}')
+        
+        if args.merge:
+            train_df = pd.concat([train_df, test_df[test_df['answerCode'] != -1]])
+
+        train_df = vocab.stack(train_df[KEY_COLS + cols])
+        test_df = vocab.stack(test_df[KEY_COLS + cols])
+
+        valid_df = test_df[test_df['answerCode'] != -1]
+        print(train_df.columns)
+
+        return {
+            'train': PackedSequences.from_frame(train_df),
+            'valid': PackedSequences.from_frame(valid_df),
+            'test': PackedSequences.from_frame(test_df),
+        }
+
+    if getattr(args, 'mmap', 0):
+        # 시퀀스를 .npy 로 저장해두고 memmap 으로 읽음 (입력 파일, 컬럼이 같으면 재사용)
+        # DataLoader worker 수와 상관없이 데이터는 page cache 에 한 벌만 올라감
+        key = cache_key(sources + [vocab_path], cols, bool(args.merge))
+        data = mmap_splits(os.path.join(args.data_dir, '.seq_cache', key), build)
+    else:
+        data = build()
+    return data['train'], data['valid'], data['test']
 
 
 class DKTDataset(Dataset):
-    def __init__(self, data, args):
-        # 현재 데이터는 userID 가 인덱스인데, 
+    '''
+    유저 i 의 마지막 max_seq_len 개 풀이 (cate, cont, mask, answer), 시계열이 부족하면 앞을 0 으로 패딩
+    index 가 리스트/배열이면 배치 전체를 한 번에 gather + 패딩해서 돌려줌 (batch_loader 와 같이 사용)
+    args.bucket 이면 배치는 max_seq_len 이 아니라 배치 안 최대 길이까지만 패딩 (최소 2, SAKT 가 [:, :-1] 을 씀)
+    '''
+    def __init__(self, data:PackedSequences, args):
+        # data 의 i 번째 유저가 index i (userID 는 피처로 안 들어가고 인덱스 역할만 함)
         self.args = args
         self.data = data
-        self.id2idx = {v:k for k, v in enumerate(self.data.index.unique())} 
-        self.data.index = self.data.index.map(self.id2idx) 
-        # userID 를 인덱싱함. 어차피 유저 아이디는 피처로 안들어가긴 함.
-        # 판다스 인덱싱 접근 편의성 위해서.
-        # 문제 자체가 어떤 유저가 들어왔을 때 임으로 userID는 일종의 인덱스역할임.
-
+        # 컬럼 구분과 (행 수, 컬럼 수) 배열은 한 번만 만듦 (train/valid 처럼 같은 data 의 subset 끼리 공유)
+        self.cate_names = [col for col in data.columns if col[-2:] == '_c' and col != 'answerCode']
+        self.cont_names = [col for col in data.columns if col[-2:] != '_c' and col != 'answerCode']
+        self._load_matrices()
+
+    def _load_matrices(self):
+        self.cate = self.data.matrix(self.cate_names, np.int64) # 시계열 부족(패딩)이 0, unknown 은 1 (vocab 에서 이미 반영)
+        self.cont = self.data.matrix(self.cont_names, np.float32)
+        self.answer = self.data.matrix(['answerCode'], np.float32)[:, 0]
+
+    def __getstate__(self):
+        # DataLoader worker (spawn / forkserver) 로 넘길 때 배열은 빼고 data 만 (memmap 이면 경로만 넘어가고 worker 에서 다시 엶)
+        return {k: v for k, v in self.__dict__.items() if k not in ('cate', 'cont', 'answer')}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._load_matrices()
         
     def __getitem__(self, index):
-        seq_len = len(self.data[index][0])
-        cate_cols = [col.values.copy() + 1 for col in self.data[index] if col.name[-2:] == '_c' and \
-            col.name != 'answerCode'] # 시계열 패딩 용 + 1. 이제 unknown 은 1 이 됨. 시계열 부족이 0
-            
-        cont_cols = [col.values.copy() for col in self.data[index] if col.name[-2:] != '_c' and \
-            col.name != 'answerCode'] # cont 는 시계열 패딩을 어떻게..? # 마지막 최근 시계열 값으로 앞 시계열 채우겠습니다. 일단은.
-        # print(cate_cols)
-        answer = [col.values.copy() for col in self.data[index] if col.name == 'answerCode'][0].astype(np.float32)
-        
-        if seq_len >= self.args.max_seq_len:
-            if cate_cols:
-                for i, col in enumerate(cate_cols):
-                    cate_cols[i] = col[-self.args.max_seq_len:]
-            if cont_cols: # cont feature 가 없을 수도 있음.
-                for i, col in enumerate(cont_cols):
-                    cont_cols[i] = col[-self.args.max_seq_len:]
-            mask = np.ones(self.args.max_seq_len, dtype=np.int64) # Byte Tensor 를 씀
-            answer = answer[-self.args.max_seq_len:]
-        else:
-            if cate_cols:
-                for i in range(len(cate_cols)):
-                    new_col = np.zeros(self.args.max_seq_len, np.int64)
-                    new_col[-seq_len:] = cate_cols[i]
-                    cate_cols[i] = new_col
-            if cont_cols:
-                for i in range(len(cont_cols)):
-                    new_col = np.zeros(self.args.max_seq_len, dtype=np.float32)
-                    # new_col[:seq_len] = cont_cols[i][0] # cont 의 시계열이 부족하면 가장 앞 데이터로 채움.
-                    new_col[-seq_len:] = cont_cols[i]
-                    cont_cols[i] = new_col
-            mask = np.zeros(self.args.max_seq_len, dtype=np.int64)
-            mask[-seq_len:] = 1
-            new_answer = np.zeros(self.args.max_seq_len, dtype=np.float32)
-            new_answer[-seq_len:] = answer
-            answer = new_answer
-
-        cate_cols = np.array(cate_cols).T.astype(np.int64)
-        cont_cols = np.array(cont_cols).T.astype(np.float32)
-
+        is_batch = np.ndim(index) > 0
+        index = np.atleast_1d(index)
+        pos, mask = self.positions(index)
+        if is_batch and getattr(self.args, 'bucket', 0):
+            seq_len = max(int(mask.sum(1).max()), 2)
+            pos, mask = pos[:, -seq_len:], mask[:, -seq_len:]
+
+        cate_cols = gather_padded(self.cate, pos, mask)
+        cont_cols = gather_padded(self.cont, pos, mask)
+        answer = gather_padded(self.answer, pos, mask)
+        # 컬럼이 없으면 예전 np.array([]).T 와 같이 (배치,) 0 길이
+        if not self.cate_names:
+            cate_cols = np.zeros((len(index), 0), dtype=np.int64)
+        if not self.cont_names:
+            cont_cols = np.zeros((len(index), 0), dtype=np.float32)
+        mask = mask.astype(np.int64)
+
+        if not is_batch:
+            return cate_cols[0], cont_cols[0], mask[0], answer[0]
         # return cate_cols, cont_cols, mask, target
         return cate_cols, cont_cols, mask, answer
 
+    def positions(self, index):
+        # 샘플 index 들의 (행 위치, mask), 유저마다 마지막 max_seq_len 개
+        return self.data.last_window(index, self.args.max_seq_len)
+
+    def sample_lengths(self):
+        # 샘플별 패딩 전 길이 (LengthBucketSampler 용)
+        return np.minimum(self.data.lengths(), self.args.max_seq_len)
+
     def __len__(self):
         return len(self.data)
+
+
+class WindowDataset(DKTDataset):
+    '''
+    유저 시퀀스의 마지막 max_seq_len 개만 쓰지 않고, stride 간격으로 자른 모든 window 를 샘플로 사용 (학습용)
+    window 는 (유저 번호, 끝 위치) 로만 들고 있고 데이터는 복사하지 않음, len() 은 전체 window 수
+    '''
+    def __init__(self, data:PackedSequences, args):
+        super().__init__(data, args)
+        self.window_users, self.window_ends = data.sliding_windows(args.max_seq_len, args.stride)
+
+    def positions(self, index):
+        return self.data.window(self.window_users[index], self.window_ends[index], self.args.max_seq_len)
+
+    def sample_lengths(self):
+        return np.minimum(self.window_ends - self.data.starts[self.window_users], self.args.max_seq_len)
+
+    def __len__(self):
+        return len(self.window_users)
     
 
-class SAKTDataset(Dataset):
-    def __init__(self, data, args):
-        # 현재 데이터는 userID 가 인덱스인데, 
-        self.args = args
-        self.data = data
-        self.id2idx = {v:k for k, v in enumerate(self.data.index.unique())} 
-        self.data.index = self.data.index.map(self.id2idx) 
-        # userID 를 인덱싱함. 어차피 유저 아이디는 피처로 안들어가긴 함.
-        # 판다스 인덱싱 접근 편의성 위해서.
-        # 문제 자체가 어떤 유저가 들어왔을 때 임으로 userID는 일종의 인덱스역할임.
+class SAKTDataset(DKTDataset):
+    # DKTDataset 과 같은 입력
+    pass
+
+
+class TensorizedDataset(Dataset):
+    '''
+    dataset 의 모든 샘플을 한 번만 gather + 패딩해서 (샘플 수, max_seq_len, ...) tensor 로 들고 있고, 배치 index 로 index_select 만 함
+    매 epoch __getitem__ / worker 없이 배치를 만듦 (batch_loader(..., num_workers=0) 와 같이 사용)
+    pin_memory 면 tensor 와 배치 결과를 pinned memory 에 둬서 GPU 로 바로 non_blocking 복사 가능
+    '''
+    def __init__(self, dataset:DKTDataset, pin_memory=False):
+        self.args = dataset.args
+        self.dataset = dataset
+        self.pin_memory = pin_memory
+        # args.bucket 이어도 전체는 max_seq_len 까지 (배치마다 다시 자름)
+        tensors = [torch.as_tensor(x) for x in dataset[np.arange(len(dataset))]]
+        self.tensors = [x.pin_memory() for x in tensors] if pin_memory else tensors
+        self.lengths = self.tensors[2].sum(1)
 
-        
     def __getitem__(self, index):
-        seq_len = len(self.data[index][0])
-        cate_cols = [col.values.copy() + 1 for col in self.data[index] if col.name[-2:] == '_c' and \
-            col.name != 'answerCode'] # 시계열 패딩 용 + 1. 이제 unknown 은 1 이 됨. 시계열 부족이 0
-            
-        cont_cols = [col.values.copy() for col in self.data[index] if col.name[-2:] != '_c' and \
-            col.name != 'answerCode'] # cont 는 시계열 패딩을 어떻게..? # 마지막 최근 시계열 값으로 앞 시계열 채우겠습니다. 일단은.
-        # print(cate_cols)
-        answer = [col.values.copy() for col in self.data[index] if col.name == 'answerCode'][0].astype(np.float32)
-        
-        if seq_len >= self.args.max_seq_len:
-            if cate_cols:
-                for i, col in enumerate(cate_cols):
-                    cate_cols[i] = col[-self.args.max_seq_len:]
-            if cont_cols: # cont feature 가 없을 수도 있음.
-                for i, col in enumerate(cont_cols):
-                    cont_cols[i] = col[-self.args.max_seq_len:]
-            mask = np.ones(self.args.max_seq_len, dtype=np.int64) # Byte Tensor 를 씀
-            answer = answer[-self.args.max_seq_len:]
-        else:
-            if cate_cols:
-                for i in range(len(cate_cols)):
-                    new_col = np.zeros(self.args.max_seq_len, np.int64)
-                    new_col[-seq_len:] = cate_cols[i]
-                    cate_cols[i] = new_col
-            if cont_cols:
-                for i in range(len(cont_cols)):
-                    new_col = np.zeros(self.args.max_seq_len, dtype=np.float32)
-                    # new_col[:seq_len] = cont_cols[i][0] # cont 의 시계열이 부족하면 가장 앞 데이터로 채움.
-                    new_col[-seq_len:] = cont_cols[i]
-                    cont_cols[i] = new_col
-            mask = np.zeros(self.args.max_seq_len, dtype=np.int64)
-            mask[-seq_len:] = 1
-            new_answer = np.zeros(self.args.max_seq_len, dtype=np.float32)
-            new_answer[-seq_len:] = answer
-            answer = new_answer
-
-        cate_cols = np.array(cate_cols).T.astype(np.int64)
-        cont_cols = np.array(cont_cols).T.astype(np.float32)
+        is_batch = np.ndim(index) > 0
+        index = torch.as_tensor(np.atleast_1d(index))
+        tensors = self.tensors
+        if is_batch and getattr(self.args, 'bucket', 0):
+            seq_len = max(int(self.lengths[index].max()), 2)
+            tensors = [x[:, -seq_len:] for x in tensors]
 
-        # return cate_cols, cont_cols, mask, target
-        return cate_cols, cont_cols, mask, answer
+        batch = []
+        for x in tensors:
+            out = torch.empty((len(index),) + x.shape[1:], dtype=x.dtype, pin_memory=self.pin_memory)
+            batch.append(torch.index_select(x, 0, index, out=out))
+
+        if not is_batch:
+            return tuple(x[0] for x in batch)
+        return tuple(batch)
+
+    def sample_lengths(self):
+        return self.dataset.sample_lengths()
 
     def __len__(self):
-        return len(self.data)
\ No newline at end of file
+        return len(self.dataset)
+
+
+def batch_loader(dataset, batch_size, shuffle=False, num_workers=0, bucket=False):
+    '''
+    DataLoader(dataset, batch_size, shuffle) 와 같은 순서의 배치를, 유저 하나씩 모아 collate 하지 않고
+    dataset[배치 index 리스트] 로 한 번에 만든다.
+    bucket 이면 길이가 비슷한 샘플끼리 배치 (순서가 바뀌므로 추론용 loader 에는 쓰지 않음)
+    '''
+    if bucket:
+        batch_sampler = LengthBucketSampler(dataset.sample_lengths(), batch_size, shuffle)
+    else:
+        sampler = RandomSampler(dataset) if shuffle else SequentialSampler(dataset)
+        batch_sampler = BatchSampler(sampler, batch_size, drop_last=False)
+    return DataLoader(
+        dataset,
+        batch_size=None, # 배치는 dataset 이 만듦 (numpy -> tensor 변환만)
+        sampler=batch_sampler,
+        num_workers=num_workers,
+    )
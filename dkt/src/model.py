@@ -3,7 +3,7 @@ import numpy as np
 import torch
 import torch.nn as nn
 
-from .modules import EntireEmbedding, FinalConnecting, PositionalEncoding
+from .modules import EntireEmbedding, FinalConnecting, PositionalEncoding, MultiHeadAttention, TriuMask, packed_rnn, push_window
 
 from transformers.models.bert.modeling_bert import (
         BertConfig,
@@ -30,10 +30,9 @@ class LSTM(nn.Module):
     def forward(self, cate_x: torch.Tensor, cont_x: torch.Tensor, mask: torch.Tensor, targets):
         # embedding
         comb_proj_x = self.embedding_layer(cate_x, cont_x)
-        comb_proj_x = comb_proj_x.transpose(0, 1)
         
-        # lstm forward
-        hs, hn = self.lstm_layer(comb_proj_x)
+        # lstm forward (패딩 step 은 건너뛰고, hn 은 유저별 마지막 실제 step 의 hidden)
+        hs, hn = packed_rnn(self.lstm_layer, comb_proj_x, mask)
 
         # batch_first = True 이기 때문에.
         # hs = hs.contiguous().view(hs.size(0), -1, self.args.hidden_dim)
@@ -43,6 +42,26 @@ class LSTM(nn.Module):
         if out.dim() == 2:
             return out
         return out.squeeze()
+
+    def initial_state(self, batch_size):
+        # 지난 풀이가 없는 유저의 (h, c), packed_rnn 과 같이 0
+        h = self.final_layer.final_layer[0].weight.new_zeros(self.args.n_layers, batch_size, self.args.hidden_dim)
+        return h, h.clone()
+
+    def step(self, cate_x: torch.Tensor, cont_x: torch.Tensor, state=None, targets=None):
+        '''
+        유저마다 새 풀이 하나씩만 진행 (src.online.OnlineScorer 용)
+        cate_x : (B, cate_num), cont_x : (B, cont_num), state : 이전 (h, c), 각각 (n_layers, B, hidden_dim), None 이면 0
+        :return: (새 풀이의 logit (B,), 새 (h, c))
+        '''
+        x = self.embedding_layer(cate_x.unsqueeze(1), cont_x.unsqueeze(1))
+        _, state = self.lstm_layer(x.transpose(0, 1), state) # batch_first = False
+        return self.final_layer(state[0][-1]).squeeze(-1), state
+
+    def encode(self, cate_x: torch.Tensor, cont_x: torch.Tensor, mask: torch.Tensor, targets=None):
+        # 지난 풀이 window (왼쪽 패딩) 를 한 번에 돌린 마지막 (h, c), OnlineScorer 의 시작 state
+        _, state = packed_rnn(self.lstm_layer, self.embedding_layer(cate_x, cont_x), mask)
+        return state
     
 
 class GRU(nn.Module):
@@ -64,8 +83,8 @@ class GRU(nn.Module):
         # embedding
         comb_proj_x = self.embedding_layer(cate_x, cont_x)
 
-        # gru forward
-        hs, _ = self.gru_layer(comb_proj_x)
+        # gru forward (패딩 step 은 건너뜀)
+        hs, _ = packed_rnn(self.gru_layer, comb_proj_x, mask)
 
         # batch_first = True 이기 때문에.
         hs = hs.contiguous().view(hs.size(0), -1, self.args.hidden_dim)
@@ -74,6 +93,25 @@ class GRU(nn.Module):
         out = self.final_layer(hs)
         return out.squeeze(-1)
 
+    def initial_state(self, batch_size):
+        # 지난 풀이가 없는 유저의 h, packed_rnn 과 같이 0
+        return self.final_layer.final_layer[0].weight.new_zeros(self.args.n_layers, batch_size, self.args.hidden_dim)
+
+    def step(self, cate_x: torch.Tensor, cont_x: torch.Tensor, state=None, targets=None):
+        '''
+        유저마다 새 풀이 하나씩만 진행 (src.online.OnlineScorer 용)
+        cate_x : (B, cate_num), cont_x : (B, cont_num), state : 이전 h (n_layers, B, hidden_dim), None 이면 0
+        :return: (새 풀이의 logit (B,), 새 h)
+        '''
+        x = self.embedding_layer(cate_x.unsqueeze(1), cont_x.unsqueeze(1))
+        _, state = self.gru_layer(x, state)
+        return self.final_layer(state[-1]).squeeze(-1), state
+
+    def encode(self, cate_x: torch.Tensor, cont_x: torch.Tensor, mask: torch.Tensor, targets=None):
+        # 지난 풀이 window (왼쪽 패딩) 를 한 번에 돌린 마지막 h, OnlineScorer 의 시작 state
+        _, state = packed_rnn(self.gru_layer, self.embedding_layer(cate_x, cont_x), mask)
+        return state
+
 
 class SelfAttention(nn.Module):
     def __init__(self, args):
@@ -82,10 +120,7 @@ class SelfAttention(nn.Module):
         # entire embedding
         self.embedding_layer = EntireEmbedding(args)
 
-        self.Q_layer = nn.Linear(args.hidden_dim, args.attention_dim, bias=False)
-        self.K_layer = nn.Linear(args.hidden_dim, args.attention_dim, bias=False)
-        self.V_layer = nn.Linear(args.hidden_dim, args.attention_dim, bias=False)
-        self.softmax_layer = nn.Softmax(dim=1)
+        self.attention_layer = MultiHeadAttention(args.hidden_dim, args.attention_dim, 1, query_softmax=True) # Q, K, V + softmax(dim=1)
 
         self.position_layer = PositionalEncoding(args.max_seq_len, args.hidden_dim, 10000)
 
@@ -96,18 +131,11 @@ class SelfAttention(nn.Module):
     def forward(self, cate_x: torch.Tensor, cont_x: torch.Tensor, mask: torch.Tensor, targets):
         # embedding
         comb_proj_x = self.embedding_layer(cate_x, cont_x)
-        positions = self.position_layer(comb_proj_x).to(comb_proj_x.get_device())
+        positions = self.position_layer(comb_proj_x).to(comb_proj_x.device)
 
         comb_proj_x = comb_proj_x + positions
         # B, S, F 상태
-        Q = self.Q_layer(comb_proj_x)
-        K = self.K_layer(comb_proj_x)
-        V = self.V_layer(comb_proj_x)
-
-        scores = torch.bmm(Q, K.transpose(1, 2))
-        scores = torch.div(scores, K.size(2) ** 0.5)
-        scores = self.softmax_layer(scores)
-        z = torch.bmm(scores, V)
+        z = self.attention_layer(comb_proj_x)
 
         out = self.final_layer(z)
         return out.squeeze(-1)
@@ -121,10 +149,7 @@ class SelfAttention2(nn.Module):
         # entire embedding
         self.embedding_layer = EntireEmbedding(args)
 
-        self.Q_layer = nn.Linear(args.hidden_dim, args.attention_dim, bias=False)
-        self.K_layer = nn.Linear(args.hidden_dim, args.attention_dim, bias=False)
-        self.V_layer = nn.Linear(args.hidden_dim, args.attention_dim, bias=False)
-        self.softmax_layer = nn.Softmax(dim=1)
+        self.attention_layer = MultiHeadAttention(args.hidden_dim, args.attention_dim, 1, query_softmax=True) # Q, K, V + softmax(dim=1)
 
         # gru 
         self.gru_layer = \
@@ -140,14 +165,7 @@ class SelfAttention2(nn.Module):
 
         comb_proj_x = comb_proj_x
         # B, S, F 상태
-        Q = self.Q_layer(comb_proj_x)
-        K = self.K_layer(comb_proj_x)
-        V = self.V_layer(comb_proj_x)
-
-        scores = torch.bmm(Q, K.transpose(1, 2))
-        scores = torch.div(scores, K.size(2) ** 0.5)
-        scores = self.softmax_layer(scores)
-        z = torch.bmm(scores, V)
+        z = self.attention_layer(comb_proj_x)
 
         hs, hn = self.gru_layer(z)
         hs = hs.contiguous().view(hs.size(0), -1, self.args.attention_dim)
@@ -163,10 +181,7 @@ class SelfAttention3(nn.Module):
         # entire embedding
         self.embedding_layer = EntireEmbedding(args)
 
-        self.Q_layer = nn.Linear(args.hidden_dim, args.attention_dim, bias=False)
-        self.K_layer = nn.Linear(args.hidden_dim, args.attention_dim, bias=False)
-        self.V_layer = nn.Linear(args.hidden_dim, args.attention_dim, bias=False)
-        self.softmax_layer = nn.Softmax(dim=1)
+        self.attention_layer = MultiHeadAttention(args.hidden_dim, args.attention_dim, 1, query_softmax=True) # Q, K, V + softmax(dim=1)
 
         self.position_layer = PositionalEncoding(args.max_seq_len, args.hidden_dim, 10000)
 
@@ -181,20 +196,13 @@ class SelfAttention3(nn.Module):
     def forward(self, cate_x: torch.Tensor, cont_x: torch.Tensor, mask: torch.Tensor, targets):
         # embedding
         comb_proj_x = self.embedding_layer(cate_x, cont_x)
-        positions = self.position_layer(comb_proj_x).to(comb_proj_x.get_device())
+        positions = self.position_layer(comb_proj_x).to(comb_proj_x.device)
 
         comb_proj_x = comb_proj_x + positions
 
         comb_proj_x = comb_proj_x
         # B, S, F 상태
-        Q = self.Q_layer(comb_proj_x)
-        K = self.K_layer(comb_proj_x)
-        V = self.V_layer(comb_proj_x)
-
-        scores = torch.bmm(Q, K.transpose(1, 2))
-        scores = torch.div(scores, K.size(2) ** 0.5)
-        scores = self.softmax_layer(scores)
-        z = torch.bmm(scores, V)
+        z = self.attention_layer(comb_proj_x)
 
         hs, hn = self.gru_layer(z)
         hs = hs.contiguous().view(hs.size(0), -1, self.args.attention_dim)
@@ -210,17 +218,8 @@ class SelfAttention4(nn.Module):
         # entire embedding
         self.embedding_layer = EntireEmbedding(args)
 
-        # head 1
-        self.Q1_layer = nn.Linear(args.hidden_dim, args.attention_dim, bias=False)
-        self.K1_layer = nn.Linear(args.hidden_dim, args.attention_dim, bias=False)
-        self.V1_layer = nn.Linear(args.hidden_dim, args.attention_dim, bias=False)
-        self.softmax_layer1 = nn.Softmax(dim=1)
-
-        # head 2
-        self.Q2_layer = nn.Linear(args.hidden_dim, args.attention_dim, bias=False)
-        self.K2_layer = nn.Linear(args.hidden_dim, args.attention_dim, bias=False)
-        self.V2_layer = nn.Linear(args.hidden_dim, args.attention_dim, bias=False)
-        self.softmax_layer2 = nn.Softmax(dim=1)
+        # head 2 개, softmax(dim=1)
+        self.attention_layer = MultiHeadAttention(args.hidden_dim, args.attention_dim, 2, query_softmax=True)
 
         self.W0_layer = nn.Linear(args.attention_dim * 2, args.hidden_dim, bias=False)
 
@@ -234,29 +233,11 @@ class SelfAttention4(nn.Module):
     def forward(self, cate_x: torch.Tensor, cont_x: torch.Tensor, mask: torch.Tensor, targets):
         # embedding
         comb_proj_x = self.embedding_layer(cate_x, cont_x)
-        positions = self.position_layer(comb_proj_x).to(comb_proj_x.get_device())
+        positions = self.position_layer(comb_proj_x).to(comb_proj_x.device)
 
         comb_proj_x = comb_proj_x + positions
         # B, S, F 상태
-        Q1 = self.Q1_layer(comb_proj_x)
-        K1 = self.K1_layer(comb_proj_x)
-        V1 = self.V1_layer(comb_proj_x)
-
-        scores1 = torch.bmm(Q1, K1.transpose(1, 2))
-        scores1 = torch.div(scores1, K1.size(2) ** 0.5)
-        scores1 = self.softmax_layer1(scores1)
-        z1 = torch.bmm(scores1, V1)
-
-        Q2 = self.Q2_layer(comb_proj_x)
-        K2 = self.K2_layer(comb_proj_x)
-        V2 = self.V2_layer(comb_proj_x)
-
-        scores2 = torch.bmm(Q2, K2.transpose(1, 2))
-        scores2 = torch.div(scores2, K2.size(2) ** 0.5)
-        scores2 = self.softmax_layer2(scores2)
-        z2 = torch.bmm(scores2, V2)
-
-        zs = torch.cat([z1, z2], dim=-1)
+        zs = self.attention_layer(comb_proj_x)
 
         z = self.W0_layer(zs)
 
@@ -271,17 +252,8 @@ class SelfAttention5(nn.Module):
         # entire embedding
         self.embedding_layer = EntireEmbedding(args)
 
-        # head 1
-        self.Q1_layer = nn.Linear(args.hidden_dim, args.attention_dim, bias=False)
-        self.K1_layer = nn.Linear(args.hidden_dim, args.attention_dim, bias=False)
-        self.V1_layer = nn.Linear(args.hidden_dim, args.attention_dim, bias=False)
-        self.softmax_layer1 = nn.Softmax(dim=1)
-
-        # head 2
-        self.Q2_layer = nn.Linear(args.hidden_dim, args.attention_dim, bias=False)
-        self.K2_layer = nn.Linear(args.hidden_dim, args.attention_dim, bias=False)
-        self.V2_layer = nn.Linear(args.hidden_dim, args.attention_dim, bias=False)
-        self.softmax_layer2 = nn.Softmax(dim=1)
+        # head 2 개, softmax(dim=1)
+        self.attention_layer = MultiHeadAttention(args.hidden_dim, args.attention_dim, 2, query_softmax=True)
 
         self.W0_layer = nn.Linear(args.attention_dim * 2, args.hidden_dim, bias=False)
         self.Res_layer = nn.LayerNorm(args.hidden_dim)
@@ -296,29 +268,11 @@ class SelfAttention5(nn.Module):
     def forward(self, cate_x: torch.Tensor, cont_x: torch.Tensor, mask: torch.Tensor, targets):
         # embedding
         comb_proj_x = self.embedding_layer(cate_x, cont_x)
-        positions = self.position_layer(comb_proj_x).to(comb_proj_x.get_device())
+        positions = self.position_layer(comb_proj_x).to(comb_proj_x.device)
 
         comb_proj_x = comb_proj_x + positions
         # B, S, F 상태
-        Q1 = self.Q1_layer(comb_proj_x)
-        K1 = self.K1_layer(comb_proj_x)
-        V1 = self.V1_layer(comb_proj_x)
-
-        scores1 = torch.bmm(Q1, K1.transpose(1, 2))
-        scores1 = torch.div(scores1, K1.size(2) ** 0.5)
-        scores1 = self.softmax_layer1(scores1)
-        z1 = torch.bmm(scores1, V1)
-
-        Q2 = self.Q2_layer(comb_proj_x)
-        K2 = self.K2_layer(comb_proj_x)
-        V2 = self.V2_layer(comb_proj_x)
-
-        scores2 = torch.bmm(Q2, K2.transpose(1, 2))
-        scores2 = torch.div(scores2, K2.size(2) ** 0.5)
-        scores2 = self.softmax_layer2(scores2)
-        z2 = torch.bmm(scores2, V2)
-
-        zs = torch.cat([z1, z2], dim=-1)
+        zs = self.attention_layer(comb_proj_x)
 
         z = self.W0_layer(zs)
         z = self.Res_layer(comb_proj_x + z)
@@ -333,17 +287,8 @@ class SelfAttention6(nn.Module):
         # entire embedding
         self.embedding_layer = EntireEmbedding(args)
 
-        # head 1
-        self.Q1_layer = nn.Linear(args.hidden_dim, args.attention_dim, bias=False)
-        self.K1_layer = nn.Linear(args.hidden_dim, args.attention_dim, bias=False)
-        self.V1_layer = nn.Linear(args.hidden_dim, args.attention_dim, bias=False)
-        self.softmax_layer1 = nn.Softmax(dim=-1)
-
-        # head 2
-        self.Q2_layer = nn.Linear(args.hidden_dim, args.attention_dim, bias=False)
-        self.K2_layer = nn.Linear(args.hidden_dim, args.attention_dim, bias=False)
-        self.V2_layer = nn.Linear(args.hidden_dim, args.attention_dim, bias=False)
-        self.softmax_layer2 = nn.Softmax(dim=-1)
+        # head 2 개
+        self.attention_layer = MultiHeadAttention(args.hidden_dim, args.attention_dim, 2)
 
         self.W0_layer = nn.Linear(args.attention_dim * 2, args.hidden_dim, bias=False)
         self.res_layer1 = nn.LayerNorm(args.hidden_dim)
@@ -366,33 +311,13 @@ class SelfAttention6(nn.Module):
     def forward(self, cate_x: torch.Tensor, cont_x: torch.Tensor, mask: torch.Tensor, targets):
         # embedding
         comb_proj_x = self.embedding_layer(cate_x, cont_x)
-        positions = self.position_layer(comb_proj_x).to(comb_proj_x.get_device())
+        positions = self.position_layer(comb_proj_x).to(comb_proj_x.device)
 
         mask2 = (mask * 1_000_000) - 1_000_000
 
         comb_proj_x = comb_proj_x + positions
         # B, S, F 상태
-        Q1 = self.Q1_layer(comb_proj_x)
-        K1 = self.K1_layer(comb_proj_x)
-        V1 = self.V1_layer(comb_proj_x)
-
-        scores1 = torch.bmm(Q1, K1.transpose(1, 2))
-        scores1 = torch.div(scores1, K1.size(2) ** 0.5)
-        scores1 += mask2.unsqueeze(-1).view(mask2.size(0), 1, -1)
-        scores1 = self.softmax_layer1(scores1)
-        z1 = torch.bmm(scores1, V1)
-
-        Q2 = self.Q2_layer(comb_proj_x)
-        K2 = self.K2_layer(comb_proj_x)
-        V2 = self.V2_layer(comb_proj_x)
-
-        scores2 = torch.bmm(Q2, K2.transpose(1, 2))
-        scores2 = torch.div(scores2, K2.size(2) ** 0.5)
-        scores2 += mask2.unsqueeze(-1).view(mask2.size(0), 1, -1)
-        scores2 = self.softmax_layer2(scores2)
-        z2 = torch.bmm(scores2, V2)
-
-        zs = torch.cat([z1, z2], dim=-1)
+        zs = self.attention_layer(comb_proj_x, attn_mask=mask2.unsqueeze(1).to(comb_proj_x.dtype)) # 패딩 key 제외
 
         z = self.W0_layer(zs)
         z = self.res_layer1(comb_proj_x + z)
@@ -403,6 +328,52 @@ class SelfAttention6(nn.Module):
         out = self.final_layer(z3)
         return out.squeeze(-1)
 
+    # ---------------------------------------------------------------- KV cache (src.online.OnlineScorer 용)
+    # state : (k, v, key_mask) - 최근 max_seq_len 개 풀이의 위치를 빼고 projection 한 key / value (n_heads, B, max_seq_len, attention_dim)
+    #         와 패딩 key mask (1, B, max_seq_len), 학습 window 처럼 왼쪽 패딩이고 새 풀이는 오른쪽 끝에 들어감
+    # 위치 인코딩은 window 끝 기준이라 풀이마다 위치가 한 칸씩 밀리므로 cache 에는 위치 없이 넣고, 쓸 때 위치 projection 을 더함
+    def initial_state(self, batch_size):
+        weight = self.attention_layer.qkv_weight
+        kv = weight.new_zeros(self.attention_layer.n_heads, batch_size, self.args.max_seq_len, self.args.attention_dim)
+        return kv, kv.clone(), weight.new_full((1, batch_size, self.args.max_seq_len), -1_000_000)
+
+    def _attend_last(self, x, state):
+        # 마지막 위치의 새 풀이 x (B, 1, hidden_dim) 하나만 forward 의 마지막 줄과 같이 계산
+        k, v, key_mask = state
+        encoding = self.position_layer.encoding.to(x.device)
+        pos_k, pos_v = self.attention_layer.project_kv(encoding[-k.size(2):].unsqueeze(0), bias=False)
+
+        x = x + encoding[-1]
+        zs = self.attention_layer.attend(x, k + pos_k, v + pos_v, attn_mask=key_mask[0].unsqueeze(1))
+
+        z = self.W0_layer(zs)
+        z = self.res_layer1(x + z)
+
+        fz = self.ffnn_layer(z)
+        z3 = self.res_layer2(z + fz)
+        return self.final_layer(z3[:, 0]).squeeze(-1)
+
+    def step(self, cate_x: torch.Tensor, cont_x: torch.Tensor, state=None, targets=None):
+        '''
+        유저마다 새 풀이 하나를 cache 에 넣고 (가장 오래된 풀이는 버림) 새 풀이의 query 한 줄만 계산, 풀이 하나당 O(max_seq_len)
+        cate_x : (B, cate_num), cont_x : (B, cont_num)
+        :return: (새 풀이의 logit (B,), 새 state)
+        '''
+        k, v, key_mask = self.initial_state(cate_x.size(0)) if state is None else state
+        x = self.embedding_layer(cate_x.unsqueeze(1), cont_x.unsqueeze(1))
+        new_k, new_v = self.attention_layer.project_kv(x)
+        state = (push_window(k, new_k), push_window(v, new_v), push_window(key_mask, key_mask.new_zeros(1, x.size(0), 1)))
+        return self._attend_last(x, state), state
+
+    def encode(self, cate_x: torch.Tensor, cont_x: torch.Tensor, mask: torch.Tensor, targets=None):
+        # 지난 풀이 window (왼쪽 패딩, 길이 max_seq_len 이하) 의 projection 을 한 번에 cache 로
+        k, v, key_mask = self.initial_state(cate_x.size(0))
+        new_k, new_v = self.attention_layer.project_kv(self.embedding_layer(cate_x, cont_x))
+        S = min(cate_x.size(1), k.size(2))
+        k[:, :, -S:], v[:, :, -S:] = new_k[:, :, -S:], new_v[:, :, -S:]
+        key_mask[0, :, -S:] = (mask[:, -S:] * 1_000_000) - 1_000_000
+        return k, v, key_mask
+
 
 class SAKT(nn.Module):
     def __init__(self, args):
@@ -416,18 +387,12 @@ class SAKT(nn.Module):
 
         self.Poistion_layer = nn.Embedding(args.max_seq_len - 1, args.attention_dim)
 
-        self.attentions = []
-        for i in range(args.n_heads):
-            self.attentions.append(
-                nn.ModuleDict(
-                    {
-                        f'Q{i}': nn.Linear(args.attention_dim, (args.attention_dim // 3) * 2, bias=True),
-                        f'K{i}': nn.Linear(args.attention_dim + args.hidden_dim, (args.attention_dim // 3) * 2, bias=True),
-                        f'V{i}': nn.Linear(args.attention_dim + args.hidden_dim, (args.attention_dim // 3) * 2, bias=True),
-                    }
-                )
-            )
-        self.attentions = nn.ModuleList(self.attentions)
+        # Q 는 M_hat, K / V 는 E_hat (+ 문제 정보) 에서
+        self.attention_layer = MultiHeadAttention(
+            args.attention_dim, (args.attention_dim // 3) * 2, args.n_heads, kv_dim=args.attention_dim + args.hidden_dim, bias=True
+        )
+        # causal mask : i 번째 풀이의 query 는 j <= i 번째 key 만 (예전에는 배치 행마다 앞쪽 key 를 가려서 배치 안 위치에 따라 값이 달랐음)
+        self.mask_layer = TriuMask(args.max_seq_len - 1, args.max_seq_len - 1, diagonal=0)
 
 
         self.W0_layer = nn.Linear(((args.attention_dim // 3) * 2) * args.n_heads, args.attention_dim, bias=False)
@@ -448,9 +413,9 @@ class SAKT(nn.Module):
 
     
     def forward(self, cate_x: torch.Tensor, cont_x: torch.Tensor, mask: torch.Tensor, targets):
-        new_mask = torch.ones((cate_x.size(0), self.args.max_seq_len - 1)).to(cate_x.get_device())
-        new_mask = (torch.triu(new_mask, diagonal=-1) * 100000) - 100000
-        new_mask.requires_grad = False
+        # max_seq_len 기준 mask 의 오른쪽 아래만 사용 (--bucket 이면 배치 길이가 max_seq_len 보다 짧음), 전치해서 (Lq, Lk) 의 아래 삼각
+        seq_len = cate_x.size(1)
+        new_mask = self.mask_layer(self.args.max_seq_len - 1, self.args.max_seq_len - 1)[-(seq_len - 1):, -(seq_len - 1):].t()
 
         assessments = cate_x[:, :-1, 0]
         interactions = targets.clone()[:, :-1]
@@ -458,29 +423,14 @@ class SAKT(nn.Module):
         y = (assessments + interactions * (self.n_assessments)).long()
         next_assessments = cate_x[:, 1:, 0]
 
-        positions = self.Poistion_layer(torch.arange(self.args.max_seq_len - 1).unsqueeze(0).to(cate_x.get_device()))
+        positions = self.Poistion_layer(torch.arange(self.args.max_seq_len - seq_len, self.args.max_seq_len - 1).unsqueeze(0).to(cate_x.device))
         
         M_hat = self.M_layer(y) + positions
         E_hat = self.E_layer(next_assessments) # 여기에 문제정보 더 추가해서 콘캣하는게 좋겠다.
         assessment_infos = self.comb_layer(cate_x, cont_x)
         E_hat = torch.cat([E_hat, assessment_infos[:, 1:, :]], dim=-1)
 
-        E_for_K = E_hat
-        E_for_V = E_hat
-
-        Zs = []
-        for i in range(self.args.n_heads):
-            Q = self.attentions[i][f'Q{i}'](M_hat)
-            K = self.attentions[i][f'K{i}'](E_for_K)
-            V = self.attentions[i][f'V{i}'](E_for_V)
-            score = torch.bmm(Q, K.transpose(-2, -1))
-            score = torch.div(score, Q.size(-1) ** 0.5)
-            score = score + new_mask.unsqueeze(-1).view(new_mask.size(0), 1, -1)
-            score = torch.softmax(score, dim=-1)
-            Z = torch.bmm(score, V)
-            Zs.append(Z)
-
-        Zs = torch.cat(Zs, dim=-1)
+        Zs = self.attention_layer(M_hat, E_hat, attn_mask=new_mask) # K, V 모두 E_hat
 
         z = self.W0_layer(Zs)
 
@@ -520,6 +470,55 @@ class SAKT(nn.Module):
         # out = self.final_layer(z3)
         return out.squeeze(-1)
 
+    # ---------------------------------------------------------------- KV cache (src.online.OnlineScorer 용)
+    # state : (k, v, last_assessment) - 최근 max_seq_len - 1 개 풀이의 E_hat projection (n_heads, B, max_seq_len - 1, head_dim)
+    #         과 마지막 풀이의 문제 번호 (1, B), 학습 window 처럼 왼쪽 패딩 (패딩 문제의 key 도 forward 와 같이 attention 에 들어감)
+    # forward 의 마지막 줄 (causal mask 에서 모든 key 를 보는 행) 과 같은 값, 배치 안 위치와 상관없음
+    def _key_value(self, cate_x, cont_x):
+        E_hat = torch.cat([self.E_layer(cate_x[:, :, 0]), self.comb_layer(cate_x, cont_x)], dim=-1)
+        return self.attention_layer.project_kv(E_hat)
+
+    def initial_state(self, batch_size):
+        weight = self.attention_layer.kv_weight
+        cate_x = torch.zeros((1, 1, self.args.cate_num), dtype=torch.int64, device=weight.device)
+        cont_x = weight.new_zeros(1, 1, self.args.cont_num)
+        k, v = self._key_value(cate_x, cont_x) # 패딩 풀이의 key / value
+        size = (-1, batch_size, self.args.max_seq_len - 1, -1)
+        return k.expand(size).contiguous(), v.expand(size).contiguous(), torch.zeros((1, batch_size), dtype=torch.int64, device=weight.device)
+
+    def step(self, cate_x: torch.Tensor, cont_x: torch.Tensor, state=None, targets=None):
+        '''
+        유저마다 새 풀이 하나를 cache 에 넣고 (가장 오래된 풀이는 버림) 새 풀이의 query 한 줄만 계산, 풀이 하나당 O(max_seq_len)
+        cate_x : (B, cate_num), cont_x : (B, cont_num), targets : 바로 전 풀이의 정답 여부 (B,), 전 풀이가 없으면 무시
+        :return: (새 풀이의 logit (B,), 새 state)
+        '''
+        k, v, last_assessment = self.initial_state(cate_x.size(0)) if state is None else state
+        targets = torch.zeros_like(last_assessment[0]) if targets is None else targets.long()
+
+        # Q 는 전 풀이 (문제 + 정답 여부), 위치는 항상 window 의 마지막 줄
+        y = last_assessment[0] + targets * self.n_assessments * (last_assessment[0] > 0)
+        M_hat = self.M_layer(y.unsqueeze(1)) + self.Poistion_layer.weight[-1]
+
+        new_k, new_v = self._key_value(cate_x.unsqueeze(1), cont_x.unsqueeze(1))
+        k, v = push_window(k, new_k), push_window(v, new_v)
+        Zs = self.attention_layer.attend(M_hat, k, v)
+
+        z = self.W0_layer(Zs)
+
+        fz = self.ffnn_layer(z)
+        z = self.res_layer2(z + fz)
+
+        out = self.final_layer(z[:, 0])
+        return out.squeeze(-1), (k, v, cate_x[:, 0].unsqueeze(0))
+
+    def encode(self, cate_x: torch.Tensor, cont_x: torch.Tensor, mask: torch.Tensor, targets=None):
+        # 지난 풀이 window (왼쪽 패딩) 의 E_hat projection 을 한 번에 cache 로, 다음 step 의 targets 는 window 마지막 풀이의 정답 여부
+        k, v, _ = self.initial_state(cate_x.size(0))
+        new_k, new_v = self._key_value(cate_x, cont_x)
+        S = min(cate_x.size(1), k.size(2))
+        k[:, :, -S:], v[:, :, -S:] = new_k[:, :, -S:], new_v[:, :, -S:]
+        return k, v, cate_x[:, -1, 0].unsqueeze(0)
+
 
 class SAKT2(nn.Module):
     def __init__(self, args):
@@ -535,17 +534,9 @@ class SAKT2(nn.Module):
         #     (torch.triu(torch.ones((args.batch_size, args.max_seq_len - 1)).to(args.device), diagonal=-1) * 100000) - 100000
         # self.new_mask.requires_grad = False
 
-        # head 1
-        self.Q1_layer = nn.Linear(args.attention_dim, args.attention_dim // 2, bias=False)
-        self.K1_layer = nn.Linear(args.attention_dim, args.attention_dim // 2, bias=False)
-        self.V1_layer = nn.Linear(args.attention_dim, args.attention_dim // 2, bias=False)
-        self.softmax_layer1 = nn.Softmax(dim=-1)
-
-        # head 2
-        self.Q2_layer = nn.Linear(args.attention_dim, args.attention_dim // 2, bias=False)
-        self.K2_layer = nn.Linear(args.attention_dim, args.attention_dim // 2, bias=False)
-        self.V2_layer = nn.Linear(args.attention_dim, args.attention_dim // 2, bias=False)
-        self.softmax_layer2 = nn.Softmax(dim=-1)
+        # head 2 개, Q 는 E_hat, K / V 는 M_hat 에서
+        self.attention_layer = MultiHeadAttention(args.attention_dim, args.attention_dim // 2, 2, kv_dim=args.attention_dim)
+        self.mask_layer = TriuMask(args.batch_size, args.max_seq_len - 1)
 
         self.W0_layer = nn.Linear(args.attention_dim, args.attention_dim, bias=False)
         self.res_layer1 = nn.LayerNorm(args.attention_dim)
@@ -569,9 +560,9 @@ class SAKT2(nn.Module):
 
     
     def forward(self, cate_x: torch.Tensor, cont_x: torch.Tensor, mask: torch.Tensor, targets):
-        new_mask = torch.ones((cate_x.size(0), self.args.max_seq_len - 1)).to(cate_x.get_device())
-        new_mask = (torch.triu(new_mask, diagonal=-1) * 100000) - 100000
-        new_mask.requires_grad = False
+        # max_seq_len 기준 mask 의 뒤쪽만 사용 (--bucket 이면 배치 길이가 max_seq_len 보다 짧음)
+        seq_len = cate_x.size(1)
+        new_mask = self.mask_layer(cate_x.size(0), seq_len - 1)
 
         assessments = cate_x[:, :-1, 0]
         interactions = targets.clone()[:, :-1]
@@ -584,27 +575,7 @@ class SAKT2(nn.Module):
         M_hat = self.M_layer(y)
         E_hat = self.E_layer(next_assessments)
 
-        Q1 = self.Q1_layer(E_hat)
-        K1 = self.K1_layer(M_hat)
-        V1 = self.V1_layer(M_hat)
-
-        scores1 = torch.bmm(Q1, K1.transpose(1, 2))
-        scores1 = torch.div(scores1, Q1.size(-1) ** 0.5)
-        scores1 = scores1 + new_mask.unsqueeze(-1).view(new_mask.size(0), 1, -1)
-        scores1 = self.softmax_layer1(scores1)
-        z1 = torch.bmm(scores1, V1)
-
-        Q2 = self.Q2_layer(E_hat)
-        K2 = self.K2_layer(M_hat)
-        V2 = self.V2_layer(M_hat)
-
-        scores2 = torch.bmm(Q2, K2.transpose(1, 2))
-        scores2 = torch.div(scores2, Q2.size(-1) ** 0.5)
-        scores2 = scores2 + new_mask.unsqueeze(-1).view(new_mask.size(0), 1, -1)
-        scores2 = self.softmax_layer2(scores2)
-        z2 = torch.bmm(scores2, V2)
-        
-        zs = torch.cat([z1, z2], dim=-1)
+        zs = self.attention_layer(E_hat, M_hat, attn_mask=new_mask.unsqueeze(1))
 
         z = self.W0_layer(zs)
 
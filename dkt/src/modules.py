@@ -1,5 +1,6 @@
 import torch
 import torch.nn as nn
+import torch.nn.functional as F
 
 class CateEmbeddingProjector(nn.Module):
     def __init__(self, args):
@@ -31,7 +32,7 @@ class CateEmbeddingProjector(nn.Module):
         #     proj_x = self.proj_layer(embs_x)
         # else:
         emb_x = self.emb_layer(cate_x)
-        emb_x = emb_x.view(emb_x.size(0), self.args.max_seq_len, -1)
+        emb_x = emb_x.view(emb_x.size(0), cate_x.size(1), -1) # 배치마다 길이가 다를 수 있음 (--bucket)
         proj_x = self.proj_layer(emb_x)
         return proj_x
 
@@ -133,4 +134,145 @@ class PositionalEncoding(nn.Module):
         seq_len = x.size()[1] 
         # return : (seq_len, d_model)
         # return matrix will be added to x by broadcasting
-        return self.encoding[:seq_len, :]
\ No newline at end of file
+        # 시퀀스는 왼쪽 패딩이라 짧은 배치 (--bucket) 에서도 실제 풀이 위치가 같도록 뒤에서부터 자름
+        return self.encoding[-seq_len:, :]
+
+class MultiHeadAttention(nn.Module):
+    '''
+    Q, K, V projection 을 가중치 하나로 합치고 (self-attention 이면 QKV 하나, 아니면 Q 와 KV) head 들을 한 번에 계산
+    head 마다 Q/K/V Linear 를 따로 두고 for 문으로 돌던 attention 과 같은 계산, 결과는 head 들을 이어 붙인 (N, L, n_heads * head_dim)
+    - kv_dim : None 이면 self-attention (forward 에서 kv_x 생략)
+    - scale : score 에 곱하는 값, 기본은 head_dim ** -0.5
+    - dropout : Q, K, V projection 뒤 dropout (LastQuery)
+    - query_softmax : True 면 softmax 를 key 가 아니라 query 방향으로 (예전 SelfAttention ~ SelfAttention5 의 nn.Softmax(dim=1))
+    가중치는 (projection 수 * n_heads, 입력 크기, head_dim) 이라 projection 이 bmm 한 번이고, 결과가 바로 (head * N, L, head_dim) 모양
+    GPU 에서 key 방향 softmax 는 F.scaled_dot_product_attention 으로 score 행렬을 따로 만들지 않고 계산
+    (CPU 는 시퀀스가 짧아서 (64 이하) flash attention kernel 보다 bmm + softmax 가 빠름, benchmark.py attention)
+    '''
+    def __init__(self, q_dim, head_dim, n_heads, kv_dim=None, bias=False, scale=None, dropout=0.0, query_softmax=False):
+        super().__init__()
+        self.head_dim = head_dim
+        self.n_heads = n_heads
+        self.scale = head_dim ** -0.5 if scale is None else scale
+        self.query_softmax = query_softmax
+        if kv_dim is None:
+            self.qkv_weight, self.qkv_bias = self._parameters_for(3, q_dim, bias)
+        else:
+            self.q_weight, self.q_bias = self._parameters_for(1, q_dim, bias)
+            self.kv_weight, self.kv_bias = self._parameters_for(2, kv_dim, bias)
+        self.dropout = nn.Dropout(dropout)
+
+    def _parameters_for(self, n_proj, in_dim, bias):
+        # nn.Linear 와 같은 초기화 (uniform(-1/sqrt(in_dim), 1/sqrt(in_dim)))
+        bound = in_dim ** -0.5
+        weight = nn.Parameter(torch.empty(n_proj * self.n_heads, in_dim, self.head_dim).uniform_(-bound, bound))
+        bias = nn.Parameter(torch.empty(n_proj * self.n_heads, 1, self.head_dim).uniform_(-bound, bound)) if bias else None
+        return weight, bias
+
+    def _project(self, x, weight, bias):
+        # (N, L, in_dim) -> (projection 수 * n_heads * N, L, head_dim), x 는 복사 없이 expand 해서 bmm 한 번
+        N, L = x.size(0), x.size(1)
+        x = x.reshape(1, N * L, -1).expand(weight.size(0), -1, -1)
+        out = torch.bmm(x, weight) if bias is None else torch.baddbmm(bias, x, weight)
+        return self.dropout(out).view(-1, L, self.head_dim)
+
+    def forward(self, q_x, kv_x=None, attn_mask=None):
+        # q_x : (N, Lq, q_dim), kv_x : (N, Lk, kv_dim), attn_mask : score 에 더하는 float mask, (N, Lq, Lk) 로 broadcast 가능한 모양
+        H, N, Lq = self.n_heads, q_x.size(0), q_x.size(1)
+        if kv_x is None:
+            q, k, v = self._project(q_x, self.qkv_weight, self.qkv_bias).chunk(3)
+        else:
+            q = self._project(q_x, self.q_weight, self.q_bias)
+            k, v = self._project(kv_x, self.kv_weight, self.kv_bias).chunk(2)
+        Lk = k.size(1)
+
+        if q.is_cuda and not self.query_softmax and hasattr(F, 'scaled_dot_product_attention'):
+            z = F.scaled_dot_product_attention(
+                q.view(H, N, Lq, -1), k.view(H, N, Lk, -1), v.view(H, N, Lk, -1), attn_mask=attn_mask, scale=self.scale
+            )
+        else:
+            score = torch.bmm(q, k.transpose(1, 2)) * self.scale
+            if attn_mask is not None:
+                score = (score.view(H, N, Lq, Lk) + attn_mask).view(H * N, Lq, Lk)
+            score = torch.softmax(score, dim=1 if self.query_softmax else -1)
+            z = torch.bmm(score, v)
+
+        # (H, N, Lq, D) -> (N, Lq, H * D)
+        return z.reshape(H, N, Lq, self.head_dim).permute(1, 2, 0, 3).reshape(N, Lq, H * self.head_dim)
+
+    def project_kv(self, kv_x, bias=True):
+        '''
+        KV cache 에 넣을 key, value projection, kv_x : (N, L, kv_dim) -> k, v 각각 (n_heads, N, L, head_dim)
+        bias=False 는 위치 임베딩처럼 나중에 더할 값의 projection (projection 이 선형이라 (x + p)W = xW + pW)
+        '''
+        H = self.n_heads
+        weight, b = (self.qkv_weight[H:], self.qkv_bias) if hasattr(self, 'qkv_weight') else (self.kv_weight, self.kv_bias)
+        b = b[-2 * H:] if bias and b is not None else None
+        k, v = self._project(kv_x, weight, b).chunk(2)
+        return k.view(H, kv_x.size(0), -1, self.head_dim), v.view(H, kv_x.size(0), -1, self.head_dim)
+
+    def attend(self, q_x, k, v, attn_mask=None):
+        '''
+        새 풀이 query 한 줄만 cache 된 key / value 에 attention, 계산량은 key 수 L 에 비례 (forward 는 L x L)
+        q_x : (N, 1, q_dim), k / v : project_kv 결과 (n_heads, N, L, head_dim), attn_mask : (N, 1, L) 로 broadcast 가능
+        :return: forward 의 마지막 줄과 같은 (N, 1, n_heads * head_dim)
+        '''
+        if self.query_softmax:
+            # query 방향 softmax 는 새 query 가 들어오면 모든 key 열의 합이 바뀌어서 한 줄만 계산할 수 없음
+            raise ValueError('query_softmax attention 은 KV cache 로 계산할 수 없습니다. 전체 window 로 forward 해 주세요.')
+        H, N, L = self.n_heads, k.size(1), k.size(2)
+        weight, b = (self.qkv_weight[:H], self.qkv_bias) if hasattr(self, 'qkv_weight') else (self.q_weight, self.q_bias)
+        q = self._project(q_x, weight, None if b is None else b[:H])
+
+        score = torch.bmm(q, k.reshape(H * N, L, -1).transpose(1, 2)) * self.scale
+        if attn_mask is not None:
+            score = (score.view(H, N, 1, L) + attn_mask).view(H * N, 1, L)
+        z = torch.bmm(torch.softmax(score, dim=-1), v.reshape(H * N, L, -1))
+        return z.view(H, N, self.head_dim).transpose(0, 1).reshape(N, 1, H * self.head_dim)
+
+
+class TriuMask(nn.Module):
+    '''
+    (torch.triu(torch.ones((rows, cols)), diagonal) * 100000) - 100000 를 buffer 로 한 번만 만들어 두고 잘라서 씀 (SAKT mask)
+    forward(rows, cols) 는 위쪽 rows 행, 오른쪽 cols 열 (짧은 배치는 max_seq_len 기준 mask 의 뒤쪽)
+    rows 가 buffer 보다 크면 그때만 다시 만듦
+    '''
+    def __init__(self, rows, cols, diagonal=-1):
+        super().__init__()
+        self.diagonal = diagonal
+        self.register_buffer('mask', self._build(rows, cols), persistent=False)
+
+    def _build(self, rows, cols, device=None):
+        return (torch.triu(torch.ones((rows, cols), device=device), diagonal=self.diagonal) * 100000) - 100000
+
+    def forward(self, rows, cols):
+        if rows > self.mask.size(0):
+            self.mask = self._build(rows, self.mask.size(1), self.mask.device)
+        return self.mask[:rows, self.mask.size(1) - cols:]
+
+
+def push_window(window, new):
+    # window (.., N, L, ..) 의 가장 오래된 칸 (왼쪽) 을 버리고 new (.., N, 1, ..) 를 오른쪽에 붙임, KV cache 의 window eviction
+    return torch.cat([window.narrow(2, 1, window.size(2) - 1), new], dim=2)
+
+
+def packed_rnn(rnn:nn.RNNBase, x, mask, hx=None):
+    '''
+    왼쪽 패딩된 x (B, S, F) 를 mask 길이만큼만 rnn 에 넣음 (pack_padded_sequence, 패딩 step 은 계산하지 않음)
+    rnn 의 batch_first 와 상관없이 x 는 (B, S, F)
+    :return: (hs (B, S, hidden), 마지막 hidden) - hs 는 다시 왼쪽 패딩이고 패딩 자리는 0, 마지막 hidden 은 유저별 마지막 실제 step 의 hidden
+    '''
+    B, S = mask.size(0), mask.size(1)
+    lengths = mask.sum(1).clamp(min=1) # 전부 패딩인 행도 pack 되도록 마지막 step 하나는 넣음
+    # 왼쪽 패딩 -> 오른쪽 패딩 (행마다 패딩 수만큼 회전)
+    steps = torch.arange(S, device=x.device).unsqueeze(0)
+    shift = (S - lengths).unsqueeze(1)
+    x = x.gather(1, ((steps + shift) % S).unsqueeze(-1).expand_as(x))
+
+    packed = nn.utils.rnn.pack_padded_sequence(x, lengths.cpu(), batch_first=True, enforce_sorted=False)
+    hs, h = rnn(packed, hx)
+    hs, _ = nn.utils.rnn.pad_packed_sequence(hs, batch_first=True, total_length=S)
+
+    # 오른쪽 패딩 -> 왼쪽 패딩
+    hs = hs.gather(1, ((steps - shift) % S).unsqueeze(-1).expand(B, S, hs.size(-1)))
+    return hs, h
@@ -0,0 +1,127 @@
+import os
+import pickle
+
+import numpy as np
+import torch
+import torch.nn as nn
+
+
+class OnlineScorer:
+    '''
+    유저별 모델 state 를 들고 있다가 새 풀이가 들어오면 그 풀이 한 step 만 진행해서 정답 확률을 돌려줌
+    window (max_seq_len) 전체를 다시 만들어 forward 하지 않고, 여러 유저의 새 풀이를 한 배치로 처리
+    - LSTM / GRU : rnn state (h, c) / h, 풀이 하나당 모델 계산 O(1)
+    - SelfAttention6 / SAKT : 최근 풀이들의 projection 된 key / value (KV cache), 새 풀이의 query 한 줄만 계산해서 O(max_seq_len)
+    model 에는 initial_state(B), step(cate_x, cont_x, state, targets) -> (logit (B,), 새 state), encode(cate_x, cont_x, mask, targets) 가 있어야 함
+    (state 는 텐서 하나 또는 tuple 이고 텐서마다 두 번째 축이 유저)
+    - slots : {userID: state 저장 위치}
+    - state : state 텐서들을 유저 축으로 용량만큼 쌓은 것, 처음 보는 유저는 model.initial_state 에서 시작 (학습 때 패딩과 같음)
+    rnn state 는 window 길이로 자르지 않고 계속 이어지므로, 지난 풀이가 max_seq_len 개를 넘으면 window forward 와 값이 달라질 수 있음
+    (KV cache 는 window 처럼 가장 오래된 풀이를 버려서 같은 값)
+    '''
+    def __init__(self, model:nn.Module, device='cpu'):
+        self.model = model.to(device).eval()
+        self.device = device
+        self.slots = {}
+        with torch.no_grad():
+            initial = model.initial_state(1)
+        self.is_tuple = isinstance(initial, tuple)
+        self.state = [s.new_empty(s.size(0), 0, *s.shape[2:]) for s in self._parts(initial)]
+
+    def _parts(self, state):
+        return list(state) if self.is_tuple else [state]
+
+    def _model_state(self, parts):
+        return tuple(parts) if self.is_tuple else parts[0]
+
+    def _allocate(self, users):
+        # 처음 보는 유저에게 initial_state 자리를 주고, 모자라면 용량을 두 배로
+        for user in users:
+            if user not in self.slots:
+                self.slots[user] = len(self.slots)
+        capacity = self.state[0].size(1)
+        if len(self.slots) > capacity:
+            with torch.no_grad():
+                extra = self._parts(self.model.initial_state(max(len(self.slots), capacity * 2) - capacity))
+            self.state = [torch.cat([s, e], dim=1) for s, e in zip(self.state, extra)]
+        return torch.as_tensor([self.slots[user] for user in users], dtype=torch.int64, device=self.device)
+
+    def _gather(self, index):
+        return self._model_state([s[:, index] for s in self.state])
+
+    def _scatter(self, index, state):
+        for s, new in zip(self.state, self._parts(state)):
+            s[:, index] = new
+
+    def _check_users(self, users):
+        users = list(users)
+        if len(set(users)) != len(users):
+            # 같은 유저의 풀이 두 개는 순서대로 진행해야 해서 한 배치에 넣을 수 없음
+            raise ValueError('한 배치에 같은 userID 가 두 번 이상 있습니다. 유저별로 한 풀이씩 나눠서 score() 해 주세요.')
+        return users
+
+    def _tensor(self, x, dtype):
+        return None if x is None else torch.as_tensor(x, dtype=dtype, device=self.device)
+
+    def score(self, users, cate_x, cont_x, targets=None, commit=True) -> np.ndarray:
+        '''
+        users 의 새 풀이 한 개씩을 한 배치로 한 step 진행
+        cate_x : (B, cate_num) 정수, cont_x : (B, cont_num) 실수 - 학습 데이터의 한 행과 같은 컬럼 순서
+        targets : 유저별 바로 전 풀이의 정답 여부 (B,), 전 풀이의 정답을 입력으로 쓰는 모델 (SAKT) 만 사용
+        commit=False 면 state 를 바꾸지 않고 확률만 (같은 풀이를 다시 점수 매길 때)
+        :return: 유저별 정답 확률 (B,)
+        '''
+        users = self._check_users(users)
+        index = self._allocate(users)
+        with torch.no_grad():
+            logit, state = self.model.step(
+                self._tensor(cate_x, torch.int64), self._tensor(cont_x, torch.float32), self._gather(index),
+                self._tensor(targets, torch.int64)
+            )
+        if commit:
+            self._scatter(index, state)
+        return torch.sigmoid(logit).cpu().numpy()
+
+    def start(self, users, cate_x, cont_x, mask, targets=None):
+        '''
+        지난 풀이 window (DKTDataset 배치와 같은 왼쪽 패딩 (B, S, ..) 과 mask) 로 유저들의 state 를 한 번에 만듦
+        이미 있는 유저는 덮어씀, 지난 풀이가 없는 (mask 가 전부 0 인) 유저는 initial_state
+        '''
+        users = self._check_users(users)
+        mask = self._tensor(mask, torch.int64)
+        index = self._allocate(users)
+        with torch.no_grad():
+            state = self._parts(self.model.encode(
+                self._tensor(cate_x, torch.int64), self._tensor(cont_x, torch.float32), mask, self._tensor(targets, torch.int64)
+            ))
+            initial = self._parts(self.model.initial_state(len(users)))
+        empty = mask.sum(1) == 0
+        state = [torch.where(empty.view(1, -1, *[1] * (s.dim() - 2)), i, s) for s, i in zip(state, initial)]
+        self._scatter(index, self._model_state(state))
+
+    def reset(self, users):
+        # 유저 state 를 처음으로 (다음 풀이는 지난 풀이 없이 시작)
+        users = [user for user in users if user in self.slots]
+        if users:
+            with torch.no_grad():
+                self._scatter(self._allocate(users), self.model.initial_state(len(users)))
+
+    def __len__(self):
+        return len(self.slots)
+
+    def snapshot(self, path):
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        state = [s[:, :len(self.slots)].cpu().numpy() for s in self.state]
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({'slots': self.slots, 'state': state}, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, model:nn.Module, device='cpu'):
+        # snapshot() 한 state 를 같은 (같은 가중치의) 모델로 이어서 사용
+        with open(path, 'rb') as f:
+            saved = pickle.load(f)
+        scorer = cls(model, device)
+        scorer.slots = saved['slots']
+        scorer.state = [torch.from_numpy(s).to(device) for s in saved['state']]
+        return scorer
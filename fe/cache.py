@@ -0,0 +1,78 @@
+import os
+import hashlib
+import inspect
+
+import pandas as pd
+
+
+class FeatureBlock:
+    '''
+    FE 클래스들이 공유하는 피쳐 묶음(block) 단위.
+    입력 컬럼(columns)만 보고 새 컬럼들을 DataFrame 으로 돌려주는 순수 함수를 감싼다.
+    '''
+    def __init__(self, func, columns, deps=()):
+        self.func = func
+        self.name = func.__name__
+        self.columns = list(columns)
+        self.deps = list(deps) # 블록이 쓰는 헬퍼 모듈들 (ex) fe.kernels), 모듈 소스 전체를 키에 넣어서 간접 호출하는 헬퍼가 바뀌어도 캐시 무효화
+        self.__doc__ = func.__doc__
+
+    def __call__(self, df:pd.DataFrame, **params) -> pd.DataFrame:
+        return self.func(df, **params)
+
+    def source(self) -> str:
+        return ''.join(inspect.getsource(f) for f in [self.func] + self.deps)
+
+
+def feature_block(columns, deps=()):
+    def decorator(func):
+        return FeatureBlock(func, columns, deps)
+    return decorator
+
+
+class BlockCache:
+    '''
+    입력 데이터 해시 + 블록 코드 + 파라미터를 키로 블록 결과를 디스크에 저장한다.
+    같은 base 데이터로 여러 FE 클래스를 돌리면 공통 블록은 한 번만 계산된다.
+    '''
+    def __init__(self, cache_dir, enabled=True):
+        self.cache_dir = cache_dir
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+
+    def key(self, block:FeatureBlock, df:pd.DataFrame, params:dict) -> str:
+        h = hashlib.sha1()
+        h.update(block.name.encode())
+        h.update(block.source().encode())
+        h.update(repr(sorted(params.items())).encode())
+        h.update(str(len(df)).encode())
+        for col in block.columns:
+            h.update(f'{col}:{df[col].dtype}'.encode())
+            h.update(pd.util.hash_pandas_object(df[col], index=False).values.tobytes())
+        return h.hexdigest()
+
+    def compute(self, block:FeatureBlock, df:pd.DataFrame, **params) -> pd.DataFrame:
+        if not self.enabled:
+            return block(df[block.columns], **params)
+
+        path = os.path.join(self.cache_dir, f'{block.name}_{self.key(block, df, params)}.pkl')
+        if os.path.exists(path):
+            self.hits += 1
+            return pd.read_pickle(path)
+
+        self.misses += 1
+        out = block(df[block.columns], **params).reset_index(drop=True)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # 여러 프로세스가 같은 블록을 동시에 쓸 수 있으므로 임시 파일에 쓰고 rename
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        out.to_pickle(tmp_path)
+        os.replace(tmp_path, path)
+        return out
+
+    def clear(self):
+        if not os.path.exists(self.cache_dir):
+            return
+        for file in os.listdir(self.cache_dir):
+            if file.endswith('.pkl'):
+                os.remove(os.path.join(self.cache_dir, file))
@@ -0,0 +1,88 @@
+import os
+import hashlib
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+from sklearn.utils.extmath import randomized_svd
+
+
+def user_corpus(df:pd.DataFrame, col, user_col='userID'):
+    '''
+    유저별로 처음 나온 순서대로 중복 없이 이어 붙인 말뭉치 (np.concatenate(df.groupby(user_col)[col].unique()) 와 같은 순서)
+    :return: (말뭉치 단어 id 배열, id 순서의 단어 값들) - id 는 말뭉치에서 처음 나온 순서
+    '''
+    pairs = df[[user_col, col]].drop_duplicates()
+    pairs = pairs.iloc[np.argsort(pairs[user_col].values, kind='stable')]
+    corpus, vocab = pd.factorize(pairs[col])
+    return corpus.astype(np.int64), vocab
+
+
+def cooccurrence(corpus:np.ndarray, vocab_size, window_size=1) -> sparse.csr_matrix:
+    '''
+    동시발생 행렬 (좌우 window_size 안의 단어 쌍 개수), 윈도우 거리별로 한 번에 더함
+    '''
+    rows, cols = [], []
+    for i in range(1, window_size + 1):
+        rows += [corpus[:-i], corpus[i:]]
+        cols += [corpus[i:], corpus[:-i]]
+    rows = np.concatenate(rows)
+    cols = np.concatenate(cols)
+    # coo -> csr 변환에서 같은 위치 값들은 더해짐
+    return sparse.coo_matrix((np.ones(len(rows), dtype=np.int64), (rows, cols)), shape=(vocab_size, vocab_size)).tocsr()
+
+
+def ppmi(C:sparse.csr_matrix, eps=1e-8) -> sparse.csr_matrix:
+    '''
+    PPMI(점별 상호정보량), max(0, log2(C_ij * N / (S_j * S_i) + eps))
+    동시발생이 0 인 칸은 log2(eps) < 0 이라 항상 0 -> 0 이 아닌 칸만 계산
+    '''
+    C = C.tocoo()
+    N = C.data.sum()
+    S = np.asarray(C.sum(axis=0)).ravel()
+    pmi = np.log2(C.data * N / (S[C.col] * S[C.row]) + eps)
+    keep = pmi > 0
+    return sparse.csr_matrix((pmi[keep].astype(np.float32), (C.row[keep], C.col[keep])), shape=C.shape)
+
+
+def truncated_svd(W, k, random_state=0) -> np.ndarray:
+    # 상위 k 개 특이벡터만 randomized svd 로 구함 (부호는 svd_flip 으로 고정)
+    k = min(k, min(W.shape))
+    U, _, _ = randomized_svd(W, n_components=k, n_iter=10, random_state=random_state)
+    return U
+
+
+def embedding_table(df:pd.DataFrame, col, dim, window_size=5, user_col='userID', cache_dir=None) -> pd.DataFrame:
+    '''
+    유저별 풀이 순서를 말뭉치로 보고 col 값의 PPMI + SVD 임베딩 테이블을 만든다. (index: col 값, columns: 0 ~ dim-1)
+    cache_dir 를 주면 말뭉치 + 파라미터 해시를 키로 테이블을 저장해두고 재사용
+    '''
+    corpus, vocab = user_corpus(df, col, user_col)
+
+    path = None
+    if cache_dir is not None:
+        h = hashlib.sha1()
+        h.update(repr((col, dim, window_size)).encode())
+        h.update(corpus.tobytes())
+        h.update(pd.util.hash_pandas_object(pd.Series(vocab), index=False).values.tobytes())
+        path = os.path.join(cache_dir, f'{col}_emb{dim}_{h.hexdigest()}.pkl')
+        if os.path.exists(path):
+            return pd.read_pickle(path)
+
+    W = ppmi(cooccurrence(corpus, len(vocab), window_size))
+    table = pd.DataFrame(truncated_svd(W, dim), index=vocab)
+
+    if path is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        table.to_pickle(tmp_path)
+        os.replace(tmp_path, path)
+    return table
+
+
+def lookup(table:pd.DataFrame, values:pd.Series, prefix) -> pd.DataFrame:
+    # 값 -> 테이블 행 번호로 한 번에 gather, 테이블에 없는 값은 NaN
+    idx = table.index.get_indexer(values)
+    emb = table.values[idx]
+    emb[idx == -1] = np.nan
+    return pd.DataFrame(emb, index=values.index, columns=[f'{prefix}{i}' for i in range(table.shape[1])])
@@ -0,0 +1,55 @@
+import os
+import glob
+
+import numpy as np
+import pandas as pd
+
+
+ID_COLS = ['assessmentItemID', 'testId'] # 문자열 id, 캐시에서는 dictionary 인코딩으로 저장
+
+
+def read_raw(path, time_col='Timestamp', use_cache=True) -> pd.DataFrame:
+    '''
+    원본 csv 를 읽는다. (pd.read_csv(path, parse_dates=[time_col]) 와 같은 결과)
+    처음 한 번만 csv 를 파싱해서 <csv 폴더>/.raw_cache/<파일 이름>-<크기>-<수정 시각>.parquet 로 저장하고,
+    이후에는 캐시에서 바로 읽는다. (원본 파일이 바뀌면 새로 만든다)
+    - Timestamp 는 int64 epoch 초로 저장 -> 읽을 때 문자열 파싱 없이 datetime64 로 변환
+    - assessmentItemID, testId 는 dictionary 인코딩으로 저장 -> 읽을 때 같은 문자열 객체를 공유 (intern)
+    '''
+    if not use_cache:
+        return pd.read_csv(path, parse_dates=[time_col])
+
+    stat = os.stat(path)
+    name = os.path.splitext(os.path.basename(path))[0]
+    cache_dir = os.path.join(os.path.dirname(path), '.raw_cache')
+    cache_path = os.path.join(cache_dir, f'{name}-{stat.st_size}-{stat.st_mtime_ns}.parquet')
+
+    if not os.path.exists(cache_path):
+        df = pd.read_csv(path, parse_dates=[time_col])
+        _write_cache(df, cache_path, time_col)
+        for old in glob.glob(os.path.join(cache_dir, f'{name}-*.parquet')):
+            if old != cache_path:
+                os.remove(old)
+
+    df = pd.read_parquet(cache_path)
+    df[time_col] = pd.to_datetime(df[time_col], unit='s')
+    for col in ID_COLS:
+        if col in df.columns:
+            df[col] = df[col].astype(object)
+    return df
+
+
+def _write_cache(df:pd.DataFrame, cache_path, time_col):
+    df = df.copy()
+    ns = df[time_col].values.astype('datetime64[ns]').view(np.int64)
+    if (ns % 10**9).any():
+        raise ValueError(f'{time_col} 에 초 단위 이하 값이 있어 epoch 초로 캐시할 수 없습니다.')
+    df[time_col] = ns // 10**9
+    for col in ID_COLS:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = f'{cache_path}.{os.getpid()}.tmp'
+    df.to_parquet(tmp_path, index=False, compression='zstd')
+    os.replace(tmp_path, cache_path)
@@ -0,0 +1,218 @@
+import numpy as np
+import pandas as pd
+
+
+#################################
+# FE 클래스들이 공통으로 쓰는 시간/구간화 커널
+# 기존 행 단위 .apply(lambda ...) 와 결과(dtype 포함)가 완전히 같도록 작성되어 있습니다.
+#################################
+GRADE_BINS = (0.4, 0.8)
+ELAPSED_BINS = (3.0, 8.0, 14.0, 20.0, 25.0, 32.0, 45.0, 69.0, 133.0, 900.0)
+
+
+def _with_missing(values:np.ndarray, missing:np.ndarray, index) -> pd.Series:
+    # apply 가 None 을 돌려주던 자리는 NaN (float64), 없으면 int64
+    if missing.any():
+        values = values.astype(np.float64)
+        values[missing] = np.nan
+    return pd.Series(values, index=index)
+
+
+def to_epoch(ts:pd.Series) -> np.ndarray:
+    # datetime64[ns] -> int64 (ns)
+    if ts.dtype == np.int64:
+        return ts.values
+    return pd.to_datetime(ts).values.astype('datetime64[ns]').view(np.int64)
+
+
+def group_ids(df:pd.DataFrame, keys) -> np.ndarray:
+    return df.groupby(keys, sort=False).ngroup().values
+
+
+def segment_diff(values:np.ndarray, gid:np.ndarray) -> np.ndarray:
+    '''
+    groupby(keys).diff() 와 같은 값, 그룹의 첫 행은 0
+    :param values: int64 배열 (epoch ns 등)
+    :param gid: 행마다 그룹 번호
+    '''
+    order = np.argsort(gid, kind='stable')
+    sorted_values = values[order]
+    sorted_gid = gid[order]
+
+    diff = np.zeros(len(values), dtype=values.dtype)
+    same = sorted_gid[1:] == sorted_gid[:-1]
+    diff[1:][same] = sorted_values[1:][same] - sorted_values[:-1][same]
+
+    out = np.empty_like(diff)
+    out[order] = diff
+    return out
+
+
+def elapsed_seconds(df:pd.DataFrame, keys=('userID', 'testId'), time_col='Timestamp') -> np.ndarray:
+    # 같은 (userID, testId) 안에서 다음 문제까지 걸린 시간(초), 마지막 행은 0
+    diff = segment_diff(to_epoch(df[time_col]), group_ids(df, list(keys)))
+    elapsed = np.zeros(len(diff), dtype=np.float64)
+    elapsed[:-1] = diff[1:] / 1e9 # Timedelta.total_seconds 와 동일
+    return elapsed
+
+
+def clip_upper(s:pd.Series, upper=900) -> pd.Series:
+    # .apply(lambda x : 900 if x > 900 else x)
+    return pd.Series(np.where(s.values > upper, upper, s.values), index=s.index)
+
+
+def fill_zero_by_group_median(s:pd.Series, by:pd.Series) -> pd.Series:
+    # 0인 값을 그룹별 중앙값으로 대치 (중앙값은 0 포함해서 계산)
+    median = s.groupby(by.values).transform('median').values
+    return pd.Series(np.where(s.values == 0, median, s.values), index=s.index)
+
+
+def between(s:pd.Series, low=0, high=5) -> pd.Series:
+    # .apply(lambda x: int((x>low) & (x<=high)))
+    return pd.Series(((s.values > low) & (s.values <= high)).astype(np.int64), index=s.index)
+
+
+def above(s:pd.Series, threshold) -> pd.Series:
+    # .apply(lambda x: int(x>threshold))
+    return pd.Series((s.values > threshold).astype(np.int64), index=s.index)
+
+
+def grade(s:pd.Series, bins=GRADE_BINS) -> pd.Series:
+    # grade_map : x <= 0.4 -> 0, 0.4 < x < 0.8 -> 1, x >= 0.8 -> 2
+    x = s.values.astype(np.float64)
+    low, high = bins
+    values = np.where(x <= low, 0, np.where(x < high, 1, 2))
+    return _with_missing(values, np.isnan(x), s.index)
+
+
+def percent_bucket(s:pd.Series) -> pd.Series:
+    # cate_map : 0.0 ~ 1.0 을 10% 단위 범주로, 결측은 -1
+    x = s.values.astype(np.float64)
+    missing = np.isnan(x)
+    values = np.floor_divide(np.rint(np.where(missing, 0, x) * 100), 10).astype(np.int64)
+    values[missing] = -1
+    return pd.Series(values, index=s.index)
+
+
+def elapsed_bucket(s:pd.Series, bins=ELAPSED_BINS) -> pd.Series:
+    # elpased_map : 0 -> 0, 이후 bins 의 구간마다 1, 2, ..., bins[-1] 초과/결측은 NaN
+    x = s.values.astype(np.float64)
+    values = np.searchsorted(np.asarray(bins), x, side='left') + 1
+    values[x == 0] = 0
+    return _with_missing(values.astype(np.int64), values > len(bins), s.index)
+
+
+def last_digits(s:pd.Series, n=3) -> pd.Series:
+    # .apply(lambda x: int(x[-3:])) , 유니크 값에 대해서만 파싱
+    codes, uniques = pd.factorize(s)
+    table = np.array([int(u[-n:]) for u in uniques], dtype=np.int64)
+    return pd.Series(table[codes], index=s.index)
+
+
+#################################
+# userID 등으로 나뉜 구간(segment) 단위 lag / rolling 커널
+# 그룹 번호로 한 번만 정렬해서 모든 lag, window 를 한 번에 계산하고 원래 행 순서로 돌려준다.
+#################################
+def segment_window(values:np.ndarray, gid:np.ndarray, lags=(), windows=(), min_periods=None, fill=np.nan, fill_nearest=False) -> dict:
+    '''
+    groupby(gid).shift(k), groupby(gid).rolling(w).{sum, count, mean} 를 한 번에 계산
+    :param values: 1차원 배열 (lag 은 dtype 유지, rolling 은 float64)
+    :param gid: 행마다 그룹 번호 (group_ids), 같은 그룹 안에서는 행 순서대로 본다
+    :param lags: {f'lag_{k}'} , 그룹 안에 k 번째 이전 값이 없으면 fill
+    :param windows: {f'sum_{w}', f'count_{w}', f'mean_{w}'} , 결측은 건너뛰고 센다
+    :param min_periods: 결측이 아닌 값이 이보다 적으면 sum/mean 은 NaN (None 이면 window 크기, pandas rolling 과 동일)
+    :param fill_nearest: mean/sum 의 NaN 을 그룹에서 처음으로 window 가 다 찬 위치(w-1 번째)의 값으로 채움
+    '''
+    n = len(values)
+    order = np.argsort(gid, kind='stable')
+    x = np.asarray(values)[order]
+    g = np.asarray(gid)[order]
+
+    pos = np.arange(n)
+    is_start = np.ones(n, dtype=bool)
+    is_start[1:] = g[1:] != g[:-1]
+    seg_start = np.maximum.accumulate(np.where(is_start, pos, 0))
+    seg_id = np.cumsum(is_start) - 1
+    seg_len = np.bincount(seg_id, minlength=seg_id[-1] + 1 if n else 0)
+    rank = pos - seg_start
+
+    out = {}
+    for k in lags:
+        lag = np.full(n, fill, dtype=np.result_type(x.dtype, np.asarray(fill).dtype))
+        has = rank >= k
+        lag[has] = x[pos[has] - k]
+        out[f'lag_{k}'] = lag
+
+    if windows:
+        xf = x.astype(np.float64)
+        valid = ~np.isnan(xf)
+        cs = np.concatenate([[0.0], np.cumsum(np.where(valid, xf, 0.0))])
+        cc = np.concatenate([[0], np.cumsum(valid)])
+    for w in windows:
+        lo = np.maximum(pos - w + 1, seg_start)
+        s = cs[pos + 1] - cs[lo]
+        c = cc[pos + 1] - cc[lo]
+        enough = c >= (w if min_periods is None else min_periods)
+        s = np.where(enough, s, np.nan)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            m = np.where(enough, s / c, np.nan)
+        if fill_nearest:
+            ref = seg_start + w - 1
+            ok = (w - 1) < seg_len[seg_id]
+            ref = np.where(ok, ref, 0)
+            s = np.where(np.isnan(s) & ok, s[ref], s)
+            m = np.where(np.isnan(m) & ok, m[ref], m)
+        out[f'sum_{w}'] = s
+        out[f'count_{w}'] = c
+        out[f'mean_{w}'] = m
+
+    # 정렬 순서 -> 원래 행 순서
+    for name, arr in out.items():
+        restored = np.empty_like(arr)
+        restored[order] = arr
+        out[name] = restored
+    return out
+
+
+def round_values(values:np.ndarray, decimals=3) -> np.ndarray:
+    # .apply(lambda x: round(x, decimals)) , 유니크 값에 대해서만 파이썬 round
+    uniques, inverse = np.unique(values, return_inverse=True)
+    table = np.array([round(u, decimals) for u in uniques.tolist()], dtype=np.float64)
+    return table[inverse]
+
+
+#################################
+# (userID, testId) 처럼 연속으로 이어지는 구간(run) 단위 집계 커널
+# 정렬된 배열에서 구간 경계만 찾아 한 번에 계산하고 행마다 broadcast (head/tail/ffill 왕복 없음)
+#################################
+def run_spans(gid:np.ndarray, times:np.ndarray=None, values:np.ndarray=None) -> dict:
+    '''
+    행 순서에서 gid 가 바뀌는 곳을 구간 경계로 보고 구간별 통계를 행마다 돌려준다.
+    (user, 시간) 순으로 정렬된 데이터에서 gid = group_ids(df, ['userID', 'testId']) 면 시험 한 번 푼 구간
+    - run : 구간 번호, count : 구간 길이, position : 구간 안에서 몇 번째 행인지 (0 ~)
+    - start, end, duration : times 를 주면 구간 처음/마지막 시각과 그 차이 (times 가 epoch ns 면 duration 은 초)
+    - mean : values 를 주면 구간 평균
+    '''
+    gid = np.asarray(gid)
+    n = len(gid)
+    pos = np.arange(n)
+    is_start = np.ones(n, dtype=bool)
+    is_start[1:] = gid[1:] != gid[:-1]
+    starts = np.flatnonzero(is_start)
+    ends = np.append(starts[1:], n) - 1
+    run = np.cumsum(is_start) - 1
+    count = ends - starts + 1
+
+    out = {
+        'run': run,
+        'count': count[run],
+        'position': pos - starts[run],
+    }
+    if times is not None:
+        times = np.asarray(times)
+        out['start'] = times[starts][run]
+        out['end'] = times[ends][run]
+        out['duration'] = (out['end'] - out['start']) / 1_000_000_000
+    if values is not None and n:
+        out['mean'] = (np.add.reduceat(np.asarray(values, dtype=np.float64), starts) / count)[run]
+    return out
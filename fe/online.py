@@ -0,0 +1,112 @@
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from fe import kernels
+
+
+# (키 컬럼, 피쳐 이름 prefix)
+AGG_KEYS = [
+    ('userID', 'user'),
+    ('assessmentItemID', 'ass'),
+    ('KnowledgeTag', 'tag'),
+    ('testId', 'test'),
+]
+
+
+def _grade(rate, bins=kernels.GRADE_BINS) -> int:
+    # kernels.grade 의 스칼라 버전
+    low, high = bins
+    return 0 if rate <= low else (1 if rate < high else 2)
+
+
+def _percent_bucket(rate) -> int:
+    # kernels.percent_bucket 의 스칼라 버전
+    return int(np.rint(np.float64(rate) * 100) // 10)
+
+
+class OnlineAggregates:
+    '''
+    userID / assessmentItemID / KnowledgeTag / testId 별 (푼 문제 수, 맞춘 문제 수) 를 들고 있는 집계 저장소.
+    새 풀이 기록이 들어올 때마다 update() 로 O(1) 갱신하고, features() 로 배치 FE 클래스와 같은 값을 바로 뽑는다.
+    - counts : 유저가 푼 문제 수 (FE06 ~)
+    - {user, ass, tag, test}_grade : 평균 정답률 등급 (kernels.grade)
+    - {user, ass, tag, test}_mean : 평균 정답률 10% 범주 (kernels.percent_bucket, FE13 ~)
+    - {ass, tag}_solved : 평균보다 많이 노출된 문제/태그인지 (kernels.above)
+    집계에 없는 키는 배치의 .map 과 같이 np.nan 을 돌려준다.
+    '''
+    def __init__(self):
+        self.stats = {key: {} for key, _ in AGG_KEYS} # {키 컬럼: {키 값: [count, sum]}}
+        self.total = {key: 0 for key, _ in AGG_KEYS}  # 키 컬럼별 전체 count 합 (노출 평균 = total / 키 개수)
+
+    def fit(self, merged:pd.DataFrame):
+        # 배치 데이터(train + test 의 정답이 있는 행)로 한 번에 초기화
+        merged = merged[merged['answerCode'] != -1]
+        for key, _ in AGG_KEYS:
+            agg = merged.groupby(key)['answerCode'].agg(['size', 'sum'])
+            self.stats[key] = {k: [int(n), int(s)] for k, n, s in zip(agg.index, agg['size'], agg['sum'])}
+            self.total[key] = int(agg['size'].sum())
+        return self
+
+    def update(self, row:dict):
+        # 풀이 기록 하나 반영, answerCode 가 -1 (아직 모르는 정답) 이면 무시
+        if row['answerCode'] == -1:
+            return
+        for key, _ in AGG_KEYS:
+            stat = self.stats[key].setdefault(row[key], [0, 0])
+            stat[0] += 1
+            stat[1] += int(row['answerCode'])
+            self.total[key] += 1
+
+    def __rate(self, key, value):
+        stat = self.stats[key].get(value)
+        if stat is None:
+            return None, None
+        return stat[0], stat[1] / stat[0] # np.sum(s) / len(s)
+
+    def __solved(self, key, count):
+        # count > (키별 count 평균)
+        return int(count > self.total[key] / len(self.stats[key]))
+
+    def features(self, row:dict) -> dict:
+        out = {}
+        for key, prefix in AGG_KEYS:
+            count, rate = self.__rate(key, row[key])
+            out[f'{prefix}_grade'] = np.nan if rate is None else _grade(rate)
+            out[f'{prefix}_mean'] = np.nan if rate is None else _percent_bucket(rate)
+            if prefix == 'user':
+                out['counts'] = np.nan if count is None else count
+            if prefix in ('ass', 'tag'):
+                out[f'{prefix}_solved'] = np.nan if count is None else self.__solved(key, count)
+        return out
+
+    def transform(self, df:pd.DataFrame) -> pd.DataFrame:
+        # features() 를 여러 행에 대해 한 번에 (배치 FE 와 같은 dtype)
+        out = pd.DataFrame(index=df.index)
+        for key, prefix in AGG_KEYS:
+            agg = pd.DataFrame.from_dict(self.stats[key], orient='index', columns=['size', 'sum'])
+            rate = agg['sum'] / agg['size']
+            out[f'{prefix}_grade'] = df[key].map(kernels.grade(rate))
+            out[f'{prefix}_mean'] = df[key].map(kernels.percent_bucket(rate))
+            if prefix == 'user':
+                out['counts'] = df[key].map(agg['size'])
+            if prefix in ('ass', 'tag'):
+                out[f'{prefix}_solved'] = df[key].map(kernels.above(agg['size'], agg['size'].mean()))
+        return out
+
+    def snapshot(self, path):
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({'stats': self.stats, 'total': self.total}, f)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'rb') as f:
+            state = pickle.load(f)
+        store = cls()
+        store.stats = state['stats']
+        store.total = state['total']
+        return store
@@ -0,0 +1,68 @@
+import os
+import time
+import traceback
+import multiprocessing as mp
+
+import pandas as pd
+
+from fe.profiling import restart_peak_rss, peak_rss_mb
+
+
+# fork 된 worker 가 그대로 물려받는 (copy-on-write) 공유 상태
+_SHARED = {}
+
+
+def _run_one(i):
+    fe_class = _SHARED['classes'][i]
+    name = fe_class.__name__
+    # fork 로 물려받은 페이지 (base df 등) 는 worker RSS 에 처음부터 들어 있으므로 시작할 때의 RSS 를 빼고 기록
+    base_mb = restart_peak_rss()
+    start = time.time()
+    try:
+        # FE 클래스들이 base df 에 컬럼을 추가하므로 worker 안에서만 바뀐다 (부모 프로세스의 df 는 그대로).
+        fe_class(_SHARED['base_path'], _SHARED['base_train_df'], _SHARED['base_test_df'], **_SHARED['kwargs']).run()
+        error = None
+    except Exception:
+        error = traceback.format_exc()
+    return name, time.time() - start, max(peak_rss_mb() - base_mb, 0.0), error
+
+
+def run_parallel(fe_classes, base_path, base_train_df:pd.DataFrame, base_test_df:pd.DataFrame, n_jobs=None, **kwargs):
+    '''
+    여러 FE 클래스를 프로세스 풀에서 동시에 돌린다.
+    base df 는 한 번만 읽어두고 fork 로 worker 에 넘기기 때문에 (copy-on-write) 클래스마다 다시 읽거나 pickle 하지 않는다.
+    worker 는 클래스 하나만 돌리고 종료되므로 (maxtasksperchild=1) 클래스별 최대 메모리를 따로 볼 수 있다.
+    최대 메모리는 worker 시작 때 (fork 로 물려받은 상태) 보다 늘어난 양이라 실행 간 비교 가능
+    :param fe_classes: [FE00, FE01, ...]
+    :param n_jobs: worker 수, None 이면 min(클래스 수, cpu 수)
+    :param kwargs: FE 클래스 생성자에 그대로 넘길 인자 (file_format, use_cache, ...)
+    :return: {클래스 이름: (걸린 시간(초), worker 시작 대비 최대 메모리 증가량(MB), 에러 traceback or None)}
+    '''
+    n_jobs = n_jobs or min(len(fe_classes), os.cpu_count())
+    _SHARED.update(
+        classes=list(fe_classes),
+        base_path=base_path,
+        base_train_df=base_train_df,
+        base_test_df=base_test_df,
+        kwargs=kwargs,
+    )
+
+    print(f'[run_parallel] {len(fe_classes)} classes, n_jobs={n_jobs}')
+    start = time.time()
+    results = {}
+    try:
+        with mp.get_context('fork').Pool(n_jobs, maxtasksperchild=1) as pool:
+            for name, seconds, peak_mb, error in pool.imap_unordered(_run_one, range(len(fe_classes))):
+                results[name] = (seconds, peak_mb, error)
+                status = 'done' if error is None else 'FAILED'
+                print(f'[run_parallel] ({len(results)}/{len(fe_classes)}) {name} {status} - {seconds:.1f}s, peak +{peak_mb:.0f}MB')
+                if error is not None:
+                    print(error)
+    finally:
+        _SHARED.clear()
+
+    print(f'[run_parallel] total {time.time() - start:.1f}s')
+    for fe_class in fe_classes:
+        seconds, peak_mb, error = results[fe_class.__name__]
+        print(f'    {fe_class.__name__:<6} {seconds:8.1f}s {f"+{peak_mb:.0f}":>8}MB {"" if error is None else "FAILED"}')
+    return results
@@ -0,0 +1,223 @@
+import os
+import csv
+import json
+import time
+import resource
+import tracemalloc
+import functools
+from contextlib import contextmanager
+from datetime import datetime
+
+
+def _rss_mb() -> float:
+    # 현재 RSS (리눅스 /proc, 없으면 최대 RSS 로 대신)
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError):
+        return _peak_rss_mb()
+
+
+def _peak_rss_mb() -> float:
+    # 리눅스 ru_maxrss 단위는 KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _hwm_mb():
+    # 마지막 _reset_hwm() 이후 최대 RSS (/proc/self/status 의 VmHWM), 없으면 None
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def _reset_hwm() -> bool:
+    # VmHWM 을 현재 RSS 로 되돌림 (리눅스 4.0 ~), 안 되면 False
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+_PEAK = {'mb': 0.0} # VmHWM 을 되돌리기 전까지의 최대 RSS (StepProfiler 가 단계마다 되돌려도 프로세스 최대값은 남김)
+
+
+def sample_peak_rss_mb(reset=True) -> float:
+    # 지난 sample 이후의 최대 RSS 를 돌려주고 VmHWM 을 되돌림, 되돌릴 수 없으면 현재 RSS
+    hwm = _hwm_mb()
+    if hwm is None or not (reset and _reset_hwm()):
+        hwm = _rss_mb() if reset else (hwm or _rss_mb())
+    _PEAK['mb'] = max(_PEAK['mb'], hwm)
+    return hwm
+
+
+def peak_rss_mb() -> float:
+    # 프로세스 (또는 restart_peak_rss 이후) 최대 RSS
+    return max(_PEAK['mb'], sample_peak_rss_mb(reset=False))
+
+
+def restart_peak_rss() -> float:
+    # 지금부터 최대 RSS 를 다시 잼 (fork 된 worker 가 부모에게서 물려받은 최대값 버리기), 지금 RSS 를 돌려줌
+    _reset_hwm()
+    _PEAK['mb'] = _rss_mb()
+    return _PEAK['mb']
+
+
+def _n_rows(obj):
+    if obj is None:
+        return None
+    if isinstance(obj, (tuple, list)):
+        return sum(_n_rows(o) or 0 for o in obj)
+    return len(obj)
+
+
+class StepProfiler:
+    '''
+    전처리 단계별 wall time, cpu time, 메모리, 행 수 기록.
+    - with profiler.step('name', df): ...       (context manager)
+    - @profiler.track()                         (decorator, 함수 이름이 단계 이름)
+    - profiler.lap('name', df)                  (이전 lap 부터 지금까지를 한 단계로, 긴 함수 안에서 들여쓰기 없이 사용)
+    메모리
+    - step_peak_rss_mb : 단계 동안의 최대 RSS, 단계 시작/끝마다 VmHWM 을 읽고 되돌려서 (/proc/self/clear_refs) 열려 있는 단계들에 반영
+      (되돌릴 수 없는 환경이면 단계 시작/끝 RSS 중 큰 값)
+    - process_peak_rss_mb : 프로세스 시작부터 지금까지의 최대 RSS (단계별 값이 아님)
+    trace_memory=True 면 tracemalloc 으로 단계별 최대 할당량(peak_alloc_mb)도 기록 (느려짐)
+    '''
+    def __init__(self, name, enabled=True, trace_memory=False):
+        self.name = name
+        self.enabled = enabled
+        self.trace_memory = trace_memory
+        self.records = []
+        self.__lap = None
+        self.__depth = 0
+        self.__open = []  # 아직 끝나지 않은 단계들의 최대 RSS ([값] 하나짜리 리스트)
+        if enabled and trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def __sample(self):
+        # 지난 sample 이후 최대 RSS 를 열려 있는 단계들에 반영
+        peak = sample_peak_rss_mb()
+        for step_peak in self.__open:
+            step_peak[0] = max(step_peak[0], peak)
+
+    def __start(self):
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+        self.__sample()
+        step_peak = [_rss_mb()]
+        self.__open.append(step_peak)
+        # lap 이나 다른 step 안에서 시작한 step 은 depth 가 1 이상 (전체 시간 합계에서 제외)
+        depth = self.__depth + (self.__lap is not None)
+        return time.perf_counter(), time.process_time(), _rss_mb(), depth, step_peak
+
+    def __stop(self, name, start, rows, extra=None):
+        wall, cpu, rss, depth, step_peak = start
+        self.__sample()
+        self.__open.remove(step_peak)
+        record = {
+            'step': name,
+            'depth': depth,
+            'wall_sec': round(time.perf_counter() - wall, 4),
+            'cpu_sec': round(time.process_time() - cpu, 4),
+            'rss_mb': round(_rss_mb(), 1),
+            'rss_delta_mb': round(_rss_mb() - rss, 1),
+            'step_peak_rss_mb': round(step_peak[0], 1),
+            'process_peak_rss_mb': round(peak_rss_mb(), 1),
+            'rows': rows,
+        }
+        if self.trace_memory:
+            record['peak_alloc_mb'] = round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+        record.update(extra or {})
+        self.records.append(record)
+        return record
+
+    @contextmanager
+    def step(self, name, df=None):
+        # df (or (train_df, test_df)) 를 넘기면 단계가 끝났을 때의 행 수를 기록
+        # 단계 안에서 만든 결과의 행 수 등은 with ... as step: step['rows'] = ... 로 기록
+        extra = {}
+        if not self.enabled:
+            yield extra
+            return
+        start = self.__start()
+        self.__depth += 1
+        try:
+            yield extra
+        finally:
+            self.__depth -= 1
+            self.__stop(name, start, _n_rows(df), extra)
+
+    def track(self, name=None):
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.step(name or func.__name__) as step:
+                    out = func(*args, **kwargs)
+                    if hasattr(out, '__len__'):
+                        step['rows'] = _n_rows(out)
+                return out
+            return wrapper
+        return decorator
+
+    def lap(self, name, df=None):
+        # 직전 lap 을 끝내고 (df 는 끝나는 lap 의 결과, 행 수 기록용) name 단계를 시작
+        if not self.enabled:
+            return
+        self.lap_end(df)
+        self.__lap = (name, self.__start())
+
+    def lap_end(self, df=None):
+        if self.__lap is not None:
+            name, start = self.__lap
+            self.__lap = None
+            self.__stop(name, start, _n_rows(df))
+
+    def summary(self):
+        self.lap_end()
+        total = sum(r['wall_sec'] for r in self.records if r['depth'] == 0) or 1
+        print(f'[{self.name}] profile')
+        for r in sorted(self.records, key=lambda r: -r['wall_sec']):
+            print(f"    {'  ' * r['depth'] + r['step']:<40} {r['wall_sec']:9.2f}s ({100 * r['wall_sec'] / total:5.1f}%) cpu {r['cpu_sec']:9.2f}s rss {r['rss_mb']:8.0f}MB peak {r['step_peak_rss_mb']:8.0f}MB rows {r['rows']}")
+
+    def save(self, out_dir, history_path=None):
+        '''
+        out_dir/profile.json, out_dir/profile.csv 에 이번 실행 기록을 저장
+        history_path 를 주면 실행 시각과 함께 csv 에 누적 (실행 간 성능 비교용)
+        '''
+        if not self.enabled:
+            return
+        self.lap_end()
+        run_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        os.makedirs(out_dir, exist_ok=True)
+        with open(os.path.join(out_dir, 'profile.json'), 'w') as f:
+            json.dump({'name': self.name, 'run_at': run_at, 'steps': self.records}, f, indent=2)
+
+        fields = ['step', 'depth', 'wall_sec', 'cpu_sec', 'rss_mb', 'rss_delta_mb', 'step_peak_rss_mb', 'process_peak_rss_mb', 'rows'] + \
+            (['peak_alloc_mb'] if self.trace_memory else [])
+        with open(os.path.join(out_dir, 'profile.csv'), 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(self.records)
+
+        if history_path is not None:
+            history_fields = ['run_at', 'name'] + fields[:9]
+            if os.path.exists(history_path):
+                with open(history_path, newline='') as f:
+                    header = next(csv.reader(f), None)
+                if header != history_fields:
+                    # 컬럼이 바뀐 예전 기록 (peak_rss_mb 등) 은 <이름>.old.csv 로 옮기고 새로 시작
+                    root, ext = os.path.splitext(history_path)
+                    os.replace(history_path, f'{root}.old{ext}')
+            is_new = not os.path.exists(history_path)
+            with open(history_path, 'a', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=history_fields, extrasaction='ignore')
+                if is_new:
+                    writer.writeheader()
+                for record in self.records:
+                    writer.writerow({'run_at': run_at, 'name': self.name, **record})
@@ -0,0 +1,66 @@
+import os
+import json
+
+import pandas as pd
+
+
+KEY_COLS = ['userID', 'answerCode'] # 항상 같이 읽는 컬럼
+
+
+class FeatureRegistry:
+    '''
+    피쳐 번호 ('05') -> 컬럼 이름, 만든 함수 (producer, ex) fe_05) 와 컬럼 저장 위치
+    컬럼들은 split (train, test) 별 parquet 파일 하나에 저장하고, 읽을 때는 요청한 컬럼만 projection 해서 읽는다.
+    --fe 05 19 로 학습하면 디스크에서 userID, answerCode + 2 개 컬럼만 읽음
+    '''
+    def __init__(self, data_dir, files:dict=None):
+        self.data_dir = data_dir
+        self.files = files or {}  # {split: parquet 파일 이름}
+        self.features = {}        # {번호: {'column': 컬럼 이름, 'producer': 함수 이름}}
+
+    def register(self, column, producer) -> str:
+        num = f'{len(self.features):02}'
+        self.features[num] = {'column': column, 'producer': producer}
+        return num
+
+    def resolve(self, fe) -> list:
+        '''
+        --fe 값들을 컬럼 이름 리스트로 ('all', 번호, 컬럼 이름, 함수 이름 모두 가능)
+        fe_20 처럼 함수 이름을 주면 그 함수가 만든 컬럼 전부
+        '''
+        if fe[0] == 'all':
+            return [feature['column'] for feature in self.features.values()]
+
+        cols = []
+        for key in fe:
+            if key in self.features:
+                cols.append(self.features[key]['column'])
+                continue
+            matched = [feature['column'] for feature in self.features.values() if key in (feature['column'], feature['producer'])]
+            if not matched:
+                raise KeyError(f'{key} 피쳐가 없습니다. new_preprocess.py 의 funcs 에 추가해 다시 만들어 주세요.')
+            cols += matched
+        return list(dict.fromkeys(cols)) # 중복 제거, 순서 유지
+
+    def path(self, split):
+        return os.path.join(self.data_dir, self.files[split])
+
+    def write(self, split, df:pd.DataFrame, file_name):
+        self.files[split] = file_name
+        df.to_parquet(self.path(split), index=False)
+
+    def read(self, split, cols) -> pd.DataFrame:
+        # parquet 는 컬럼 단위로 저장되어 있어서 요청한 컬럼만 디스크에서 읽음
+        return pd.read_parquet(self.path(split), columns=KEY_COLS + list(cols))
+
+    def save(self, file_name):
+        with open(os.path.join(self.data_dir, file_name), 'w') as f:
+            json.dump({'files': self.files, 'features': self.features}, f, indent=2, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, data_dir, file_name):
+        with open(os.path.join(data_dir, file_name)) as f:
+            state = json.load(f)
+        registry = cls(data_dir, state['files'])
+        registry.features = state['features']
+        return registry
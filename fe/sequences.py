@@ -0,0 +1,226 @@
+import os
+import json
+import shutil
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+
+class PackedSequences:
+    '''
+    유저별 시퀀스를 컬럼마다 연속된 배열 하나 + 유저별 [start, end) 위치 (CSR 의 indptr) 로 저장
+    groupby.apply 로 유저 x 컬럼 마다 Series 를 만들지 않아서 빠르고, DataLoader worker 들이 들고 있는 객체 수도 적음
+    - columns : 컬럼 이름 (userID 제외, 원래 컬럼 순서)
+    - values : {컬럼 이름: 전체 행 배열}
+    - users : 유저 i 의 userID, 유저 i 의 행은 values[col][starts[i]:ends[i]]
+    subset() 은 starts/ends 만 골라서 데이터를 복사하지 않음
+    save() / load() 로 컬럼별 .npy 파일에 저장하고 memmap 으로 열 수 있음 (root 가 저장 폴더)
+    memmap 이면 DataLoader worker 들이 같은 page cache 를 읽고, pickle 할 때도 폴더 경로와 유저 위치만 넘김
+    '''
+    def __init__(self, columns, values:dict, users:np.ndarray, starts:np.ndarray, ends:np.ndarray, matrices:dict=None, root=None):
+        self.columns = list(columns)
+        self.values = values
+        self.users = users
+        self.starts = starts
+        self.ends = ends
+        self.matrices = {} if matrices is None else matrices # matrix() 결과, subset 끼리 공유
+        self.root = root
+
+    @classmethod
+    def from_frame(cls, df:pd.DataFrame, user_col='userID'):
+        # groupby(user_col) 와 같이 userID 순서, 유저 안에서는 원래 행 순서
+        user = df[user_col].values
+        if len(user) > 1 and (user[1:] < user[:-1]).any():
+            order = np.argsort(user, kind='stable')
+        else:
+            order = None # 이미 userID 순 (전처리 결과는 보통 정렬되어 있음) -> 복사 없이 그대로
+
+        columns = [col for col in df.columns if col != user_col]
+        values = {col: df[col].values if order is None else df[col].values[order] for col in columns}
+        user = user if order is None else user[order]
+
+        is_start = np.ones(len(user), dtype=bool)
+        is_start[1:] = user[1:] != user[:-1]
+        starts = np.flatnonzero(is_start)
+        ends = np.append(starts[1:], len(user))
+        return cls(columns, values, user[starts], starts, ends)
+
+    def subset(self, index):
+        index = np.asarray(index)
+        return PackedSequences(self.columns, self.values, self.users[index], self.starts[index], self.ends[index], self.matrices, self.root)
+
+    def lengths(self) -> np.ndarray:
+        return self.ends - self.starts
+
+    def column(self, index, col) -> np.ndarray:
+        # 유저 index 의 col 시퀀스 (view)
+        return self.values[col][self.starts[index]:self.ends[index]]
+
+    def matrix(self, cols, dtype) -> np.ndarray:
+        # cols 를 (전체 행 수, 컬럼 수) 배열 하나로 (배치 gather 용), 처음 한 번만 만들고 subset 끼리 공유
+        # memmap 이면 만든 배열도 root 에 저장해서 memmap 으로 엶
+        key = (tuple(cols), np.dtype(dtype).str)
+        if key not in self.matrices and self.root is not None and os.path.exists(self._matrix_path(key)):
+            self.matrices[key] = np.load(self._matrix_path(key), mmap_mode='r')
+        if key not in self.matrices:
+            n = len(next(iter(self.values.values()))) if self.values else 0
+            if cols:
+                matrix = np.stack([self.values[col] for col in cols], axis=1).astype(dtype)
+            else:
+                matrix = np.zeros((n, 0), dtype=dtype)
+            if self.root is not None:
+                _save_npy(self._matrix_path(key), matrix)
+                matrix = np.load(self._matrix_path(key), mmap_mode='r')
+            self.matrices[key] = matrix
+        return self.matrices[key]
+
+    def _matrix_path(self, key):
+        return os.path.join(self.root, f'matrix-{hashlib.sha1(repr(key).encode()).hexdigest()}.npy')
+
+    def last_window(self, index, max_len):
+        '''
+        유저들의 마지막 max_len 개 행 위치를 왼쪽 패딩으로 (유저 수, max_len) 에 맞춘 위치 배열과 mask
+        패딩 자리는 mask 가 False 이고 위치는 0 (gather 후 0 으로 덮어씀)
+        '''
+        return self.window(index, self.ends[index], max_len)
+
+    def window(self, index, ends, max_len):
+        # last_window 의 일반형, 유저 index 의 ends (전체 행 기준 위치, 미포함) 바로 앞 max_len 개
+        starts = self.starts[index]
+        lengths = np.minimum(ends - starts, max_len)
+        offset = np.arange(max_len) - (max_len - lengths)[:, None]
+        mask = offset >= 0
+        pos = np.where(mask, (ends - lengths)[:, None] + offset, 0)
+        return pos, mask
+
+    def sliding_windows(self, max_len, stride):
+        '''
+        모든 유저 시퀀스를 stride 간격의 max_len 길이 window 들로 나눈 (유저 번호, window 끝 위치) 배열
+        window 끝은 시퀀스 끝에서부터 n, n - stride, ... 이고 마지막 window 는 시퀀스 처음부터 max_len 개 (모든 행이 한 번 이상 들어감)
+        유저별 window 수 = 1 + ceil(max(n - max_len, 0) / stride) 라서 전체 개수를 미리 알 수 있고, 데이터는 복사하지 않음
+        '''
+        n = self.ends - self.starts
+        counts = 1 + -(-np.maximum(n - max_len, 0) // stride)
+        users = np.repeat(np.arange(len(n)), counts)
+        k = np.arange(len(users)) - np.repeat(np.cumsum(counts) - counts, counts) # 유저 안에서 몇 번째 window 인지
+        ends = np.maximum(n[users] - k * stride, np.minimum(n[users], max_len))
+        return users, self.starts[users] + ends
+
+    def save(self, path):
+        '''
+        path 폴더에 컬럼별 배열 (<번호>.npy), users / starts / ends .npy 와 컬럼 이름 (meta.json) 을 저장
+        memmap 으로 읽어야 해서 object 컬럼 (문자열 등) 은 저장할 수 없음
+        '''
+        os.makedirs(path, exist_ok=True)
+        for i, col in enumerate(self.columns):
+            if self.values[col].dtype == object:
+                raise ValueError(f'{col} 컬럼이 object 타입이라 memmap 으로 저장할 수 없습니다. 숫자로 인코딩해 주세요.')
+            np.save(os.path.join(path, f'{i:03}.npy'), self.values[col])
+        for name in ['users', 'starts', 'ends']:
+            np.save(os.path.join(path, f'{name}.npy'), getattr(self, name))
+        with open(os.path.join(path, 'meta.json'), 'w') as f:
+            json.dump({'columns': self.columns}, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path, mmap_mode='r'):
+        # save() 한 폴더를 memmap 으로 열기 (데이터는 읽을 때 page cache 에서 가져옴)
+        with open(os.path.join(path, 'meta.json')) as f:
+            columns = json.load(f)['columns']
+        values = {col: np.load(os.path.join(path, f'{i:03}.npy'), mmap_mode=mmap_mode) for i, col in enumerate(columns)}
+        users, starts, ends = [np.load(os.path.join(path, f'{name}.npy')) for name in ['users', 'starts', 'ends']]
+        return cls(columns, values, users, starts, ends, root=path if mmap_mode else None)
+
+    def __getstate__(self):
+        # memmap 은 pickle 하면 배열 전체가 복사되므로 경로와 유저 위치, matrix 키만 넘기고 worker 에서 다시 엶
+        if self.root is None:
+            return self.__dict__
+        state = {k: v for k, v in self.__dict__.items() if k not in ('values', 'matrices')}
+        state['matrix_keys'] = list(self.matrices)
+        return state
+
+    def __setstate__(self, state):
+        if 'matrix_keys' not in state:
+            self.__dict__.update(state)
+            return
+        matrix_keys = state.pop('matrix_keys')
+        self.__dict__.update(state)
+        self.values = PackedSequences.load(self.root).values
+        self.matrices = {key: np.load(self._matrix_path(key), mmap_mode='r') for key in matrix_keys}
+
+    def __len__(self):
+        return len(self.starts)
+
+
+def cache_key(paths, *params) -> str:
+    # 입력 파일들 (이름, 크기, 수정 시각) + 파라미터 해시, 파일이 바뀌면 키가 바뀜
+    h = hashlib.sha1()
+    for path in paths:
+        stat = os.stat(path)
+        h.update(f'{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}'.encode())
+    h.update(repr(params).encode())
+    return h.hexdigest()
+
+
+def mmap_splits(cache_dir, build) -> dict:
+    '''
+    cache_dir 에 저장한 split 들을 memmap PackedSequences 로 연다. ({split 이름: PackedSequences})
+    없으면 build() 로 {split 이름: PackedSequences} 를 만들어 저장한 뒤 연다.
+    cache_dir 이름은 cache_key (입력 파일 + 파라미터) 라서 입력이 바뀌면 새 폴더가 생기고 예전 폴더는 지우지 않음
+    (다른 프로세스가 쓰고 있을 수 있음), 쓰지 않는 캐시는 상위 폴더 (.seq_cache) 를 통째로 지우면 다음 실행에서 다시 만듦
+    '''
+    if not os.path.exists(cache_dir):
+        # 여러 프로세스가 같은 캐시를 동시에 만들 수 있으므로 임시 폴더에 쓰고 rename
+        tmp_dir = f'{cache_dir}.{os.getpid()}.tmp'
+        for split, data in build().items():
+            data.save(os.path.join(tmp_dir, split))
+        try:
+            os.rename(tmp_dir, cache_dir)
+        except OSError: # 다른 프로세스가 먼저 만듦
+            shutil.rmtree(tmp_dir)
+    return {split: PackedSequences.load(os.path.join(cache_dir, split)) for split in os.listdir(cache_dir)}
+
+
+def _save_npy(path, array):
+    tmp_path = f'{path}.{os.getpid()}.tmp.npy'
+    np.save(tmp_path, array)
+    os.replace(tmp_path, path)
+
+
+def gather_padded(values:np.ndarray, pos:np.ndarray, mask:np.ndarray) -> np.ndarray:
+    # values[pos] 를 한 번에 모으고 패딩 자리는 0
+    out = values[pos]
+    out[~mask] = 0
+    return out
+
+
+class LengthBucketSampler:
+    '''
+    길이가 비슷한 샘플끼리 배치를 만드는 batch sampler (DataLoader(sampler=..., batch_size=None) 와 같이 사용)
+    섞은 순서를 batch_size * bucket_mult 개씩 bucket 으로 자르고, bucket 안에서 길이 순으로 정렬해 배치로 나눈 뒤 배치 순서를 다시 섞음
+    배치마다 최대 길이까지만 패딩하면 (DKTDataset 의 args.bucket) 짧은 유저 배치에서 패딩 계산이 줄어듦
+    '''
+    def __init__(self, lengths, batch_size, shuffle=True, bucket_mult=50):
+        self.lengths = np.asarray(lengths)
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.bucket_mult = bucket_mult
+
+    def __iter__(self):
+        n = len(self.lengths)
+        order = np.random.permutation(n) if self.shuffle else np.arange(n)
+        bucket_size = self.batch_size * self.bucket_mult
+
+        batches = []
+        for i in range(0, n, bucket_size):
+            bucket = order[i:i + bucket_size]
+            bucket = bucket[np.argsort(self.lengths[bucket], kind='stable')]
+            batches += [bucket[j:j + self.batch_size] for j in range(0, len(bucket), self.batch_size)]
+
+        if self.shuffle:
+            batches = [batches[i] for i in np.random.permutation(len(batches))]
+        for batch in batches:
+            yield batch.tolist()
+
+    def __len__(self):
+        return -(-len(self.lengths) // self.batch_size)
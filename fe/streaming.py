@@ -0,0 +1,172 @@
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+
+class UserShards:
+    '''
+    원본 로그를 userID 구간별 샤드 파일로 나눠 저장하고, 샤드 단위로 (train_df, test_df) 를 돌려준다.
+    userID 구간을 연속으로 나누기 때문에 샤드 순서대로 이어 붙이면 userID 정렬 순서가 그대로 유지된다.
+    메모리에는 chunksize 행 또는 샤드 하나만 올라간다.
+    '''
+    def __init__(self, shard_dir, n_shards=8, chunksize=500_000):
+        self.shard_dir = shard_dir
+        self.n_shards = n_shards
+        self.chunksize = chunksize
+        self.edges = None
+
+    def __user_edges(self, paths) -> np.ndarray:
+        # userID 별 행 수를 세서, 샤드마다 행 수가 비슷하도록 userID 경계를 잡는다.
+        counts = pd.Series(dtype=np.float64)
+        for path in paths:
+            for chunk in pd.read_csv(path, usecols=['userID'], chunksize=self.chunksize):
+                counts = counts.add(chunk['userID'].value_counts(), fill_value=0)
+        counts = counts.sort_index()
+        cum = counts.cumsum().values
+        cut = np.searchsorted(cum, cum[-1] * np.arange(1, self.n_shards) / self.n_shards)
+        return np.unique(counts.index.values[cut])
+
+    def split(self, train_path, test_path):
+        if os.path.exists(self.shard_dir):
+            shutil.rmtree(self.shard_dir)
+
+        self.edges = self.__user_edges([train_path, test_path])
+        for kind, path in [('train', train_path), ('test', test_path)]:
+            for i in range(len(self.edges) + 1):
+                os.makedirs(os.path.join(self.shard_dir, kind, f'{i:03d}'))
+
+            reader = pd.read_csv(path, parse_dates=['Timestamp'], chunksize=self.chunksize)
+            for n, chunk in enumerate(reader):
+                shard = np.searchsorted(self.edges, chunk['userID'].values, side='left')
+                for i, part in chunk.groupby(shard, sort=False):
+                    part.to_parquet(os.path.join(self.shard_dir, kind, f'{i:03d}', f'chunk-{n:05d}.parquet'), index=False)
+
+    def __read(self, kind, i) -> pd.DataFrame:
+        shard_dir = os.path.join(self.shard_dir, kind, f'{i:03d}')
+        files = sorted(os.listdir(shard_dir))
+        if not files:
+            return None
+        return pd.concat([pd.read_parquet(os.path.join(shard_dir, f)) for f in files], ignore_index=True)
+
+    def __len__(self):
+        return len(self.edges) + 1
+
+    def __iter__(self):
+        for i in range(len(self)):
+            train_df = self.__read('train', i)
+            test_df = self.__read('test', i)
+            if train_df is None and test_df is None:
+                continue
+            # 빈 샤드도 컬럼은 맞춰서 돌려준다.
+            columns = (train_df if train_df is not None else test_df).columns
+            if train_df is None:
+                train_df = pd.DataFrame(columns=columns).astype(test_df.dtypes)
+            if test_df is None:
+                test_df = pd.DataFrame(columns=columns).astype(train_df.dtypes)
+            yield train_df, test_df
+
+    def clear(self):
+        if os.path.exists(self.shard_dir):
+            shutil.rmtree(self.shard_dir)
+
+
+class GlobalStats:
+    '''
+    샤드마다 부분 집계를 더해가며 전역 통계를 만든다. (1차 aggregation pass)
+    - count/sum : groupby(key).agg(count, percentile) 과 같은 값
+    - median : (key, value) 별 개수를 합쳐두었다가 정확한 중앙값 계산
+    '''
+    def __init__(self):
+        self.sums = {}
+        self.value_counts = {}
+
+    def update(self, name, keys:pd.Series, values:pd.Series):
+        part = values.groupby(keys.values).agg(['size', 'sum'])
+        if name in self.sums:
+            part = self.sums[name].add(part, fill_value=0)
+        self.sums[name] = part
+
+    def update_median(self, name, keys:pd.Series, values:pd.Series):
+        part = pd.DataFrame({'key': keys.values, 'value': values.values}).dropna()
+        part = part.groupby(['key', 'value']).size()
+        if name in self.value_counts:
+            part = self.value_counts[name].add(part, fill_value=0)
+        self.value_counts[name] = part
+
+    def count(self, name) -> pd.Series:
+        return self.sums[name]['size'].astype(np.int64)
+
+    def mean(self, name) -> pd.Series:
+        # np.sum(s) / len(s)
+        return self.sums[name]['sum'] / self.sums[name]['size'].astype(np.int64)
+
+    def median(self, name) -> pd.Series:
+        vc = self.value_counts[name].sort_index().reset_index(name='n')
+        cum = vc.groupby('key')['n'].cumsum()
+        total = vc.groupby('key')['n'].transform('sum')
+
+        # 정렬된 값에서 (n-1)//2, n//2 번째 값의 평균
+        low = vc[cum > (total - 1) // 2].groupby('key')['value'].first()
+        high = vc[cum > total // 2].groupby('key')['value'].first()
+        return (low + high) / 2
+
+
+def remove_frame(path):
+    # <path>.parquet / <path>.csv 를 (파일이든 part 폴더든) 모두 지움
+    # 로더들 (load_frame) 은 parquet 이 있으면 parquet 을 읽으므로, 포맷을 바꿔 다시 저장할 때 다른 포맷의 이전 결과가 남으면 안 됨
+    for file_format in ('parquet', 'csv'):
+        target = f'{path}.{file_format}'
+        if os.path.isdir(target):
+            shutil.rmtree(target)
+        elif os.path.exists(target):
+            os.remove(target)
+
+
+class ShardWriter:
+    '''
+    샤드 결과를 순서대로 이어 쓴다.
+    parquet : <path>.parquet/part-00000.parquet ... (pd.read_parquet(<path>.parquet) 로 한 번에 읽힘)
+    csv : <path>.csv 에 append
+    빈 샤드 결과 (train / test 한쪽에만 있는 유저들) 는 object 컬럼이 parquet null 타입이 되어 다른 part 와 같이 읽히지 않으므로 쓰지 않고,
+    모든 결과가 비었을 때만 close() 에서 하나 씀
+    '''
+    def __init__(self, path, file_format='parquet'):
+        self.file_format = file_format
+        self.path = f'{path}.{file_format}'
+        self.n_parts = 0
+        self.empty = None
+
+        # run() 이 남긴 같은 이름의 결과나 이전 part 폴더는 (다른 포맷 것도) 지우고 새로 씀
+        remove_frame(path)
+        if file_format == 'parquet':
+            os.makedirs(self.path)
+
+    def write(self, df:pd.DataFrame):
+        if df.empty:
+            if self.empty is None:
+                self.empty = df
+            return
+        self.__write(df)
+
+    def close(self):
+        # 쓴 part 가 하나도 없으면 빈 결과라도 남겨서 읽을 수 있게
+        if self.n_parts == 0 and self.empty is not None:
+            self.__write(self.empty)
+
+    def __write(self, df:pd.DataFrame):
+        if self.file_format == 'parquet':
+            df.to_parquet(os.path.join(self.path, f'part-{self.n_parts:05d}.parquet'), index=False, compression='zstd')
+        else:
+            df.to_csv(self.path, index=False, mode='a', header=self.n_parts == 0)
+        self.n_parts += 1
+
+    def __iter__(self):
+        if self.file_format == 'parquet':
+            for n in range(self.n_parts):
+                yield pd.read_parquet(os.path.join(self.path, f'part-{n:05d}.parquet'))
+        else:
+            for chunk in pd.read_csv(self.path, chunksize=500_000):
+                yield chunk
+
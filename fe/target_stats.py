@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+
+from fe import kernels
+
+
+# 자주 쓰는 키 조합 {이름: 키 컬럼들}
+DEFAULT_KEYS = {
+    'user': ['userID'],
+    'item': ['assessmentItemID'],
+    'tag': ['KnowledgeTag'],
+    'test': ['testId'],
+    'user_tag': ['userID', 'KnowledgeTag'],
+    'user_test': ['userID', 'testId'],
+}
+
+
+def expanding_target_stats(df:pd.DataFrame, keys:dict=None, target='answerCode', time_col='Timestamp', smoothing=10, prior=None) -> pd.DataFrame:
+    '''
+    키 조합별로 "그 시점 이전" 풀이 기록만 사용한 누적 정답 통계 (data leakage 없음)
+    - {name}_correct : 이전까지 맞춘 문제 수
+    - {name}_attempts : 이전까지 푼 문제 수
+    - {name}_rate : (correct + smoothing * prior) / (attempts + smoothing), 기록이 없으면 prior
+    :param keys: {이름: 키 컬럼 리스트}, None 이면 DEFAULT_KEYS
+    :param time_col: 이 컬럼 순서로 이전/이후를 판단 (같은 시각의 풀이는 서로 집계에 넣지 않음), None 이면 행 순서만 사용
+    :param prior: 전체 평균 정답률, None 이면 target 이 있는 행의 평균
+    target 이 -1 (test 의 마지막 문제) 인 행은 피쳐는 받지만 집계에는 들어가지 않는다.
+    '''
+    keys = DEFAULT_KEYS if keys is None else keys
+
+    y = df[target].values
+    labeled = y >= 0
+    y = np.where(labeled, y, 0).astype(np.float64)
+    n = labeled.astype(np.float64)
+    if prior is None:
+        prior = y.sum() / max(n.sum(), 1)
+
+    # 시간 순서, 같은 시각은 같은 순위 (time_col 이 None 이면 행 순서라 순위가 모두 다름)
+    if time_col is None:
+        time_rank = np.arange(len(df), dtype=np.int64)
+    else:
+        time_rank = np.unique(kernels.to_epoch(df[time_col]), return_inverse=True)[1].astype(np.int64).reshape(-1)
+
+    codes = {}
+    out = pd.DataFrame(index=df.index)
+    for name, cols in keys.items():
+        gid = np.zeros(len(df), dtype=np.int64)
+        for col in cols:
+            if col not in codes:
+                codes[col] = pd.factorize(df[col])
+            col_codes, uniques = codes[col]
+            gid = gid * (len(uniques) + 1) + col_codes + 1
+        order = np.argsort(gid * len(df) + time_rank, kind='stable')
+        g, t = gid[order], time_rank[order]
+        is_start = np.ones(len(g), dtype=bool)
+        is_start[1:] = g[1:] != g[:-1]
+        # 같은 그룹, 같은 시각인 행들은 그 시각의 첫 행 값 (그 시각 이전 풀이만) 을 같이 씀
+        is_tie_start = is_start.copy()
+        is_tie_start[1:] |= t[1:] != t[:-1]
+        tie_base = np.maximum.accumulate(np.where(is_tie_start, np.arange(len(g)), 0))
+
+        # 그룹 안에서 자기 자신과 같은 시각의 풀이를 제외한 누적합
+        correct = _exclusive_segment_cumsum(y[order], is_start)[tie_base]
+        attempts = _exclusive_segment_cumsum(n[order], is_start)[tie_base]
+
+        restored_correct = np.empty_like(correct)
+        restored_correct[order] = correct
+        restored_attempts = np.empty_like(attempts)
+        restored_attempts[order] = attempts
+
+        out[f'{name}_correct'] = restored_correct
+        out[f'{name}_attempts'] = restored_attempts.astype(np.int64)
+        out[f'{name}_rate'] = (restored_correct + smoothing * prior) / (restored_attempts + smoothing)
+    return out
+
+
+def _exclusive_segment_cumsum(values:np.ndarray, is_start:np.ndarray) -> np.ndarray:
+    cs = np.cumsum(values) - values
+    # 구간 시작 위치의 누적합을 빼서 구간마다 0 부터 시작
+    base = np.maximum.accumulate(np.where(is_start, np.arange(len(values)), 0))
+    return cs - cs[base]
@@ -0,0 +1,94 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+
+class CategoryVocab:
+    '''
+    _c 컬럼들의 카테고리 사전. 한 번 fit 해서 json 으로 저장해두고 train / test / 추론에서 같은 코드를 쓴다.
+    - 0 : 시계열 패딩
+    - 1 : 결측 or 처음 보는 값 (unknown)
+    - 2 ~ : 컬럼별 정렬된 카테고리 순서 (OrdinalEncoder 와 같은 순서)
+    전체 코드(stack=True)는 컬럼마다 offset 을 더해 하나의 임베딩 테이블에 들어가도록 이어 붙인 값이고,
+    컬럼 코드(stack=False)는 offset 없이 2 부터 시작하는 값이다.
+    '''
+    PAD = 0
+    UNK = 1
+
+    def __init__(self, categories:dict=None):
+        self.categories = {} # {컬럼: 정렬된 카테고리 pd.Index}
+        self.offsets = {}    # {컬럼: 해당 컬럼의 첫 카테고리 코드}
+        self.size = 2        # 임베딩 테이블 크기 (패딩, unknown 포함)
+        self.__uniques = {}
+        if categories is not None:
+            self.__uniques = {col: np.asarray(values) for col, values in categories.items()}
+            self.build()
+
+    @property
+    def columns(self) -> list:
+        return list(self.categories)
+
+    def partial_fit(self, df:pd.DataFrame, cate_cols=None):
+        # 여러 청크/샤드에 나눠서 fit 할 때, 값만 모아두고 마지막에 build()
+        cate_cols = cate_cols or [col for col in df.columns if col[-2:] == '_c']
+        for col in cate_cols:
+            _, uniques = pd.factorize(df[col])
+            uniques = np.asarray(uniques)
+            if col in self.__uniques:
+                _, uniques = pd.factorize(np.concatenate([self.__uniques[col], uniques]))
+                uniques = np.asarray(uniques)
+            self.__uniques[col] = uniques
+        return self
+
+    def build(self):
+        self.categories = {col: pd.Index(np.sort(uniques)) for col, uniques in self.__uniques.items()}
+        self.offsets = {}
+        offset = 2
+        for col, categories in self.categories.items():
+            self.offsets[col] = offset
+            offset += len(categories)
+        self.size = offset
+        return self
+
+    def fit(self, df:pd.DataFrame, cate_cols=None):
+        return self.partial_fit(df, cate_cols).build()
+
+    def encode(self, values:pd.Series, col, stack=True) -> np.ndarray:
+        codes = self.categories[col].get_indexer(values) # 처음 보는 값/결측은 -1
+        offset = self.offsets[col] if stack else 2
+        return np.where(codes < 0, self.UNK, codes + offset).astype(np.int32)
+
+    def transform(self, df:pd.DataFrame, stack=True) -> pd.DataFrame:
+        df = df.copy()
+        for col in self.categories:
+            df[col] = self.encode(df[col], col, stack)
+        return df
+
+    def stack(self, df:pd.DataFrame) -> pd.DataFrame:
+        # 컬럼 코드(stack=False) -> 전체 코드. 일부 컬럼만 쓸 때는 subset(cols).stack(df)
+        df = df.copy()
+        for col, offset in self.offsets.items():
+            codes = df[col].values
+            df[col] = np.where(codes < 2, codes, codes - 2 + offset).astype(np.int32)
+        return df
+
+    def subset(self, cols):
+        return CategoryVocab({col: self.categories[col].values for col in cols})
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump({
+                'columns': self.columns,
+                'categories': {col: categories.tolist() for col, categories in self.categories.items()},
+                'offsets': self.offsets,
+                'size': self.size,
+            }, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, 'r') as f:
+            config = json.load(f)
+        vocab = cls({col: config['categories'][col] for col in config['columns']})
+        assert vocab.offsets == config['offsets'] and vocab.size == config['size']
+        return vocab
@@ -1,5 +1,6 @@
 #!/bin/bash
 pip install pandas
+pip install pyarrow
 pip install scikit-learn
 pip install wandb
 conda install -y pytorch==1.11.0 torchvision==0.12.0 torchaudio==0.11.0 cudatoolkit=11.3 -c pytorch
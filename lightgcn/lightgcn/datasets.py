@@ -29,6 +29,14 @@ def prepare_dataset(device, basepath, fe_num, verbose=True, logger=None):
     return train_data_proc, valid_data_proc, test_data_proc, len(id2index)
 
 
+def load_frame(data_dir, name):
+    # parquet 이 있으면 parquet, 없으면 csv
+    path = os.path.join(data_dir, name)
+    if os.path.exists(path + ".parquet"):
+        return pd.read_parquet(path + ".parquet")
+    return pd.read_csv(path + ".csv")
+
+
 def load_data(basepath, fe_num):
     # path1 = os.path.join(basepath, "train_data.csv")
     # path2 = os.path.join(basepath, "test_data.csv")
@@ -37,10 +45,9 @@ def load_data(basepath, fe_num):
 
     # data = pd.concat([data1, data2])
 
-    path1 = os.path.join(basepath, f"FE{fe_num}", "train_data.csv")
-    path2 = os.path.join(basepath, f"FE{fe_num}", "test_data.csv")
-    train = pd.read_csv(path1) # merged_train
-    test = pd.read_csv(path2)
+    data_dir = os.path.join(basepath, f"FE{fe_num}")
+    train = load_frame(data_dir, "train_data") # merged_train
+    test = load_frame(data_dir, "test_data")
 
     train.drop_duplicates(
         subset=["userID", "assessmentItemID_c"], keep="last", inplace=True
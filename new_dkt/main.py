@@ -50,15 +50,15 @@ def main(config):
     total_preds = np.zeros(len(y_test), dtype=np.float32)
     for i, (train_index, valid_index) in enumerate(kf.split(X_train)):
 
-        X_train_fold = X_train.iloc[train_index]
-        X_valid_fold = X_train.iloc[valid_index]
+        X_train_fold = X_train.subset(train_index)
+        X_valid_fold = X_train.subset(valid_index)
 
-        y_train_fold = y_train.iloc[train_index]
-        y_valid_fold = y_train.iloc[valid_index]
+        y_train_fold = y_train.subset(train_index)
+        y_valid_fold = y_train.subset(valid_index)
 
 
-        train_loader = get_loader(config, X_train_fold, y_train_fold, shuffle=True)
-        valid_loader = get_loader(config, X_valid_fold, y_valid_fold, shuffle=False)
+        train_loader = get_loader(config, X_train_fold, y_train_fold, shuffle=True, bucket=config.bucket)
+        valid_loader = get_loader(config, X_valid_fold, y_valid_fold, shuffle=False, bucket=config.bucket)
         config.k_i = i + 1   
 
         # torch model, lightning model ready
@@ -160,6 +160,8 @@ if __name__ == '__main__':
 
 
     parser.add_argument("--seq_len", default=32, type=int)
+    parser.add_argument("--mmap", default=0, type=int) # 1 이면 유저 시퀀스를 data/.seq_cache 에 .npy 로 저장하고 memmap 으로 읽음 (예전 캐시는 안 지워짐, rm -r data/.seq_cache)
+    parser.add_argument("--bucket", default=0, type=int) # 1 이면 학습/검증 배치를 길이가 비슷한 유저끼리 묶고 배치 최대 길이까지만 패딩
     parser.add_argument("--hidden_size", default=256, type=int)
     parser.add_argument("--num_layers", default=1, type=int)
 
@@ -1,11 +1,19 @@
+import os
+import sys
 import pandas as pd
 import numpy as np
 import torch
 import torch.nn as nn
-from torch.utils.data import DataLoader, Dataset
+from torch.utils.data import DataLoader, Dataset, BatchSampler, RandomSampler, SequentialSampler
 from sklearn.model_selection import train_test_split
 from tqdm import tqdm
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from fe.vocab import CategoryVocab
+from fe.sequences import PackedSequences, LengthBucketSampler, gather_padded, cache_key, mmap_splits
+
+VOCAB_PATH = '/opt/ml/level2_dkt_recsys-level2-recsys-11/data/new_dkt_vocab.json'
+
 
 def _label_encoding(config, train_data, test_data):
     merge = pd.concat([train_data, test_data], axis=0)
@@ -14,100 +22,110 @@ def _label_encoding(config, train_data, test_data):
     config.cate_cols = [col for col in merge.columns if col in config.cate_cols]
     config.cont_cols = [col for col in merge.columns if col in config.cont_cols]
 
-    col2idx = [{v: k for k, v in enumerate(merge[col].unique())} \
-        for col in merge.columns if col in config.cate_cols]
-
-    for i, col in tqdm(enumerate(config.cate_cols), desc='cate label encoding', total=len(config.cate_cols)):
-        merge[col] = merge[col].map(col2idx[i])
+    # 카테고리 사전은 한 번만 만들어 저장하고 이후 학습/추론에서는 불러서 씀
+    # 0 은 시계열 패딩, 1 은 unknown, 2 ~ 는 컬럼별 카테고리 (offset 은 모델에서 더함)
+    if os.path.exists(VOCAB_PATH):
+        vocab = CategoryVocab.load(VOCAB_PATH)
+    if not os.path.exists(VOCAB_PATH) or any(col not in vocab.categories for col in config.cate_cols):
+        vocab = CategoryVocab().fit(merge, config.cate_cols)
+        vocab.save(VOCAB_PATH)
+    vocab = vocab.subset(config.cate_cols)
+    merge = vocab.transform(merge, stack=False)
 
     config.cate2idx = {v: k for k, v in enumerate(config.cate_cols)}
     config.cont2idx = {v: k for k, v in enumerate(config.cont_cols)}
     
-    config.cate_offsets = [merge[col].nunique() for col in merge.columns if col in config.cate_cols]
+    config.cate_offsets = [len(vocab.categories[col]) + 1 for col in config.cate_cols]
     return merge.iloc[:len(train_data)], merge.iloc[len(train_data):]
 
 
 class DKTDataset(Dataset):
+    '''
+    유저 i 의 마지막 seq_len 개 풀이 (cate, cont, mask, answer), 시계열이 부족하면 앞을 0 으로 패딩
+    index 가 리스트/배열이면 배치 전체를 한 번에 gather + 패딩해서 돌려줌 (get_loader 에서 배치 index 를 넘김)
+    config.bucket 이면 배치는 seq_len 이 아니라 배치 안 최대 길이까지만 패딩 (최소 2, SAKT 가 [:, :-1] 을 씀)
+    '''
     def __init__(self, config, X, y):
         self.config = config
-        self.X = X.reset_index(drop=True)
-        self.y = y.reset_index(drop=True)
+        self.X = X
+        self.y = y
+        # 컬럼 구분과 (행 수, 컬럼 수) 배열은 한 번만 만듦 (fold 끼리 공유)
+        self.cate_names = [col for col in X.columns if col in self.config.cate_cols]
+        self.cont_names = [col for col in X.columns if col in self.config.cont_cols]
+        self._load_matrices()
+
+    def _load_matrices(self):
+        self.cate = self.X.matrix(self.cate_names, np.int64) # 시계열 부족(패딩)이 0, unknown 은 1 (vocab 에서 이미 반영)
+        self.cont = self.X.matrix(self.cont_names, np.float32)
+        self.answer = self.y.matrix(['answerCode'], np.float32)[:, 0]
+
+    def __getstate__(self):
+        # DataLoader worker (spawn / forkserver) 로 넘길 때 배열은 빼고 X, y 만 (memmap 이면 경로만 넘어가고 worker 에서 다시 엶)
+        return {k: v for k, v in self.__dict__.items() if k not in ('cate', 'cont', 'answer')}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._load_matrices()
         
     def __getitem__(self, index):
-        user_seq_len = len(self.X[index][0])
-        cate_cols = [col.values.copy() + 1 for col in self.X[index] if col.name in self.config.cate_cols] 
-        # 시계열 패딩 용 + 1. 이제 unknown 은 1 이 됨. 시계열 부족이 0
-            
-        cont_cols = [col.values.copy() for col in self.X[index] if col.name in self.config.cont_cols] 
-        # cont 는 시계열 패딩을 어떻게..? # 마지막 최근 시계열 값으로 앞 시계열 채우겠습니다. 일단은.
-
-        answer = self.y[index][0].values.astype(np.float32)
-        
-        if user_seq_len >= self.config.seq_len:
-            if cate_cols:
-                for i, col in enumerate(cate_cols):
-                    cate_cols[i] = col[-self.config.seq_len:]
-            if cont_cols: # cont feature 가 없을 수도 있음.
-                for i, col in enumerate(cont_cols):
-                    cont_cols[i] = col[-self.config.seq_len:]
-            mask = np.ones(self.config.seq_len, dtype=np.int64) # Byte Tensor 를 씀
-            answer = answer[-self.config.seq_len:]
-        else:
-            if cate_cols:
-                for i in range(len(cate_cols)):
-                    new_col = np.zeros(self.config.seq_len, np.int64)
-                    new_col[-user_seq_len:] = cate_cols[i]
-                    cate_cols[i] = new_col
-            if cont_cols:
-                for i in range(len(cont_cols)):
-                    new_col = np.zeros(self.config.seq_len, dtype=np.float32)
-                    # new_col[:seq_len] = cont_cols[i][0] # cont 의 시계열이 부족하면 가장 앞 데이터로 채움.
-                    new_col[-user_seq_len:] = cont_cols[i]
-                    cont_cols[i] = new_col
-
-            mask = np.zeros(self.config.seq_len, dtype=np.int64)
-            mask[-user_seq_len:] = 1
-            new_answer = np.zeros(self.config.seq_len, dtype=np.float32)
-            new_answer[-user_seq_len:] = answer
-            answer = new_answer
-
-        cate_cols = np.array(cate_cols).T.astype(np.int64)
-        cont_cols = np.array(cont_cols).T.astype(np.float32)
-
+        is_batch = np.ndim(index) > 0
+        index = np.atleast_1d(index)
+        pos, mask = self.X.last_window(index, self.config.seq_len) # X, y 는 같은 DataFrame 에서 만들어 행 위치가 같음
+        if is_batch and getattr(self.config, 'bucket', 0):
+            seq_len = max(int(mask.sum(1).max()), 2)
+            pos, mask = pos[:, -seq_len:], mask[:, -seq_len:]
+
+        cate_cols = gather_padded(self.cate, pos, mask)
+        cont_cols = gather_padded(self.cont, pos, mask)
+        answer = gather_padded(self.answer, pos, mask)
+        # 컬럼이 없으면 예전 np.array([]).T 와 같이 (배치,) 0 길이
+        if not self.cate_names:
+            cate_cols = np.zeros((len(index), 0), dtype=np.int64)
+        if not self.cont_names:
+            cont_cols = np.zeros((len(index), 0), dtype=np.float32)
+        mask = mask.astype(np.int64)
+
+        if not is_batch:
+            return cate_cols[0], cont_cols[0], mask[0], answer[0]
         return cate_cols, cont_cols, mask, answer
 
+    def sample_lengths(self):
+        # 샘플별 패딩 전 길이 (LengthBucketSampler 용)
+        return np.minimum(self.y.lengths(), self.config.seq_len)
+
     def __len__(self):
         return len(self.y)
 
 
 def get_data(config, is_train):
-    train_data = pd.read_csv('/opt/ml/level2_dkt_recsys-level2-recsys-11/data/eda_train_data.csv')
-    test_data = pd.read_csv('/opt/ml/level2_dkt_recsys-level2-recsys-11/data/eda_test_data.csv')
+    train_path = '/opt/ml/level2_dkt_recsys-level2-recsys-11/data/eda_train_data.csv'
+    test_path = '/opt/ml/level2_dkt_recsys-level2-recsys-11/data/eda_test_data.csv'
+    train_data = pd.read_csv(train_path)
+    test_data = pd.read_csv(test_path)
 
     le_train_data, le_test_data = _label_encoding(config, train_data, test_data)
-
-    if is_train:
-        X = le_train_data.drop('Timestamp', axis=1).groupby('userID').apply(
-            lambda df: tuple([df[col] for col in df.columns if col not in ['userID', 'answerCode']])
-        )
-
-        y = le_train_data.drop('Timestamp', axis=1).groupby('userID').apply(
-            lambda df: tuple([df[col] for col in df.columns if col == 'answerCode'])
-        )
-    
+    le_data = (le_train_data if is_train else le_test_data).drop('Timestamp', axis=1)
+
+    def build():
+        # 유저별 시퀀스를 컬럼 배열 + 유저 위치로 저장 (X: userID, answerCode 제외한 피쳐, y: answerCode)
+        X = le_data.drop('answerCode', axis=1)
+        if getattr(config, 'mmap', 0):
+            X = X[['userID'] + [col for col in X.columns if col in config.cate_cols + config.cont_cols]] # memmap 은 숫자 컬럼만 저장 가능
+        return {
+            'X': PackedSequences.from_frame(X),
+            'y': PackedSequences.from_frame(le_data[['userID', 'answerCode']]),
+        }
+
+    if getattr(config, 'mmap', 0):
+        # .npy 로 저장해두고 memmap 으로 읽음 -> DataLoader worker 8 개가 같은 page cache 를 공유
+        key = cache_key([train_path, test_path, VOCAB_PATH], config.cate_cols, config.cont_cols, is_train)
+        data = mmap_splits(os.path.join(os.path.dirname(train_path), '.seq_cache', key), build)
     else:
-        X = le_test_data.drop('Timestamp', axis=1).groupby('userID').apply(
-            lambda df: tuple([df[col] for col in df.columns if col not in ['userID', 'answerCode']])
-        )
+        data = build()
+    return data['X'], data['y']
 
-        y = le_test_data.drop('Timestamp', axis=1).groupby('userID').apply(
-            lambda df: tuple([df[col] for col in df.columns if col == 'answerCode'])
-        )
 
-    return X, y
-
-
-def get_loader(config, X, y, shuffle=False):
+def get_loader(config, X, y, shuffle=False, bucket=False):
 
     dataset = DKTDataset(
         config=config,
@@ -115,11 +133,18 @@ def get_loader(config, X, y, shuffle=False):
         y=y
     )
 
+    # 배치 index 리스트를 dataset 에 바로 넘겨서 배치 단위로 gather (유저별 collate 없음)
+    # bucket 이면 길이가 비슷한 유저끼리 배치 (순서가 바뀌므로 추론용 loader 에는 쓰지 않음)
+    if bucket:
+        batch_sampler = LengthBucketSampler(dataset.sample_lengths(), config.batch_size, shuffle)
+    else:
+        sampler = RandomSampler(dataset) if shuffle else SequentialSampler(dataset)
+        batch_sampler = BatchSampler(sampler, config.batch_size, drop_last=False)
     loader = DataLoader(
         dataset=dataset,
         num_workers=8,
-        shuffle=shuffle,
-        batch_size=config.batch_size
+        sampler=batch_sampler,
+        batch_size=None
     )
 
-    return loader
\ No newline at end of file
+    return loader
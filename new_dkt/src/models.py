@@ -135,7 +135,7 @@ class LSTM(nn.Module):
         # x = torch.cat([inter_emb, assess_emb], dim=-1)
         x = torch.cat([inter_emb, assess_emb, know_emb, testid_emb, testid_avg_emb, assess_avg_emb], dim=-1)
         x = self.projection_layer(x)
-        hs, _ = self.lstm_layer(x)
+        hs, _ = packed_rnn(self.lstm_layer, x, mask) # 패딩 step 은 건너뜀, 시간 축은 x 의 dim 1
 
         out = self.fc(hs)
         return out.squeeze(-1) 
@@ -154,18 +154,11 @@ class SAKT(nn.Module):
 
         self.Poistion_layer = nn.Embedding(config.seq_len - 1, config.attention_size)
 
-        self.attentions = []
-        for i in range(config.num_heads):
-            self.attentions.append(
-                nn.ModuleDict(
-                    {
-                        f'Q{i}': nn.Linear(config.attention_size, (config.attention_size // 3) * 2, bias=True),
-                        f'K{i}': nn.Linear(config.attention_size, (config.attention_size // 3) * 2, bias=True),
-                        f'V{i}': nn.Linear(config.attention_size, (config.attention_size // 3) * 2, bias=True),
-                    }
-                )
-            )
-        self.attentions = nn.ModuleList(self.attentions)
+        # Q 는 M_hat, K / V 는 E_hat 에서
+        self.attention_layer = MultiHeadAttention(
+            config.attention_size, (config.attention_size // 3) * 2, config.num_heads, kv_dim=config.attention_size, bias=True
+        )
+        self.mask_layer = TriuMask(config.batch_size, config.seq_len - 1)
 
 
         self.W0_layer = nn.Linear(((config.attention_size // 3) * 2) * config.num_heads, config.attention_size, bias=False)
@@ -185,9 +178,9 @@ class SAKT(nn.Module):
 
     
     def forward(self, cate_x: torch.Tensor, cont_x: torch.Tensor, mask: torch.Tensor, targets):
-        new_mask = torch.ones((cate_x.size(0), self.config.seq_len - 1)).to(cate_x.get_device())
-        new_mask = (torch.triu(new_mask, diagonal=-1) * 100000) - 100000
-        new_mask.requires_grad = False
+        # seq_len 기준 mask 의 뒤쪽만 사용 (--bucket 이면 배치 길이가 seq_len 보다 짧음)
+        seq_len = cate_x.size(1)
+        new_mask = self.mask_layer(cate_x.size(0), seq_len - 1)
 
         assessments = cate_x[:, :-1, 0]
         interactions = targets.clone()[:, :-1]
@@ -195,29 +188,14 @@ class SAKT(nn.Module):
         y = (assessments + interactions * (self.config.cate_offsets[0])).long()
         next_assessments = cate_x[:, 1:, 0]
 
-        positions = self.Poistion_layer(torch.arange(self.config.seq_len - 1).unsqueeze(0).to(cate_x.get_device()))
+        positions = self.Poistion_layer(torch.arange(self.config.seq_len - seq_len, self.config.seq_len - 1).unsqueeze(0).to(cate_x.get_device()))
         
         M_hat = (self.M_layer(y) + positions).transpose(0, 1)
         E_hat = self.E_layer(next_assessments).transpose(0, 1) # 여기에 문제정보 더 추가해서 콘캣하는게 좋겠다.
         # assessment_infos = self.comb_layer(cate_x, cont_x)
         # E_hat = torch.cat([E_hat, assessment_infos[:, 1:, :]], dim=-1)
 
-        E_for_K = E_hat
-        E_for_V = E_hat
-
-        Zs = []
-        for i in range(self.config.num_heads):
-            Q = self.attentions[i][f'Q{i}'](M_hat)
-            K = self.attentions[i][f'K{i}'](E_for_K)
-            V = self.attentions[i][f'V{i}'](E_for_V)
-            score = torch.matmul(Q, K.transpose(-2, -1))
-            score = torch.div(score, Q.size(-1) ** 0.5)
-            score = score + new_mask.transpose(0, 1).unsqueeze(-1)
-            score = torch.softmax(score, dim=-1)
-            Z = torch.matmul(score, V)
-            Zs.append(Z)
-
-        Zs = torch.cat(Zs, dim=-1)
+        Zs = self.attention_layer(M_hat, E_hat, attn_mask=new_mask.transpose(0, 1).unsqueeze(-1)) # K, V 모두 E_hat
 
         z = self.W0_layer(Zs)
 
@@ -284,7 +262,7 @@ class LSTMATTN(nn.Module):
         x = torch.cat([inter_emb, cate_emb, cont_emb], dim=-1)
         x = self.projection_layer(x)
 
-        out, _ = self.lstm(x)
+        out, _ = packed_rnn(self.lstm, x, mask) # 패딩 step 은 건너뜀
 
         time_pad_mask = (mask.unsqueeze(-1) * 10000) - 10000 # B, S, 1 로 변경, 시계열 마스크
         last_query_mask = torch.zeros((mask.size(0), mask.size(1))).to(mask.get_device())
@@ -324,28 +302,11 @@ class LastQuery(nn.Module):
         # 포지셔널 인코딩
         self.poistion_layer = nn.Embedding(config.seq_len, config.attention_size)
 
-        # 멀티 헤드 셀프 어텐션
-        self.attentions = []
-        for i in range(config.num_heads):
-            self.attentions.append(
-                nn.ModuleDict(
-                    {
-                        f'Q{i}': nn.Sequential(
-                            nn.Linear(config.attention_size, (config.attention_size // 3) * 2, bias=True),
-                            nn.Dropout(config.drop_out)
-                        ),
-                        f'K{i}': nn.Sequential(
-                            nn.Linear(config.attention_size, (config.attention_size // 3) * 2, bias=True),
-                            nn.Dropout(config.drop_out)
-                        ),
-                        f'V{i}': nn.Sequential(
-                            nn.Linear(config.attention_size, (config.attention_size // 3) * 2, bias=True),
-                            nn.Dropout(config.drop_out)
-                        )
-                    }
-                )
-            )
-        self.attentions = nn.ModuleList(self.attentions)
+        # 멀티 헤드 셀프 어텐션 (score 는 head 크기가 아니라 attention_size 로 나눔)
+        self.attention_layer = MultiHeadAttention(
+            config.attention_size, (config.attention_size // 3) * 2, config.num_heads,
+            bias=True, scale=config.attention_size ** -0.5, dropout=config.drop_out
+        )
 
         # 헤드 합쳐주는 레이어
         self.W =  nn.Linear(((config.attention_size // 3) * 2) * config.num_heads, config.attention_size, bias=False)
@@ -393,18 +354,7 @@ class LastQuery(nn.Module):
         last_query_mask[-1, :] += 10001
         last_query_mask -= 10000
         last_query_mask = last_query_mask.unsqueeze(-1)
-        Zs = []
-        for i in range(self.config.num_heads):
-            Q = self.attentions[i][f'Q{i}'](x)
-            K = self.attentions[i][f'K{i}'](x)
-            V = self.attentions[i][f'V{i}'](x)
-            score = torch.matmul(Q, K.transpose(-2, -1))
-            score = torch.div(score, self.config.attention_size ** 0.5) + last_query_mask + time_pad_mask
-            score = torch.softmax(score, dim=-1)
-            Z = torch.matmul(score, V)
-            Zs.append(Z)
-
-        Zs = torch.cat(Zs, dim=-1)
+        Zs = self.attention_layer(x, attn_mask=last_query_mask + time_pad_mask)
   
         z = self.W(Zs)
 
@@ -415,7 +365,7 @@ class LastQuery(nn.Module):
         out = self.norm2(a + z) # 스킵 커넥션
         # out = self.fc(out[:, -1:, :])
         
-        hs, _ = self.lstm_layer(out)
+        hs, _ = packed_rnn(self.lstm_layer, out, mask) # 패딩 step 은 건너뜀, 마지막 위치가 마지막 실제 step
 
         if self.config.leak:
             out = self.fc(hs)
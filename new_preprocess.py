@@ -4,44 +4,121 @@ import numpy as np
 from datetime import datetime
 from tqdm import tqdm
 import time
+import inspect
+import threading
 import warnings
 warnings.filterwarnings("ignore")
 from typing import Tuple
+from concurrent.futures import ThreadPoolExecutor
 
 from sklearn.preprocessing import OrdinalEncoder
 
+from fe.vocab import CategoryVocab
+from fe.target_stats import expanding_target_stats, DEFAULT_KEYS
+from fe.profiling import StepProfiler
+from fe.ingest import read_raw
+from fe.embedding import embedding_table, lookup
+from fe.registry import FeatureRegistry, KEY_COLS
+from fe import kernels
+
 BASE_DATA_PATH = '/opt/ml/level2_dkt_recsys-level2-recsys-11/data/'
 
+class SharedInputs:
+    '''
+    fe_XX 함수들이 공통으로 쓰는 전처리 결과를 한 번만 계산해서 공유 (처음 쓸 때 계산, 스레드 안전)
+    - gid(keys) : groupby(keys) 그룹 번호 (kernels.group_ids)
+    - group_shift(col, keys, k) : 그룹 번호로 groupby 한 shift (문자열 키로 매번 groupby 하지 않음)
+    - epoch : Timestamp 를 int64 (ns) 로 바꾼 배열
+    '''
+    def __init__(self, df: pd.DataFrame):
+        self.df = df
+        self.__cache = {}
+        self.__lock = threading.Lock()
+
+    def __get(self, key, make):
+        with self.__lock:
+            if key not in self.__cache:
+                self.__cache[key] = make()
+            return self.__cache[key]
+
+    def gid(self, keys) -> np.ndarray:
+        keys = [keys] if isinstance(keys, str) else list(keys)
+        return self.__get(('gid',) + tuple(keys), lambda: kernels.group_ids(self.df, keys))
+
+    @property
+    def epoch(self) -> np.ndarray:
+        return self.__get('epoch', lambda: kernels.to_epoch(self.df['Timestamp']))
+
+    def group_shift(self, col, keys, periods=1) -> pd.Series:
+        # df.groupby(keys)[[col]].shift(periods)[col] 와 같은 값
+        return self.df[col].groupby(self.gid(keys)).shift(periods)
+
+
 class EDA:
-    def __init__(self, is_merge: bool=True, is_new: bool=False):
+    def __init__(self, is_merge: bool=True, is_new: bool=False, profile: bool=True):
         self.is_merge = is_merge
         self.is_new = is_new
+        # fe_XX 함수별 시간/메모리 기록, BASE_DATA_PATH/EDA_profile 에 저장
+        self.profiler = StepProfiler('EDA_new' if is_new else 'EDA', enabled=profile)
 
+        # Timestamp 는 이미 datetime 으로 읽힘 (원본 csv 마다 한 번만 파싱, .raw_cache)
         if is_new:
-            self.train_df = pd.read_csv(os.path.join(BASE_DATA_PATH, 'new_train_data.csv'))
+            self.train_df = read_raw(os.path.join(BASE_DATA_PATH, 'new_train_data.csv'))
         else:
-            self.train_df = pd.read_csv(os.path.join(BASE_DATA_PATH, 'train_data.csv'))
-        self.test_df = pd.read_csv(os.path.join(BASE_DATA_PATH, 'test_data.csv'))
+            self.train_df = read_raw(os.path.join(BASE_DATA_PATH, 'train_data.csv'))
+        self.test_df = read_raw(os.path.join(BASE_DATA_PATH, 'test_data.csv'))
         
         if is_merge:
             self.train_df = \
                 pd.concat([self.train_df, self.test_df[self.test_df['answerCode'] != -1]])
 
-        # eda 처리용 데이터셋들
-        self.base_train_df = self.train_df.copy()
-        self.base_test_df = self.test_df.copy()
+        # eda 처리용 데이터셋들 (fe_XX 함수에는 얕은 복사만 넘기므로 원본을 그대로 둠)
+        self.base_train_df = self.train_df
+        self.base_test_df = self.test_df
 
         self.train_df = self.train_df[['userID', 'answerCode']]
         self.test_df = self.test_df[['userID', 'answerCode']]
 
 
-    def run(self, funcs: list):
-        for func in funcs:
+    def run(self, funcs: list, n_jobs: int=1):
+        '''
+        fe_XX 함수마다 원본 복사본 대신 얕은 복사(view)를 넘기고, 새로 만든 컬럼만 모아 마지막에 한 번만 이어 붙임
+        shared 인자를 받는 함수에는 공통 전처리 결과(SharedInputs)를 같이 넘김
+        :param n_jobs: 1 보다 크면 fe_XX 함수들을 스레드 풀로 동시에 실행 (함수끼리 서로의 결과를 쓰지 않음)
+        '''
+        shared = (SharedInputs(self.base_train_df), SharedInputs(self.base_test_df))
+
+        def call(func):
             print(f'{func.__name__} preprocessing...')
-            train_series, test_series = \
-                func(self.base_train_df.copy(), self.base_test_df.copy())
-            self.train_df = pd.concat([self.train_df, train_series], axis=1)
-            self.test_df = pd.concat([self.test_df, test_series], axis=1)
+            # 얕은 복사: 컬럼 추가/이름 변경/삭제는 함수 안에서만 보이고 데이터는 복사하지 않음
+            args = (self.base_train_df.copy(deep=False), self.base_test_df.copy(deep=False))
+            if 'shared' in inspect.signature(func).parameters:
+                return func(*args, shared=shared)
+            return func(*args)
+
+        if n_jobs > 1:
+            with self.profiler.step(f'features(n_jobs={n_jobs})') as step:
+                with ThreadPoolExecutor(n_jobs) as pool:
+                    outputs = list(pool.map(call, funcs)) # funcs 순서 유지
+                step['rows'] = sum(len(train) + len(test) for train, test in outputs)
+        else:
+            outputs = []
+            for func in funcs:
+                with self.profiler.step(func.__name__) as step:
+                    train_series, test_series = call(func)
+                    step['rows'] = len(train_series) + len(test_series)
+                outputs.append((train_series, test_series))
+
+        producers = {} # {컬럼 이름: 만든 함수 이름}, 피쳐 레지스트리에 기록
+        for func, (train, _) in zip(funcs, outputs):
+            for col_name in ([train.name] if isinstance(train, pd.Series) else train.columns):
+                producers[col_name] = func.__name__
+
+        with self.profiler.step('concat') as step:
+            self.train_df = pd.concat([self.train_df] + [train for train, _ in outputs], axis=1)
+            self.test_df = pd.concat([self.test_df] + [test for _, test in outputs], axis=1)
+            del outputs
+            step['rows'] = len(self.train_df) + len(self.test_df)
 
         if self.is_new:
             self.train_df.to_csv(os.path.join(BASE_DATA_PATH, f'EDA_new_train_data.csv'), index=False)
@@ -50,25 +127,18 @@ class EDA:
         self.test_df.to_csv(os.path.join(BASE_DATA_PATH, f'EDA_test_data.csv'), index=False)
 
         # 라벨 인코딩
-        self.train_df.loc[len(self.train_df)] = np.nan
-        cate_cols = [col for col in self.train_df.columns if col[-2:] == '_c']
-
+        # train 으로 만든 카테고리 사전을 저장해두고 dkt 학습/추론에서 같은 코드를 씀
+        # 컬럼 코드는 1 (결측/unknown), 2 ~ 이고 offset 은 dkt 에서 사용하는 컬럼만 골라 붙임 (0 은 시계열 패딩)
         print('label encoding...')
-        oe = OrdinalEncoder(handle_unknown='use_encoded_value', unknown_value=np.nan)
-        oe = oe.fit(self.train_df[cate_cols])
-
-        self.train_df[cate_cols] = oe.transform(self.train_df[cate_cols]) + 1 # np.nan 분리용
-        self.test_df[cate_cols] = oe.transform(self.test_df[cate_cols]) + 1   
-
-        self.train_df.fillna(0, inplace=True)
-        self.test_df.fillna(0, inplace=True)
+        with self.profiler.step('label_encoding', (self.train_df, self.test_df)):
+            vocab = CategoryVocab().fit(self.train_df)
+            vocab.save(os.path.join(BASE_DATA_PATH, 'new_vocab.json' if self.is_new else 'vocab.json'))
 
-        self.train_df = self.train_df[:-1]
+            self.train_df = vocab.transform(self.train_df, stack=False).fillna(0)
+            self.test_df = vocab.transform(self.test_df, stack=False).fillna(0)
 
-        self.train_df[cate_cols + ['userID', 'answerCode']] = \
-            self.train_df[cate_cols + ['userID', 'answerCode']].astype(np.int64)
-        self.test_df[cate_cols + ['userID', 'answerCode']] = \
-            self.test_df[cate_cols + ['userID', 'answerCode']].astype(np.int64)
+        self.train_df[['userID', 'answerCode']] = self.train_df[['userID', 'answerCode']].astype(np.int64)
+        self.test_df[['userID', 'answerCode']] = self.test_df[['userID', 'answerCode']].astype(np.int64)
 
         if self.is_new:
             self.train_df.to_csv(os.path.join(BASE_DATA_PATH, f'le_EDA_new_train_data.csv'), index=False)
@@ -88,6 +158,21 @@ class EDA:
                     f.write(f'{i-2:02},{col_name}\n')
         f.close()
 
+        # 피쳐 레지스트리: 번호 -> (컬럼, 만든 함수) + 컬럼 단위로 골라 읽을 수 있는 parquet 저장소
+        # dkt load_data 는 --fe 로 고른 컬럼만 읽음 (번호는 feature_config.txt 와 같음)
+        with self.profiler.step('feature_registry'):
+            prefix = 'new_' if self.is_new else ''
+            registry = FeatureRegistry(BASE_DATA_PATH)
+            for col_name in self.train_df.columns:
+                if col_name not in KEY_COLS:
+                    registry.register(col_name, producers.get(col_name))
+            registry.write('train', self.train_df, f'le_EDA_{prefix}train_data.parquet')
+            registry.write('test', self.test_df, 'le_EDA_test_data.parquet')
+            registry.save(f'{prefix}feature_registry.json')
+
+        self.profiler.summary()
+        self.profiler.save(os.path.join(BASE_DATA_PATH, 'EDA_profile'), os.path.join(BASE_DATA_PATH, 'profile_history.csv'))
+
 def categorize(x):
     if  x <= 0.1:
         return 0
@@ -111,42 +196,47 @@ def categorize(x):
         return 9
 
 
-def fe_00(train_df: pd.DataFrame, test_df: pd.DataFrame) -> pd.Series:
+def fe_00(train_df: pd.DataFrame, test_df: pd.DataFrame, shared: tuple=None) -> pd.Series:
     # diff1_c 추가
-    train_df['diff1_c'] = train_df.groupby(['userID','testId'])[['answerCode']].shift()['answerCode']
-    test_df['diff1_c'] = test_df.groupby(['userID','testId'])[['answerCode']].shift()['answerCode']
+    shared = shared or (SharedInputs(train_df), SharedInputs(test_df))
+    train_df['diff1_c'] = shared[0].group_shift('answerCode', ['userID','testId'], 1)
+    test_df['diff1_c'] = shared[1].group_shift('answerCode', ['userID','testId'], 1)
 
     return train_df['diff1_c'], test_df['diff1_c']
 
 
-def fe_01(train_df: pd.DataFrame, test_df: pd.DataFrame) -> pd.Series:
+def fe_01(train_df: pd.DataFrame, test_df: pd.DataFrame, shared: tuple=None) -> pd.Series:
     # diff2_c 추가
-    train_df['diff2_c'] = train_df.groupby(['userID','testId'])[['answerCode']].shift(2)['answerCode']
-    test_df['diff2_c'] = test_df.groupby(['userID','testId'])[['answerCode']].shift(2)['answerCode']
+    shared = shared or (SharedInputs(train_df), SharedInputs(test_df))
+    train_df['diff2_c'] = shared[0].group_shift('answerCode', ['userID','testId'], 2)
+    test_df['diff2_c'] = shared[1].group_shift('answerCode', ['userID','testId'], 2)
 
     return train_df['diff2_c'], test_df['diff2_c']
 
 
-def fe_02(train_df: pd.DataFrame, test_df: pd.DataFrame) -> pd.Series:
+def fe_02(train_df: pd.DataFrame, test_df: pd.DataFrame, shared: tuple=None) -> pd.Series:
     # diff3_c 추가
-    train_df['diff3_c'] = train_df.groupby(['userID','testId'])[['answerCode']].shift(3)['answerCode']
-    test_df['diff3_c'] = test_df.groupby(['userID','testId'])[['answerCode']].shift(3)['answerCode']
+    shared = shared or (SharedInputs(train_df), SharedInputs(test_df))
+    train_df['diff3_c'] = shared[0].group_shift('answerCode', ['userID','testId'], 3)
+    test_df['diff3_c'] = shared[1].group_shift('answerCode', ['userID','testId'], 3)
 
     return train_df['diff3_c'], test_df['diff3_c']
 
 
-def fe_03(train_df: pd.DataFrame, test_df: pd.DataFrame) -> pd.Series:
+def fe_03(train_df: pd.DataFrame, test_df: pd.DataFrame, shared: tuple=None) -> pd.Series:
     # diff4_c 추가
-    train_df['diff4_c'] = train_df.groupby(['userID','testId'])[['answerCode']].shift(4)['answerCode']
-    test_df['diff4_c'] = test_df.groupby(['userID','testId'])[['answerCode']].shift(4)['answerCode']
+    shared = shared or (SharedInputs(train_df), SharedInputs(test_df))
+    train_df['diff4_c'] = shared[0].group_shift('answerCode', ['userID','testId'], 4)
+    test_df['diff4_c'] = shared[1].group_shift('answerCode', ['userID','testId'], 4)
 
     return train_df['diff4_c'], test_df['diff4_c']
 
 
-def fe_04(train_df: pd.DataFrame, test_df: pd.DataFrame) -> pd.Series:
+def fe_04(train_df: pd.DataFrame, test_df: pd.DataFrame, shared: tuple=None) -> pd.Series:
     # diff5_c 추가
-    train_df['diff5_c'] = train_df.groupby(['userID','testId'])[['answerCode']].shift(5)['answerCode']
-    test_df['diff5_c'] = test_df.groupby(['userID','testId'])[['answerCode']].shift(5)['answerCode']
+    shared = shared or (SharedInputs(train_df), SharedInputs(test_df))
+    train_df['diff5_c'] = shared[0].group_shift('answerCode', ['userID','testId'], 5)
+    test_df['diff5_c'] = shared[1].group_shift('answerCode', ['userID','testId'], 5)
 
     return train_df['diff5_c'], test_df['diff5_c']
 
@@ -238,25 +328,20 @@ def fe_12(train_df: pd.DataFrame, test_df: pd.DataFrame) -> pd.Series:
     return train_df['know_avg_rates_c'], test_df['know_avg_rates_c']
 
 
-def fe_13(train_df: pd.DataFrame, test_df: pd.DataFrame) -> pd.Series:
+def fe_13(train_df: pd.DataFrame, test_df: pd.DataFrame, shared: tuple=None) -> pd.Series:
     # testId_cumcount 추가, 테스트 지금껏 몇개 풀었는가
 
-    train_df['user_test_cumcount'] = train_df.groupby(['userID', 'testId']).cumcount()
-    test_df['user_test_cumcount'] = test_df.groupby(['userID', 'testId']).cumcount()
+    shared = shared or (SharedInputs(train_df), SharedInputs(test_df))
+    train_df['user_test_cumcount'] = train_df.groupby(shared[0].gid(['userID', 'testId'])).cumcount()
+    test_df['user_test_cumcount'] = test_df.groupby(shared[1].gid(['userID', 'testId'])).cumcount()
 
     return train_df['user_test_cumcount'], test_df['user_test_cumcount']
 
 
-def fe_14(train_df: pd.DataFrame, test_df: pd.DataFrame) -> pd.Series:
-    # user 별 시험 문제 푼 시간
-    train_df['Timestamp'] = pd.to_datetime(train_df['Timestamp'])
-    v = (train_df.groupby(['userID', 'testId'])['Timestamp'].tail(1).view('int64').values\
-     - train_df.groupby(['userID', 'testId'])['Timestamp'].head(1).view('int64').values) / 1_000_000_000
-    c = train_df.groupby(['userID', 'testId'])['Timestamp'].head(1)
-    c.loc[:] = v  
-    train_df['user_test_time'] = np.nan
-    train_df.loc[c.index, 'user_test_time'] = c
-    train_df['user_test_time'].fillna(method='ffill', inplace=True)
+def fe_14(train_df: pd.DataFrame, test_df: pd.DataFrame, shared: tuple=None) -> pd.Series:
+    # user 별 시험 문제 푼 시간, (userID, testId) 가 이어지는 구간의 처음 ~ 마지막 풀이 시각 차이 (초)
+    shared = shared or (SharedInputs(train_df), SharedInputs(test_df))
+    train_df['user_test_time'] = kernels.run_spans(shared[0].gid(['userID', 'testId']), shared[0].epoch)['duration']
     # train_df.loc[train_df['user_test_time'] > 3600, 'user_test_time'] = 3600
     # train_df.loc[train_df['user_test_time'] < 60, 'user_test_time'] = 60
     # train_df['user_test_time'] = train_df['testId'].map(train_df.groupby(['testId'])['user_test_time'].mean())
@@ -266,14 +351,7 @@ def fe_14(train_df: pd.DataFrame, test_df: pd.DataFrame) -> pd.Series:
     train_std = train_df['user_test_time'].std()
     train_df['user_test_time'] = (train_df['user_test_time'] - train_mean) / train_std
 
-    test_df['Timestamp'] = pd.to_datetime(test_df['Timestamp'])
-    v = (test_df.groupby(['userID', 'testId'])['Timestamp'].tail(1).view('int64').values\
-     - test_df.groupby(['userID', 'testId'])['Timestamp'].head(1).view('int64').values) / 1_000_000_000
-    c = test_df.groupby(['userID', 'testId'])['Timestamp'].head(1)
-    c.loc[:] = v  
-    test_df['user_test_time'] = np.nan
-    test_df.loc[c.index, 'user_test_time'] = c
-    test_df['user_test_time'].fillna(method='ffill', inplace=True)
+    test_df['user_test_time'] = kernels.run_spans(shared[1].gid(['userID', 'testId']), shared[1].epoch)['duration']
     # test_df.loc[train_df['user_test_time'] > 3600, 'user_test_time'] = 3600
     # test_df.loc[train_df['user_test_time'] < 60, 'user_test_time'] = 60
     # test_df['user_test_time'] = test_df['testId'].map(train_df.groupby(['testId'])['user_test_time'].mean())
@@ -284,22 +362,13 @@ def fe_14(train_df: pd.DataFrame, test_df: pd.DataFrame) -> pd.Series:
     return train_df['user_test_time'], test_df['user_test_time']
 
 
-def fe_15(train_df: pd.DataFrame, test_df: pd.DataFrame) -> pd.Series:
-    # 유저별 테스트 정답률
-    c = train_df.groupby(['userID', 'testId'])['Timestamp'].head(1)
-    v = train_df.groupby(['userID', 'testId'])['answerCode'].mean()
-    c.loc[:] = v.values
-    train_df['user_test_avg'] = np.nan
-    train_df.loc[c.index, 'user_test_avg'] = c
-    train_df['user_test_avg'].fillna(method='ffill', inplace=True)
+def fe_15(train_df: pd.DataFrame, test_df: pd.DataFrame, shared: tuple=None) -> pd.Series:
+    # 유저별 테스트 정답률, (userID, testId) 구간 평균을 시험지별로 다시 평균
+    shared = shared or (SharedInputs(train_df), SharedInputs(test_df))
+    train_df['user_test_avg'] = kernels.run_spans(shared[0].gid(['userID', 'testId']), values=train_df['answerCode'].values)['mean']
     train_df['user_test_avg'] = train_df['testId'].map(train_df.groupby(['testId'])['user_test_avg'].mean())
 
-    c = test_df.groupby(['userID', 'testId'])['Timestamp'].head(1)
-    v = test_df.groupby(['userID', 'testId'])['answerCode'].mean()
-    c.loc[:] = v.values
-    test_df['user_test_avg'] = np.nan
-    test_df.loc[c.index, 'user_test_avg'] = c
-    test_df['user_test_avg'].fillna(method='ffill', inplace=True)
+    test_df['user_test_avg'] = kernels.run_spans(shared[1].gid(['userID', 'testId']), values=test_df['answerCode'].values)['mean']
     test_df['user_test_avg'] = test_df['testId'].map(test_df.groupby(['testId'])['user_test_avg'].mean())
 
     return train_df['user_test_avg'], test_df['user_test_avg']
@@ -373,222 +442,42 @@ def fe_18(train_df: pd.DataFrame, test_df: pd.DataFrame) -> pd.Series:
     return train_df['tag_solved'], test_df['tag_solved']
     
 
-def fe_19(train_df: pd.DataFrame, test_df: pd.DataFrame) -> pd.Series:
+def fe_19(train_df: pd.DataFrame, test_df: pd.DataFrame, shared: tuple=None) -> pd.Series:
     # diff_c 추가
-    train_df['user_diff_c'] = train_df.groupby('userID')[['answerCode']].shift()['answerCode']
-    test_df['user_diff_c'] = test_df.groupby('userID')[['answerCode']].shift()['answerCode']
+    shared = shared or (SharedInputs(train_df), SharedInputs(test_df))
+    train_df['user_diff_c'] = shared[0].group_shift('answerCode', 'userID')
+    test_df['user_diff_c'] = shared[1].group_shift('answerCode', 'userID')
 
     return train_df['user_diff_c'], test_df['user_diff_c']
 
 
 def fe_20(train_df: pd.DataFrame, test_df: pd.DataFrame) -> pd.Series or pd.DataFrame:
-    def preprocess(tags):
-        tag_to_id = {}
-        id_to_tag = {}
-        for word in tags:
-            if word not in tag_to_id:
-                new_id = len(tag_to_id)
-                tag_to_id[word] = new_id
-                id_to_tag[new_id] = word
-
-        corpus = np.array([tag_to_id[t] for t in tags])
-
-        return corpus, tag_to_id, id_to_tag
-
-
-    def convert_one_hot(corpus, vocab_size):
-        '''원핫 표현으로 변환
-        :param corpus: 단어 ID 목록(1차원 또는 2차원 넘파이 배열)
-        :param vocab_size: 어휘 수
-        :return: 원핫 표현(2차원 또는 3차원 넘파이 배열)
-        '''
-        N = corpus.shape[0]
-
-        if corpus.ndim == 1:
-            one_hot = np.zeros((N, vocab_size), dtype=np.int32)
-            for idx, word_id in enumerate(corpus):
-                one_hot[idx, word_id] = 1
-
-        elif corpus.ndim == 2:
-            C = corpus.shape[1]
-            one_hot = np.zeros((N, C, vocab_size), dtype=np.int32)
-            for idx_0, word_ids in enumerate(corpus):
-                for idx_1, word_id in enumerate(word_ids):
-                    one_hot[idx_0, idx_1, word_id] = 1
-
-        return one_hot
-
-
-    def create_co_matrix(corpus, vocab_size, window_size=1):
-        '''동시발생 행렬 생성
-        :param corpus: 말뭉치(단어 ID 목록)
-        :param vocab_size: 태그 수
-        :param window_size: 윈도우 크기(윈도우 크기가 1이면 타깃 단어 좌우 한 단어씩이 맥락에 포함)
-        :return: 동시발생 행렬
-        '''
-        corpus_size = len(corpus)
-        co_matrix = np.zeros((vocab_size, vocab_size), dtype=np.int32)
-
-        for idx, tag_id in tqdm(enumerate(corpus), total=len(corpus)):
-            for i in range(1, window_size + 1):
-                left_idx = idx - i
-                right_idx = idx + i
+    # 유저별 태그 풀이 순서로 만든 PPMI + SVD 태그 임베딩 (16 차원), 테이블은 BASE_DATA_PATH/.emb_cache 에 저장
+    table = embedding_table(train_df, 'KnowledgeTag', 16, window_size=5, cache_dir=os.path.join(BASE_DATA_PATH, '.emb_cache'))
 
-                if left_idx >= 0:
-                    left_tag_id = corpus[left_idx]
-                    co_matrix[tag_id, left_tag_id] += 1
-
-                if right_idx < corpus_size:
-                    right_tag_id = corpus[right_idx]
-                    co_matrix[tag_id, right_tag_id] += 1
-
-        return co_matrix
-
-
-    def ppmi(C, verbose=False, eps = 1e-8):
-        '''PPMI(점별 상호정보량) 생성
-        :param C: 동시발생 행렬
-        :param verbose: 진행 상황을 출력할지 여부
-        :return:
-        '''
-        M = np.zeros_like(C, dtype=np.float32)
-        N = np.sum(C)
-        S = np.sum(C, axis=0)
-        total = C.shape[0] * C.shape[1]
-        cnt = 0
-
-        for i in tqdm(range(C.shape[0])):
-            for j in range(C.shape[1]):
-                pmi = np.log2(C[i, j] * N / (S[j]*S[i]) + eps)
-                M[i, j] = max(0, pmi)
-
-                if verbose:
-                    cnt += 1
-                    if cnt % (total//100 + 1) == 0:
-                        print('%.1f%% 완료' % (100*cnt/total))
-        return M
-
-    knowledges = np.concatenate(train_df.groupby('userID')['KnowledgeTag'].unique().values)
-    corpus, tag_to_id, id_to_tag = preprocess(knowledges)
-    tag_size = len(tag_to_id)
-    C = create_co_matrix(corpus, tag_size, window_size=5)
-    W = ppmi(C)
-    U, S, V = np.linalg.svd(W)
-    U2 = U[:, :16]
-
-    for_train = pd.DataFrame(np.vstack(train_df['KnowledgeTag'].apply(lambda x: U2[tag_to_id[x]]).values), 
-        columns=[f'know_tag_emb{i}' for i in range(U2.shape[1])])
-    
-
-    for_test = pd.DataFrame(np.vstack(test_df['KnowledgeTag'].apply(lambda x: U2[tag_to_id[x]]).values), 
-        columns=[f'know_tag_emb{i}' for i in range(U2.shape[1])])
+    for_train = lookup(table, train_df['KnowledgeTag'], 'know_tag_emb')
+    for_test = lookup(table, test_df['KnowledgeTag'], 'know_tag_emb')
 
     return for_train, for_test
 
 
 def fe_21(train_df: pd.DataFrame, test_df: pd.DataFrame) -> pd.Series or pd.DataFrame:
-    def preprocess(tags):
-        tag_to_id = {}
-        id_to_tag = {}
-        for word in tags:
-            if word not in tag_to_id:
-                new_id = len(tag_to_id)
-                tag_to_id[word] = new_id
-                id_to_tag[new_id] = word
-
-        corpus = np.array([tag_to_id[t] for t in tags])
-
-        return corpus, tag_to_id, id_to_tag
-
-
-    def convert_one_hot(corpus, vocab_size):
-        '''원핫 표현으로 변환
-        :param corpus: 단어 ID 목록(1차원 또는 2차원 넘파이 배열)
-        :param vocab_size: 어휘 수
-        :return: 원핫 표현(2차원 또는 3차원 넘파이 배열)
-        '''
-        N = corpus.shape[0]
-
-        if corpus.ndim == 1:
-            one_hot = np.zeros((N, vocab_size), dtype=np.int32)
-            for idx, word_id in enumerate(corpus):
-                one_hot[idx, word_id] = 1
+    # 유저별 시험지 풀이 순서로 만든 PPMI + SVD 시험지 임베딩 (8 차원)
+    table = embedding_table(train_df, 'testId', 8, window_size=5, cache_dir=os.path.join(BASE_DATA_PATH, '.emb_cache'))
 
-        elif corpus.ndim == 2:
-            C = corpus.shape[1]
-            one_hot = np.zeros((N, C, vocab_size), dtype=np.int32)
-            for idx_0, word_ids in enumerate(corpus):
-                for idx_1, word_id in enumerate(word_ids):
-                    one_hot[idx_0, idx_1, word_id] = 1
-
-        return one_hot
-
-
-    def create_co_matrix(corpus, vocab_size, window_size=1):
-        '''동시발생 행렬 생성
-        :param corpus: 말뭉치(단어 ID 목록)
-        :param vocab_size: 태그 수
-        :param window_size: 윈도우 크기(윈도우 크기가 1이면 타깃 단어 좌우 한 단어씩이 맥락에 포함)
-        :return: 동시발생 행렬
-        '''
-        corpus_size = len(corpus)
-        co_matrix = np.zeros((vocab_size, vocab_size), dtype=np.int32)
-
-        for idx, tag_id in tqdm(enumerate(corpus), total=len(corpus)):
-            for i in range(1, window_size + 1):
-                left_idx = idx - i
-                right_idx = idx + i
-
-                if left_idx >= 0:
-                    left_tag_id = corpus[left_idx]
-                    co_matrix[tag_id, left_tag_id] += 1
-
-                if right_idx < corpus_size:
-                    right_tag_id = corpus[right_idx]
-                    co_matrix[tag_id, right_tag_id] += 1
-
-        return co_matrix
+    for_train = lookup(table, train_df['testId'], 'test_emb')
+    for_test = lookup(table, test_df['testId'], 'test_emb')
 
+    return for_train, for_test
 
-    def ppmi(C, verbose=False, eps = 1e-8):
-        '''PPMI(점별 상호정보량) 생성
-        :param C: 동시발생 행렬
-        :param verbose: 진행 상황을 출력할지 여부
-        :return:
-        '''
-        M = np.zeros_like(C, dtype=np.float32)
-        N = np.sum(C)
-        S = np.sum(C, axis=0)
-        total = C.shape[0] * C.shape[1]
-        cnt = 0
-
-        for i in tqdm(range(C.shape[0])):
-            for j in range(C.shape[1]):
-                pmi = np.log2(C[i, j] * N / (S[j]*S[i]) + eps)
-                M[i, j] = max(0, pmi)
-
-                if verbose:
-                    cnt += 1
-                    if cnt % (total//100 + 1) == 0:
-                        print('%.1f%% 완료' % (100*cnt/total))
-        return M
-
-    tests = np.concatenate(train_df.groupby('userID')['testId'].unique().values)
-    corpus, tag_to_id, id_to_tag = preprocess(tests)
-    tag_size = len(tag_to_id)
-    C = create_co_matrix(corpus, tag_size, window_size=5)
-    W = ppmi(C)
-    U, S, V = np.linalg.svd(W)
-    U2 = U[:, :8]
-
-    for_train = pd.DataFrame(np.vstack(train_df['testId'].apply(lambda x: U2[tag_to_id[x]]).values), 
-        columns=[f'test_emb{i}' for i in range(U2.shape[1])])
-    
 
-    for_test = pd.DataFrame(np.vstack(test_df['testId'].apply(lambda x: U2[tag_to_id[x]]).values), 
-        columns=[f'test_emb{i}' for i in range(U2.shape[1])])
+def fe_22(train_df: pd.DataFrame, test_df: pd.DataFrame) -> pd.Series or pd.DataFrame:
+    # 유저/문항/태그/시험지/유저x태그/유저x시험지 별 누적 정답률 추가, 그 시점 이전 풀이만 사용 (leakage 없음)
+    cols = [f'{name}_asof_rate' for name in DEFAULT_KEYS]
+    for_train = expanding_target_stats(train_df).rename(columns=lambda col: col.replace('_rate', '_asof_rate'))
+    for_test = expanding_target_stats(test_df).rename(columns=lambda col: col.replace('_rate', '_asof_rate'))
 
-    return for_train, for_test
+    return for_train[cols], for_test[cols]
 
 
 def main():
@@ -615,7 +504,8 @@ def main():
         fe_18,
         fe_19,
         fe_20,
-        fe_21
+        fe_21,
+        # fe_22, # 누적 정답률 (expanding_target_stats), 기본 피쳐 번호가 바뀌지 않도록 필요할 때만 추가
     ]
     eda.run(funcs)
 
@@ -10,15 +10,89 @@ from typing import Tuple
 
 from sklearn.preprocessing import OrdinalEncoder, LabelEncoder, StandardScaler
 
+from fe.cache import BlockCache, feature_block
+from fe import kernels, target_stats
+from fe.streaming import UserShards, GlobalStats, ShardWriter, remove_frame
+from fe.vocab import CategoryVocab
+from fe.online import OnlineAggregates
+from fe.target_stats import expanding_target_stats
+from fe.profiling import StepProfiler
+from fe.ingest import read_raw
+from fe.parallel import run_parallel
+
 BASE_DATA_PATH = '/opt/ml/level2_dkt_recsys-level2-recsys-11/data/'
 
 
+#################################
+# FE 클래스들이 공유하는 피쳐 블록
+# 입력 컬럼 + 코드 + 파라미터 해시로 캐시되므로, 새 FE 클래스는 새로 추가한 블록만 계산합니다.
+#################################
+@feature_block(['userID', 'testId', 'answerCode'], deps=[kernels])
+def interaction_block(df:pd.DataFrame, lags=(1,)) -> pd.DataFrame:
+    # 같은 시험지 안에서 lag 번째 이전 문제의 정답 여부, 없으면 -1
+    window = kernels.segment_window(df['answerCode'].values, kernels.group_ids(df, ['userID', 'testId']), lags=lags, fill=-1)
+    out = pd.DataFrame(index=df.index)
+    for lag in lags:
+        name = 'interaction' if lag == 1 else f'interaction_{lag}'
+        out[name] = window[f'lag_{lag}'].astype(np.int16)
+    return out
+
+
+@feature_block(['userID', 'testId', 'Timestamp'], deps=[kernels])
+def elapsed_block(df:pd.DataFrame) -> pd.DataFrame:
+    # 다음 문제를 풀기 시작할 때까지 걸린 시간, 시험지의 마지막 문제는 0
+    return pd.DataFrame({'elapsed': kernels.elapsed_seconds(df)}, index=df.index)
+
+
+@feature_block(['userID', 'elapsed'], deps=[kernels])
+def elapsed_fill_block(df:pd.DataFrame) -> pd.DataFrame:
+    # 900초 이상은 900초로, elapsed 가 0인 문제는 유저별 풀이 시간의 중앙값으로 대치
+    elapsed = kernels.clip_upper(df['elapsed'], 900)
+    elapsed = kernels.fill_zero_by_group_median(elapsed, df['userID'])
+    return pd.DataFrame({'elapsed': elapsed.values}, index=df.index)
+
+
+@feature_block(['userID', 'answerCode'], deps=[kernels, target_stats])
+def cum_answer_block(df:pd.DataFrame) -> pd.DataFrame:
+    # 유저별 이전까지 맞춘 문제 수, 푼 문제 수, 정답률 (행 순서 기준)
+    stats = expanding_target_stats(df, {'user': ['userID']}, time_col=None)
+    out = pd.DataFrame(index=df.index)
+    out['user_correct_answer'] = stats['user_correct'].values
+    out['user_total_answer'] = stats['user_attempts'].values
+    out['user_acc'] = (out['user_correct_answer']/out['user_total_answer']).fillna(0)
+    return out
+
+
 class FeatureEngineer:
-    def __init__(self, base_path, base_train_df, base_test_df, is_leakage=False):
+    def __init__(self, base_path, base_train_df, base_test_df, is_leakage=False, file_format='parquet', use_cache=True, profile=True):
         self.base_path = base_path
         self.base_train_df = base_train_df
         self.base_test_df = base_test_df
         self.is_leakage = is_leakage
+        self.file_format = file_format # 'parquet' or 'csv'
+        self.cache = BlockCache(os.path.join(base_path, '.fe_cache'), enabled=use_cache)
+        # 단계별 시간/메모리 기록, 클래스 폴더의 profile.json/csv 와 BASE_DATA_PATH/profile_history.csv 에 저장
+        self.profiler = StepProfiler(self.__class__.__name__, enabled=profile)
+
+    def add_block(self, df:pd.DataFrame, block, **params) -> pd.DataFrame:
+        # 블록 결과(캐시 or 계산)를 df 에 컬럼으로 붙인다. (in-place)
+        with self.profiler.step(f'block:{block.name}', df):
+            out = self.cache.compute(block, df, **params)
+        for col in out.columns:
+            df[col] = out[col].values
+        return df
+
+    def __save(self, df:pd.DataFrame, name:str):
+        path = os.path.join(BASE_DATA_PATH, self.__class__.__name__, name)
+        # run_streaming 이 남긴 part 폴더 (ShardWriter) 나 다른 포맷으로 저장했던 이전 결과를 지우고 파일 하나로 저장
+        # (로더는 parquet 이 있으면 parquet 을 먼저 읽음)
+        remove_frame(path)
+        path = f'{path}.{self.file_format}'
+        if self.file_format == 'parquet':
+            # 컬럼 단위 바이너리 저장, dtype(_c 카테고리 코드 포함) 그대로 유지
+            df.to_parquet(path, index=False, compression='zstd')
+        else:
+            df.to_csv(path, index=False)
 
     def __label_encoding(
         self, 
@@ -26,36 +100,18 @@ class FeatureEngineer:
         test_df:pd.DataFrame
     ) -> Tuple[pd.DataFrame, pd.DataFrame]:
 
-        train_df.loc[len(train_df)] = np.nan
-        cate_cols = [col for col in train_df.columns if col[-2:] == '_c']
-
-        oe = OrdinalEncoder(handle_unknown='use_encoded_value', unknown_value=np.nan)
-        oe = oe.fit(train_df[cate_cols])
+        # train 으로 카테고리 사전을 한 번 만들어 저장하고, test / 추론은 같은 사전으로 변환
+        # 코드는 0 (패딩), 1 (결측/unknown), 2 ~ (컬럼별 offset 포함) 이고 offset 은 임베딩 테이블 크기
+        vocab = CategoryVocab().fit(train_df)
+        vocab.save(os.path.join(BASE_DATA_PATH, self.__class__.__name__, 'vocab.json'))
 
-        train_df[cate_cols] = oe.transform(train_df[cate_cols]) + 1 # np.nan 분리용
-        test_df[cate_cols] = oe.transform(test_df[cate_cols]) + 1   
+        train_df = vocab.transform(train_df).fillna(0)
+        test_df = vocab.transform(test_df).fillna(0)
 
-        train_df = train_df.fillna(0)
-        test_df = test_df.fillna(0)
+        train_df[['userID', 'answerCode']] = train_df[['userID', 'answerCode']].astype(np.int64)
+        test_df[['userID', 'answerCode']] = test_df[['userID', 'answerCode']].astype(np.int64)
 
-        train_df = train_df[:-1]
-        
-        offset = 0
-        for cate_col in cate_cols:
-            train_df[cate_col] += offset
-            test_df[cate_col] += offset
-            offset = train_df[cate_col].max()
-        
-
-        offset = int(offset + 1)
-
-
-        train_df[cate_cols + ['userID', 'answerCode']] = \
-            train_df[cate_cols + ['userID', 'answerCode']].astype(np.int64)
-        test_df[cate_cols + ['userID', 'answerCode']] = \
-            test_df[cate_cols + ['userID', 'answerCode']].astype(np.int64)
-
-        return train_df, test_df, offset
+        return train_df, test_df, vocab.size
 
 
     def run(self):
@@ -66,33 +122,117 @@ class FeatureEngineer:
             os.mkdir(os.path.join(self.base_path, self.__class__.__name__))
 
         print(f'[{self.__class__.__name__}] feature engineering...')
-        fe_train_df, fe_test_df = self.feature_engineering(self.base_train_df, self.base_test_df)
+        with self.profiler.step('feature_engineering') as step:
+            fe_train_df, fe_test_df = self.feature_engineering(self.base_train_df, self.base_test_df)
+            self.profiler.lap_end((fe_train_df, fe_test_df)) # feature_engineering 안에서 lap 을 쓴 경우 마지막 lap 종료
+            step['rows'] = len(fe_train_df) + len(fe_test_df)
 
         fe_train_df = fe_train_df.drop(['Timestamp'], axis=1)
         fe_test_df = fe_test_df.drop(['Timestamp'], axis=1)
 
-        print(f'[{self.__class__.__name__}] save csv...')
-        fe_train_df.to_csv(os.path.join(BASE_DATA_PATH, self.__class__.__name__, 'train_data.csv'), index=False)
-        fe_test_df.to_csv(os.path.join(BASE_DATA_PATH, self.__class__.__name__, 'test_data.csv'), index=False)
+        print(f'[{self.__class__.__name__}] save {self.file_format}...')
+        with self.profiler.step('save', (fe_train_df, fe_test_df)):
+            self.__save(fe_train_df, 'train_data')
+            self.__save(fe_test_df, 'test_data')
 
         print(f'[{self.__class__.__name__}] columns')
         print(fe_train_df.columns)
         print(f'[{self.__class__.__name__}] label encoding...')
-        le_train_df, le_test_df, offset = self.__label_encoding(fe_train_df, fe_test_df)
+        with self.profiler.step('label_encoding', (fe_train_df, fe_test_df)):
+            le_train_df, le_test_df, offset = self.__label_encoding(fe_train_df, fe_test_df)
 
-        print(f'[{self.__class__.__name__}] save le csv...')
-        le_train_df.to_csv(os.path.join(BASE_DATA_PATH, self.__class__.__name__, 'le_train_data.csv'), index=False)
-        le_test_df.to_csv(os.path.join(BASE_DATA_PATH, self.__class__.__name__, 'le_test_data.csv'), index=False)
+        print(f'[{self.__class__.__name__}] save le {self.file_format}...')
+        with self.profiler.step('save_le', (le_train_df, le_test_df)):
+            self.__save(le_train_df, 'le_train_data')
+            self.__save(le_test_df, 'le_test_data')
         
         with open(os.path.join(BASE_DATA_PATH, self.__class__.__name__, 'offset.txt'), 'w') as f:
             f.write(f'offset={offset}\n')
+            f.write(f'format={self.file_format}\n')
 
+        print(f'[{self.__class__.__name__}] block cache hit={self.cache.hits}, miss={self.cache.misses}')
+        self.profiler.summary()
+        self.profiler.save(os.path.join(BASE_DATA_PATH, self.__class__.__name__), os.path.join(BASE_DATA_PATH, 'profile_history.csv'))
         print(f'[{self.__class__.__name__}] done.')
 
 
+    def run_streaming(self, train_path, test_path, n_shards=8, chunksize=500_000):
+        '''
+        userID 구간 샤드 단위로 FE 를 진행하는 out-of-core 모드. 메모리 사용량은 샤드 크기에 비례합니다.
+        - pass 0 : 원본 csv 를 청크로 읽어 userID 구간 샤드로 나눠 저장
+        - pass 1 : 샤드마다 부분 집계 -> 문제/태그 등 전역 통계 (shard_statistics)
+        - pass 2 : 샤드마다 유저 단위 FE + 전역 통계 매핑 후 바로 저장 (shard_feature_engineering)
+        - pass 3 : 저장된 결과를 다시 읽으며 라벨 인코딩
+        '''
+        name = self.__class__.__name__
+        if not (hasattr(self, 'shard_statistics') and hasattr(self, 'shard_feature_engineering')):
+            raise NotImplementedError(
+                f'{name} 은 streaming 모드를 지원하지 않습니다. shard_statistics / shard_feature_engineering 이 있는 클래스 (FE06) 로 실행하거나 run() 을 사용해 주세요.'
+            )
+        print(f'[{name}] {self}')
+        print(f'[{name}] streaming preprocessing start... (n_shards={n_shards})')
+
+        if not os.path.exists(os.path.join(self.base_path, name)):
+            os.mkdir(os.path.join(self.base_path, name))
+
+        shards = UserShards(os.path.join(self.base_path, name, 'shards'), n_shards, chunksize)
+        print(f'[{name}] split shards...')
+        self.profiler.lap('split shards')
+        shards.split(train_path, test_path)
+
+        print(f'[{name}] global statistics...')
+        self.profiler.lap('global statistics')
+        stats = GlobalStats()
+        for train_df, test_df in shards:
+            self.shard_statistics(train_df, test_df, stats)
+
+        print(f'[{name}] shard feature engineering...')
+        self.profiler.lap('shard feature engineering')
+        writers = {
+            'train_data': ShardWriter(os.path.join(BASE_DATA_PATH, name, 'train_data'), self.file_format),
+            'test_data': ShardWriter(os.path.join(BASE_DATA_PATH, name, 'test_data'), self.file_format),
+        }
+        vocab = CategoryVocab()
+        for train_df, test_df in tqdm(shards, total=len(shards)):
+            fe_train_df, fe_test_df = self.shard_feature_engineering(train_df, test_df, stats)
+            fe_train_df = fe_train_df.drop(['Timestamp'], axis=1)
+            fe_test_df = fe_test_df.drop(['Timestamp'], axis=1)
+
+            writers['train_data'].write(fe_train_df)
+            writers['test_data'].write(fe_test_df)
+            vocab.partial_fit(fe_train_df)
+        for writer in writers.values():
+            writer.close()
+        shards.clear()
+
+        print(f'[{name}] label encoding...')
+        self.profiler.lap('label encoding')
+        vocab.build()
+        vocab.save(os.path.join(BASE_DATA_PATH, name, 'vocab.json'))
+        for kind in ['train_data', 'test_data']:
+            le_writer = ShardWriter(os.path.join(BASE_DATA_PATH, name, f'le_{kind}'), self.file_format)
+            for df in writers[kind]:
+                df = vocab.transform(df).fillna(0)
+                df[['userID', 'answerCode']] = df[['userID', 'answerCode']].astype(np.int64)
+                le_writer.write(df)
+            le_writer.close()
+
+        with open(os.path.join(BASE_DATA_PATH, name, 'offset.txt'), 'w') as f:
+            f.write(f'offset={vocab.size}\n')
+            f.write(f'format={self.file_format}\n')
+
+        self.profiler.summary()
+        self.profiler.save(os.path.join(BASE_DATA_PATH, name), os.path.join(BASE_DATA_PATH, 'profile_history.csv'))
+        print(f'[{name}] done.')
+
+
     def feature_engineering(self, train_df:pd.DataFrame, test_df:pd.DataFrame) -> pd.DataFrame:
         raise NotImplementedError()
 
+    # streaming 모드 (run_streaming) 를 지원하는 클래스는 아래 두 메소드를 구현 (현재 FE06)
+    # - shard_statistics(train_df, test_df, stats) : pass 1, 한 샤드의 부분 집계를 stats 에 더함
+    # - shard_feature_engineering(train_df, test_df, stats) : pass 2, 유저 단위 FE 는 샤드 안에서, 전역 FE 는 stats 로
+
 
 # baseline EDA
 class FE00(FeatureEngineer):
@@ -161,8 +301,8 @@ class FE01(FeatureEngineer):
         # 큰 차이는 없을 것으로 보이는데, 일단 나눠서 진행한다.
 
         # 각 시험 속 문항번호를 수치형으로 만들어 추가한다.
-        train_df['probnum'] = train_df['assessmentItemID'].apply(lambda x: int(x[-3:]))
-        test_df['probnum'] = test_df['assessmentItemID'].apply(lambda x: int(x[-3:]))
+        train_df['probnum'] = kernels.last_digits(train_df['assessmentItemID'])
+        test_df['probnum'] = kernels.last_digits(test_df['assessmentItemID'])
 
         # 위 번호를 토대로 각 시험의 최종 문항을 피쳐로 추가한다.
         train_tmp = train_df.groupby('testId')
@@ -235,8 +375,8 @@ class FE02(FeatureEngineer):
         # 큰 차이는 없을 것으로 보이는데, 일단 나눠서 진행한다.
 
         # 각 시험 속 문항번호를 수치형으로 만들어 추가한다.
-        train_df['probnum'] = train_df['assessmentItemID'].apply(lambda x: int(x[-3:]))
-        test_df['probnum'] = test_df['assessmentItemID'].apply(lambda x: int(x[-3:]))
+        train_df['probnum'] = kernels.last_digits(train_df['assessmentItemID'])
+        test_df['probnum'] = kernels.last_digits(test_df['assessmentItemID'])
 
         # 위 번호를 토대로 각 시험의 최종 문항을 피쳐로 추가한다.
         train_tmp = train_df.groupby('testId')
@@ -299,8 +439,8 @@ class FE03(FeatureEngineer):
         # 큰 차이는 없을 것으로 보이는데, 일단 나눠서 진행한다.
 
         # 각 시험 속 문항번호를 수치형으로 만들어 추가한다.
-        train_df['probnum'] = train_df['assessmentItemID'].apply(lambda x: int(x[-3:]))
-        test_df['probnum'] = test_df['assessmentItemID'].apply(lambda x: int(x[-3:]))
+        train_df['probnum'] = kernels.last_digits(train_df['assessmentItemID'])
+        test_df['probnum'] = kernels.last_digits(test_df['assessmentItemID'])
 
         # 위 번호를 토대로 각 시험의 최종 문항을 피쳐로 추가한다.
         train_tmp = train_df.groupby('testId')
@@ -375,8 +515,8 @@ class FE04(FeatureEngineer):
         # 큰 차이는 없을 것으로 보이는데, 일단 나눠서 진행한다.
 
         # 각 시험 속 문항번호를 수치형으로 만들어 추가한다.
-        train_df['probnum'] = train_df['assessmentItemID'].apply(lambda x: int(x[-3:]))
-        test_df['probnum'] = test_df['assessmentItemID'].apply(lambda x: int(x[-3:]))
+        train_df['probnum'] = kernels.last_digits(train_df['assessmentItemID'])
+        test_df['probnum'] = kernels.last_digits(test_df['assessmentItemID'])
 
         # 위 번호를 토대로 각 시험의 최종 문항을 피쳐로 추가한다.
         train_tmp = train_df.groupby('testId')
@@ -544,35 +684,25 @@ class FE06(FeatureEngineer):
         def percentile(s):
             return np.sum(s) / len(s)
         
-        # grade를 나누기 위한 grade_map 함수 정의
-        def grade_map(x : float):
-            if x <= 0.4:
-                return 0
-            elif 0.4< x <0.8:
-                return 1
-            elif x >= 0.8:
-                return 2
+        # grade 구간화는 kernels.grade 사용 (0.4 이하 0, 0.8 미만 1, 그 이상 2)
 
         numeric_col = []
 
+        self.profiler.lap('interaction, elapsed')
         #### 1. train_df, test_df 에서 interaction, elapsed 구해놓기 ####
         # train_df = pd.read_csv('../data/train_data.csv')
         # test_df = pd.read_csv('../data/test_data.csv')
         train_df['Timestamp'] = pd.to_datetime(train_df['Timestamp'], format="%Y-%m-%d %H:%M:%S")
         test_df['Timestamp'] = pd.to_datetime(test_df['Timestamp'], format="%Y-%m-%d %H:%M:%S")
-        train_df['interaction'] = train_df.groupby(['userID','testId'])[['answerCode']].shift()['answerCode'].fillna(-1).astype(np.int16)
-        test_df['interaction'] = test_df.groupby(['userID','testId'])[['answerCode']].shift()['answerCode'].fillna(-1).astype(np.int16)
-
-        diff = train_df.loc[:, ['userID','testId','Timestamp']].groupby(['userID','testId']).diff().fillna(pd.Timedelta(seconds=0))
-        diff = diff['Timestamp'].apply(lambda x: x.total_seconds())
-        train_df['elapsed'] = pd.concat([diff[1:], pd.Series([0.0])]).reset_index().iloc[:,1]  # 걸린 시간
+        self.add_block(train_df, interaction_block)
+        self.add_block(test_df, interaction_block)
 
-        diff = test_df.loc[:, ['userID','testId','Timestamp']].groupby(['userID','testId']).diff().fillna(pd.Timedelta(seconds=0))
-        diff = diff['Timestamp'].apply(lambda x: x.total_seconds())
-        test_df['elapsed'] = pd.concat([diff[1:], pd.Series([0.0])]).reset_index().iloc[:,1]  # 걸린 시간        
+        self.add_block(train_df, elapsed_block) # 걸린 시간
+        self.add_block(test_df, elapsed_block) # 걸린 시간
         
         numeric_col.append('elapsed')
 
+        self.profiler.lap('split test_last_sequence', train_df)
         #### 2. test_df 에서 test_tmp, test_last_sequence 떼어내기 ####
         # - test_tmp : not -1
         # - test_last_sequence : only -1
@@ -580,6 +710,7 @@ class FE06(FeatureEngineer):
         test_tmp = test_df[test_df.answerCode != -1]
         test_last_sequence = test_df[test_df.answerCode == -1]
 
+        self.profiler.lap('merge', test_df)
         #### 3. train_df + test_tmp = merged 로 concat하기 ####
         # merge후, interaction항 추가 해줌
         merged = pd.concat([train_df,test_tmp],axis=0)
@@ -587,6 +718,7 @@ class FE06(FeatureEngineer):
         merged = merged.reset_index(drop=True) #.drop('index', axis=1)
         
         #### 4. merged 기준으로 FE를 진행, test_tmp와 test_last_sequence에도 각각의 정보(userID, assessmentItemID)를 이용해서 mapping ####
+        self.profiler.lap('user counts, user_grade', merged)
         ## 1. stu_groupby_merged : counts, user_grade 추가 ##
         stu_groupby_merged = merged.groupby('userID').agg({
             'assessmentItemID': 'count',
@@ -597,70 +729,66 @@ class FE06(FeatureEngineer):
         test_tmp['counts'] = test_tmp['userID'].map(stu_groupby_merged['counts']) # test_tmp mapping
         test_last_sequence['counts'] = test_last_sequence['userID'].map(stu_groupby_merged['counts']) # test_last_sequence mapping
 
-        stu_groupby_merged['user_grade'] = stu_groupby_merged['meanAnswerRate'].apply(grade_map) # 유저의 평균 정답률을 이용한 실력,등급 정의
+        stu_groupby_merged['user_grade'] = kernels.grade(stu_groupby_merged['meanAnswerRate']) # 유저의 평균 정답률을 이용한 실력,등급 정의
         merged['user_grade'] = merged['userID'].map(stu_groupby_merged['user_grade']) # merged mapping
         test_tmp['user_grade'] = test_tmp['userID'].map(stu_groupby_merged['user_grade']) # test_tmp mapping
         test_last_sequence['user_grade'] = test_last_sequence['userID'].map(stu_groupby_merged['user_grade']) # test_last_sequence mapping
 
         numeric_col.append('counts')
 
+        self.profiler.lap('ass_grade, ass_solved', merged)
         ## 2. prob_groupby : assessmentItemID 이용한 FE ## 
         prob_groupby = merged.groupby('assessmentItemID').agg({
             'userID': 'count',
             'answerCode': percentile
         })
         prob_groupby.columns = ['numUsers', 'meanAnswerRate'] # groupby 집계, numUsers : 문제를 푼 유저는 몇명인지
-        prob_groupby['ass_grade'] = prob_groupby['meanAnswerRate'].apply(grade_map) # 문제 평균 정답률을 이용한 난이도 정의
+        prob_groupby['ass_grade'] = kernels.grade(prob_groupby['meanAnswerRate']) # 문제 평균 정답률을 이용한 난이도 정의
         merged['ass_grade'] = merged['assessmentItemID'].map(prob_groupby['ass_grade']) # merged mapping
         test_tmp['ass_grade'] = test_tmp['assessmentItemID'].map(prob_groupby['ass_grade']) # test_tmp mapping
         test_last_sequence['ass_grade'] = test_last_sequence['assessmentItemID'].map(prob_groupby['ass_grade']) # test_last_sequence mapping
 
         prob_solved_mean = prob_groupby['numUsers'].mean() # numUsers의 평균 (평균적으로 각 문제들은 몇 명에게 노출됐는가)
-        prob_groupby['ass_solved'] = prob_groupby['numUsers'].apply(lambda x: int(x>prob_solved_mean)) # 문제가 많이 노출된 편인지, 아닌지 여부
+        prob_groupby['ass_solved'] = kernels.above(prob_groupby['numUsers'], prob_solved_mean) # 문제가 많이 노출된 편인지, 아닌지 여부
         merged['ass_solved'] = merged['assessmentItemID'].map(prob_groupby['ass_solved']) # merged mapping
         test_tmp['ass_solved'] = test_tmp['assessmentItemID'].map(prob_groupby['ass_solved']) # test_tmp mapping
         test_last_sequence['ass_solved'] = test_last_sequence['assessmentItemID'].map(prob_groupby['ass_solved']) # test_last_sequence mapping 
 
+        self.profiler.lap('tag_grade, tag_solved', merged)
         ## 3. tag_groupby : KnowledgeTag 이용한 FE ## 
         tag_groupby = merged.groupby('KnowledgeTag').agg({
             'userID': 'count',
             'answerCode': percentile
         })
         tag_groupby.columns = ['numUsers', 'meanAnswerRate'] # groupby 집계, numUsers : 문제를 푼 유저는 몇명인지
-        tag_groupby['tag_grade'] = tag_groupby['meanAnswerRate'].apply(lambda x: grade_map(x)) # 태그 평균 정답률을 이용한 난이도 정의
+        tag_groupby['tag_grade'] = kernels.grade(tag_groupby['meanAnswerRate']) # 태그 평균 정답률을 이용한 난이도 정의
         merged['tag_grade'] = merged['KnowledgeTag'].map(tag_groupby['tag_grade']) # merged mapping
         test_tmp['tag_grade'] = test_tmp['KnowledgeTag'].map(tag_groupby['tag_grade']) # test_tmp mapping
         test_last_sequence['tag_grade'] = test_last_sequence['KnowledgeTag'].map(tag_groupby['tag_grade']) # test_last_sequence mapping
 
         tag_solved_mean = tag_groupby['numUsers'].mean() # numUsers의 평균 (평균적으로 각 태그들은 몇 명에게 노출됐는가)
-        tag_groupby['tag_solved'] = tag_groupby['numUsers'].apply(lambda x:int(x>tag_solved_mean)) # 태그가 많이 노출된 편인지, 아닌지 여부
+        tag_groupby['tag_solved'] = kernels.above(tag_groupby['numUsers'], tag_solved_mean) # 태그가 많이 노출된 편인지, 아닌지 여부
         merged['tag_solved'] = merged['KnowledgeTag'].map(tag_groupby['tag_solved']) # merged mapping
         test_tmp['tag_solved'] = test_tmp['KnowledgeTag'].map(tag_groupby['tag_solved']) # test_tmp mapping
         test_last_sequence['tag_solved'] = test_last_sequence['KnowledgeTag'].map(tag_groupby['tag_solved']) # test_last_sequence mapping
 
+        self.profiler.lap('elapsed fill', merged)
         #### 4-1 : merged 에서 elapsed가 0인 문제들 대치 해주기
         # - 보통 시험의 마지막 문제는 elapsed가 0이다. (그 문제를 풀고 끝나기 때문에, 얼마나 걸렸는지 알 수가 없고, 그렇기 때문에 그 값을 0으로 대치하는 느낌)
         # - **이 값들을 효과적으로 대치할 수 있으면, test_last_sequence에 elapsed를 효과적으로 전달할 수 있기 때문에 미리 진행**
         # - 우선 merged에서, 시간이 900초 이상 (15분 이상)소요된 풀이시간은 모두 900초로 대치해주자 (대략 31421건)
-        merged['elapsed'] = merged['elapsed'].apply(lambda x : 900 if x > 900 else x)
-
         # - elapsed가 0이 아닌것과 0인것을 나눠서 일단 쪼개고 (인덱스는 건들지 말자), elapsed가 0인 data frame에 유저별 문제풀이 시간의 중앙값으로 대치하고 다시 합쳐주자
-        # - 합칠때는 concat으로 위아래로 붙인다음에 index 기준 정렬
-        merged_elapsed_not0 = merged[merged.elapsed != 0]
-        merged_elapsed_0 = merged[merged.elapsed == 0]
-        merged_elapsed_0['elapsed'] = merged_elapsed_0['userID'].map(merged.groupby('userID')['elapsed'].median())
-
-        merged = pd.concat([merged_elapsed_not0,merged_elapsed_0], axis=0)
-        merged = merged.sort_index()
+        self.add_block(merged, elapsed_fill_block)
         
         # - 이제 test_last_sequence에 있는 elapsed가 0인 애들은, 다른 사람들은 그 문제를 푸는데 얼마나 걸렸는지를 기준으로 대치할 수 있게 되었다
         # - 그러고 합치자 (test_tmp랑 test_last_sequence랑)
         test_last_sequence['elapsed'] = test_last_sequence['assessmentItemID'].map(merged.groupby('assessmentItemID')['elapsed'].median())
         test_df = pd.concat([test_tmp, test_last_sequence], axis=0).sort_index()
 
+        self.profiler.lap('mark_randomly', merged)
         # - 이제 elapsed가 잘 대치 되어있기 때문에, mark_randomly feature를 만들 수 있다.
-        merged['mark_randomly'] = merged['elapsed'].apply(lambda x: int((x>0) & (x<=5)))     # 걸린 시간이 1초에서 5초 사이는 평균 정답률이 너무 낮아서 찍은 걸로 간주
-        test_df['mark_randomly'] = test_df['elapsed'].apply(lambda x: int((x>0) & (x<=5)))     # 걸린 시간이 1초에서 5초 사이는 평균 정답률이 너무 낮아서 찍은 걸로 간주
+        merged['mark_randomly'] = kernels.between(merged['elapsed'], 0, 5)     # 걸린 시간이 1초에서 5초 사이는 평균 정답률이 너무 낮아서 찍은 걸로 간주
+        test_df['mark_randomly'] = kernels.between(test_df['elapsed'], 0, 5)     # 걸린 시간이 1초에서 5초 사이는 평균 정답률이 너무 낮아서 찍은 걸로 간주
 
         # 수치형 feature 정규화
         # scaler = StandardScaler()
@@ -671,6 +799,7 @@ class FE06(FeatureEngineer):
         # data leakage 허용 : merged가 train data 의 역할을 하자
         train_df = merged
 
+        self.profiler.lap('rename', merged)
         # 카테고리 컬럼 끝 _c 붙여주세요.
         train_df = train_df.rename(columns=
             {
@@ -703,6 +832,77 @@ class FE06(FeatureEngineer):
         return train_df, test_df
 
 
+    #### streaming 모드 : 유저 단위 FE 는 샤드 안에서, 문제/태그 단위 FE 는 전역 통계로 ####
+    def __merge_shard(self, train_df:pd.DataFrame, test_df:pd.DataFrame):
+        # feature_engineering 의 1~3 단계와 4-1 의 유저별 elapsed 대치 (모두 유저 안에서 끝나는 연산)
+        self.add_block(train_df, interaction_block)
+        self.add_block(test_df, interaction_block)
+        self.add_block(train_df, elapsed_block)
+        self.add_block(test_df, elapsed_block)
+
+        test_tmp = test_df[test_df.answerCode != -1]
+        test_last_sequence = test_df[test_df.answerCode == -1]
+
+        merged = pd.concat([train_df,test_tmp],axis=0)
+        merged.sort_values(['userID','Timestamp'], inplace=True)
+        merged = merged.reset_index(drop=True)
+        return merged, test_tmp, test_last_sequence
+
+    def shard_statistics(self, train_df:pd.DataFrame, test_df:pd.DataFrame, stats:GlobalStats):
+        merged, _, _ = self.__merge_shard(train_df, test_df)
+        stats.update('assessmentItemID', merged['assessmentItemID'], merged['answerCode'])
+        stats.update('KnowledgeTag', merged['KnowledgeTag'], merged['answerCode'])
+
+        self.add_block(merged, elapsed_fill_block)
+        stats.update_median('elapsed', merged['assessmentItemID'], merged['elapsed'])
+
+    def shard_feature_engineering(self, train_df:pd.DataFrame, test_df:pd.DataFrame, stats:GlobalStats) -> pd.DataFrame:
+        merged, test_tmp, test_last_sequence = self.__merge_shard(train_df, test_df)
+        frames = [merged, test_tmp, test_last_sequence]
+
+        # 유저 단위 : counts, user_grade
+        stu_groupby_merged = merged.groupby('userID').agg({
+            'assessmentItemID': 'count',
+            'answerCode': lambda s: np.sum(s) / len(s)
+        })
+        stu_groupby_merged.columns = ['counts', 'meanAnswerRate']
+        stu_groupby_merged['user_grade'] = kernels.grade(stu_groupby_merged['meanAnswerRate'])
+        for df in frames:
+            df['counts'] = df['userID'].map(stu_groupby_merged['counts'])
+            df['user_grade'] = df['userID'].map(stu_groupby_merged['user_grade'])
+
+        # 전역 : ass_grade, ass_solved, tag_grade, tag_solved
+        for key, prefix in [('assessmentItemID', 'ass'), ('KnowledgeTag', 'tag')]:
+            grade = kernels.grade(stats.mean(key))
+            numUsers = stats.count(key)
+            solved = kernels.above(numUsers, numUsers.mean())
+            for df in frames:
+                df[f'{prefix}_grade'] = df[key].map(grade)
+                df[f'{prefix}_solved'] = df[key].map(solved)
+
+        # elapsed : 유저 안에서 대치, test_last_sequence 는 전역 문제별 중앙값
+        self.add_block(merged, elapsed_fill_block)
+        test_last_sequence['elapsed'] = test_last_sequence['assessmentItemID'].map(stats.median('elapsed'))
+        test_df = pd.concat([test_tmp, test_last_sequence], axis=0).sort_index()
+
+        merged['mark_randomly'] = kernels.between(merged['elapsed'], 0, 5)
+        test_df['mark_randomly'] = kernels.between(test_df['elapsed'], 0, 5)
+
+        rename = {
+            'assessmentItemID' : 'assessmentItemID_c', # 기본 1
+            'testId' : 'testId_c', # 기본 2
+            'KnowledgeTag' : 'KnowledgeTag_c', # 기본 3
+            'interaction' : 'interaction_c',
+            'user_grade' : 'user_grade_c',
+            'ass_grade' : 'ass_grade_c',
+            'ass_solved' : 'ass_solved_c',
+            'tag_grade' : 'tag_grade_c',
+            'tag_solved' : 'tag_solved_c',
+            'mark_randomly' : 'mark_randomly_c'
+        }
+        return merged.rename(columns=rename), test_df.rename(columns=rename)
+
+
 class FE07(FeatureEngineer):
     def __str__(self):
         return \
@@ -723,14 +923,7 @@ class FE07(FeatureEngineer):
         def percentile(s):
             return np.sum(s) / len(s)
         
-        # grade를 나누기 위한 grade_map 함수 정의
-        def grade_map(x : float):
-            if x <= 0.4:
-                return 0
-            elif 0.4< x <0.8:
-                return 1
-            elif x >= 0.8:
-                return 2
+        # grade 구간화는 kernels.grade 사용 (0.4 이하 0, 0.8 미만 1, 그 이상 2)
         
         numeric_col = []
 
@@ -739,16 +932,11 @@ class FE07(FeatureEngineer):
         # test_df = pd.read_csv('../data/test_data.csv')
         train_df['Timestamp'] = pd.to_datetime(train_df['Timestamp'], format="%Y-%m-%d %H:%M:%S")
         test_df['Timestamp'] = pd.to_datetime(test_df['Timestamp'], format="%Y-%m-%d %H:%M:%S")
-        train_df['interaction'] = train_df.groupby(['userID','testId'])[['answerCode']].shift()['answerCode'].fillna(-1).astype(np.int16)
-        test_df['interaction'] = test_df.groupby(['userID','testId'])[['answerCode']].shift()['answerCode'].fillna(-1).astype(np.int16)
-
-        diff = train_df.loc[:, ['userID','testId','Timestamp']].groupby(['userID','testId']).diff().fillna(pd.Timedelta(seconds=0))
-        diff = diff['Timestamp'].apply(lambda x: x.total_seconds())
-        train_df['elapsed'] = pd.concat([diff[1:], pd.Series([0.0])]).reset_index().iloc[:,1]  # 걸린 시간
+        self.add_block(train_df, interaction_block)
+        self.add_block(test_df, interaction_block)
 
-        diff = test_df.loc[:, ['userID','testId','Timestamp']].groupby(['userID','testId']).diff().fillna(pd.Timedelta(seconds=0))
-        diff = diff['Timestamp'].apply(lambda x: x.total_seconds())
-        test_df['elapsed'] = pd.concat([diff[1:], pd.Series([0.0])]).reset_index().iloc[:,1]  # 걸린 시간        
+        self.add_block(train_df, elapsed_block) # 걸린 시간
+        self.add_block(test_df, elapsed_block) # 걸린 시간
         
         #### 2. test_df 에서 test_tmp, test_last_sequence 떼어내기 ####
         # - test_tmp : not -1
@@ -774,7 +962,7 @@ class FE07(FeatureEngineer):
         test_tmp['counts'] = test_tmp['userID'].map(stu_groupby_merged['counts']) # test_tmp mapping
         test_last_sequence['counts'] = test_last_sequence['userID'].map(stu_groupby_merged['counts']) # test_last_sequence mapping
 
-        stu_groupby_merged['user_grade'] = stu_groupby_merged['meanAnswerRate'].apply(grade_map) # 유저의 평균 정답률을 이용한 실력,등급 정의
+        stu_groupby_merged['user_grade'] = kernels.grade(stu_groupby_merged['meanAnswerRate']) # 유저의 평균 정답률을 이용한 실력,등급 정의
         merged['user_grade'] = merged['userID'].map(stu_groupby_merged['user_grade']) # merged mapping
         test_tmp['user_grade'] = test_tmp['userID'].map(stu_groupby_merged['user_grade']) # test_tmp mapping
         test_last_sequence['user_grade'] = test_last_sequence['userID'].map(stu_groupby_merged['user_grade']) # test_last_sequence mapping
@@ -785,13 +973,13 @@ class FE07(FeatureEngineer):
             'answerCode': percentile
         })
         prob_groupby.columns = ['numUsers', 'meanAnswerRate'] # groupby 집계, numUsers : 문제를 푼 유저는 몇명인지
-        prob_groupby['ass_grade'] = prob_groupby['meanAnswerRate'].apply(grade_map) # 문제 평균 정답률을 이용한 난이도 정의
+        prob_groupby['ass_grade'] = kernels.grade(prob_groupby['meanAnswerRate']) # 문제 평균 정답률을 이용한 난이도 정의
         merged['ass_grade'] = merged['assessmentItemID'].map(prob_groupby['ass_grade']) # merged mapping
         test_tmp['ass_grade'] = test_tmp['assessmentItemID'].map(prob_groupby['ass_grade']) # test_tmp mapping
         test_last_sequence['ass_grade'] = test_last_sequence['assessmentItemID'].map(prob_groupby['ass_grade']) # test_last_sequence mapping
 
         prob_solved_mean = prob_groupby['numUsers'].mean() # numUsers의 평균 (평균적으로 각 문제들은 몇 명에게 노출됐는가)
-        prob_groupby['ass_solved'] = prob_groupby['numUsers'].apply(lambda x: int(x>prob_solved_mean)) # 문제가 많이 노출된 편인지, 아닌지 여부
+        prob_groupby['ass_solved'] = kernels.above(prob_groupby['numUsers'], prob_solved_mean) # 문제가 많이 노출된 편인지, 아닌지 여부
         merged['ass_solved'] = merged['assessmentItemID'].map(prob_groupby['ass_solved']) # merged mapping
         test_tmp['ass_solved'] = test_tmp['assessmentItemID'].map(prob_groupby['ass_solved']) # test_tmp mapping
         test_last_sequence['ass_solved'] = test_last_sequence['assessmentItemID'].map(prob_groupby['ass_solved']) # test_last_sequence mapping 
@@ -859,13 +1047,13 @@ class FE07(FeatureEngineer):
             'answerCode': percentile
         })
         tag_groupby.columns = ['numUsers', 'meanAnswerRate'] # groupby 집계, numUsers : 문제를 푼 유저는 몇명인지
-        tag_groupby['tag_grade'] = tag_groupby['meanAnswerRate'].apply(lambda x: grade_map(x)) # 태그 평균 정답률을 이용한 난이도 정의
+        tag_groupby['tag_grade'] = kernels.grade(tag_groupby['meanAnswerRate']) # 태그 평균 정답률을 이용한 난이도 정의
         merged['tag_grade'] = merged['KnowledgeTag'].map(tag_groupby['tag_grade']) # merged mapping
         test_tmp['tag_grade'] = test_tmp['KnowledgeTag'].map(tag_groupby['tag_grade']) # test_tmp mapping
         test_last_sequence['tag_grade'] = test_last_sequence['KnowledgeTag'].map(tag_groupby['tag_grade']) # test_last_sequence mapping
 
         tag_solved_mean = tag_groupby['numUsers'].mean() # numUsers의 평균 (평균적으로 각 태그들은 몇 명에게 노출됐는가)
-        tag_groupby['tag_solved'] = tag_groupby['numUsers'].apply(lambda x:int(x>tag_solved_mean)) # 태그가 많이 노출된 편인지, 아닌지 여부
+        tag_groupby['tag_solved'] = kernels.above(tag_groupby['numUsers'], tag_solved_mean) # 태그가 많이 노출된 편인지, 아닌지 여부
         merged['tag_solved'] = merged['KnowledgeTag'].map(tag_groupby['tag_solved']) # merged mapping
         test_tmp['tag_solved'] = test_tmp['KnowledgeTag'].map(tag_groupby['tag_solved']) # test_tmp mapping
         test_last_sequence['tag_solved'] = test_last_sequence['KnowledgeTag'].map(tag_groupby['tag_solved']) # test_last_sequence mapping
@@ -874,16 +1062,8 @@ class FE07(FeatureEngineer):
         # - 보통 시험의 마지막 문제는 elapsed가 0이다. (그 문제를 풀고 끝나기 때문에, 얼마나 걸렸는지 알 수가 없고, 그렇기 때문에 그 값을 0으로 대치하는 느낌)
         # - **이 값들을 효과적으로 대치할 수 있으면, test_last_sequence에 elapsed를 효과적으로 전달할 수 있기 때문에 미리 진행**
         # - 우선 merged에서, 시간이 900초 이상 (15분 이상)소요된 풀이시간은 모두 900초로 대치해주자 (대략 31421건)
-        merged['elapsed'] = merged['elapsed'].apply(lambda x : 900 if x > 900 else x)
-
         # - elapsed가 0이 아닌것과 0인것을 나눠서 일단 쪼개고 (인덱스는 건들지 말자), elapsed가 0인 data frame에 유저별 문제풀이 시간의 중앙값으로 대치하고 다시 합쳐주자
-        # - 합칠때는 concat으로 위아래로 붙인다음에 index 기준 정렬
-        merged_elapsed_not0 = merged[merged.elapsed != 0]
-        merged_elapsed_0 = merged[merged.elapsed == 0]
-        merged_elapsed_0['elapsed'] = merged_elapsed_0['userID'].map(merged.groupby('userID')['elapsed'].median())
-
-        merged = pd.concat([merged_elapsed_not0,merged_elapsed_0], axis=0)
-        merged = merged.sort_index()
+        self.add_block(merged, elapsed_fill_block)
         
         # - 이제 test_last_sequence에 있는 elapsed가 0인 애들은, 다른 사람들은 그 문제를 푸는데 얼마나 걸렸는지를 기준으로 대치할 수 있게 되었다
         test_last_sequence['elapsed'] = test_last_sequence['assessmentItemID'].map(merged.groupby('assessmentItemID')['elapsed'].median())
@@ -894,8 +1074,8 @@ class FE07(FeatureEngineer):
         test_df = pd.concat([test_tmp, test_last_sequence], axis=0).sort_index()
 
         # - 이제 elapsed가 잘 대치 되어있기 때문에, mark_randomly feature를 만들 수 있다.
-        merged['mark_randomly'] = merged['elapsed'].apply(lambda x: int((x>0) & (x<=5)))     # 걸린 시간이 1초에서 5초 사이는 평균 정답률이 너무 낮아서 찍은 걸로 간주
-        test_df['mark_randomly'] = test_df['elapsed'].apply(lambda x: int((x>0) & (x<=5)))     # 걸린 시간이 1초에서 5초 사이는 평균 정답률이 너무 낮아서 찍은 걸로 간주
+        merged['mark_randomly'] = kernels.between(merged['elapsed'], 0, 5)     # 걸린 시간이 1초에서 5초 사이는 평균 정답률이 너무 낮아서 찍은 걸로 간주
+        test_df['mark_randomly'] = kernels.between(test_df['elapsed'], 0, 5)     # 걸린 시간이 1초에서 5초 사이는 평균 정답률이 너무 낮아서 찍은 걸로 간주
 
         # 수치형 feature 정규화
         scaler = StandardScaler()
@@ -957,14 +1137,7 @@ class FE08(FeatureEngineer):
         def percentile(s):
             return np.sum(s) / len(s)
         
-        # grade를 나누기 위한 grade_map 함수 정의
-        def grade_map(x : float):
-            if x <= 0.4:
-                return 0
-            elif 0.4< x <0.8:
-                return 1
-            elif x >= 0.8:
-                return 2
+        # grade 구간화는 kernels.grade 사용 (0.4 이하 0, 0.8 미만 1, 그 이상 2)
         
         numeric_col = []
 
@@ -973,16 +1146,11 @@ class FE08(FeatureEngineer):
         # test_df = pd.read_csv('../data/test_data.csv')
         train_df['Timestamp'] = pd.to_datetime(train_df['Timestamp'], format="%Y-%m-%d %H:%M:%S")
         test_df['Timestamp'] = pd.to_datetime(test_df['Timestamp'], format="%Y-%m-%d %H:%M:%S")
-        train_df['interaction'] = train_df.groupby(['userID','testId'])[['answerCode']].shift()['answerCode'].fillna(-1).astype(np.int16)
-        test_df['interaction'] = test_df.groupby(['userID','testId'])[['answerCode']].shift()['answerCode'].fillna(-1).astype(np.int16)
+        self.add_block(train_df, interaction_block)
+        self.add_block(test_df, interaction_block)
 
-        diff = train_df.loc[:, ['userID','testId','Timestamp']].groupby(['userID','testId']).diff().fillna(pd.Timedelta(seconds=0))
-        diff = diff['Timestamp'].apply(lambda x: x.total_seconds())
-        train_df['elapsed'] = pd.concat([diff[1:], pd.Series([0.0])]).reset_index().iloc[:,1]  # 걸린 시간
-
-        diff = test_df.loc[:, ['userID','testId','Timestamp']].groupby(['userID','testId']).diff().fillna(pd.Timedelta(seconds=0))
-        diff = diff['Timestamp'].apply(lambda x: x.total_seconds())
-        test_df['elapsed'] = pd.concat([diff[1:], pd.Series([0.0])]).reset_index().iloc[:,1]  # 걸린 시간        
+        self.add_block(train_df, elapsed_block) # 걸린 시간
+        self.add_block(test_df, elapsed_block) # 걸린 시간
         
         #### 2. test_df 에서 test_tmp, test_last_sequence 떼어내기 ####
         # - test_tmp : not -1
@@ -1008,7 +1176,7 @@ class FE08(FeatureEngineer):
         test_tmp['counts'] = test_tmp['userID'].map(stu_groupby_merged['counts']) # test_tmp mapping
         test_last_sequence['counts'] = test_last_sequence['userID'].map(stu_groupby_merged['counts']) # test_last_sequence mapping
 
-        stu_groupby_merged['user_grade'] = stu_groupby_merged['meanAnswerRate'].apply(grade_map) # 유저의 평균 정답률을 이용한 실력,등급 정의
+        stu_groupby_merged['user_grade'] = kernels.grade(stu_groupby_merged['meanAnswerRate']) # 유저의 평균 정답률을 이용한 실력,등급 정의
         merged['user_grade'] = merged['userID'].map(stu_groupby_merged['user_grade']) # merged mapping
         test_tmp['user_grade'] = test_tmp['userID'].map(stu_groupby_merged['user_grade']) # test_tmp mapping
         test_last_sequence['user_grade'] = test_last_sequence['userID'].map(stu_groupby_merged['user_grade']) # test_last_sequence mapping
@@ -1019,13 +1187,13 @@ class FE08(FeatureEngineer):
             'answerCode': percentile
         })
         prob_groupby.columns = ['numUsers', 'meanAnswerRate'] # groupby 집계, numUsers : 문제를 푼 유저는 몇명인지
-        prob_groupby['ass_grade'] = prob_groupby['meanAnswerRate'].apply(grade_map) # 문제 평균 정답률을 이용한 난이도 정의
+        prob_groupby['ass_grade'] = kernels.grade(prob_groupby['meanAnswerRate']) # 문제 평균 정답률을 이용한 난이도 정의
         merged['ass_grade'] = merged['assessmentItemID'].map(prob_groupby['ass_grade']) # merged mapping
         test_tmp['ass_grade'] = test_tmp['assessmentItemID'].map(prob_groupby['ass_grade']) # test_tmp mapping
         test_last_sequence['ass_grade'] = test_last_sequence['assessmentItemID'].map(prob_groupby['ass_grade']) # test_last_sequence mapping
 
         prob_solved_mean = prob_groupby['numUsers'].mean() # numUsers의 평균 (평균적으로 각 문제들은 몇 명에게 노출됐는가)
-        prob_groupby['ass_solved'] = prob_groupby['numUsers'].apply(lambda x: int(x>prob_solved_mean)) # 문제가 많이 노출된 편인지, 아닌지 여부
+        prob_groupby['ass_solved'] = kernels.above(prob_groupby['numUsers'], prob_solved_mean) # 문제가 많이 노출된 편인지, 아닌지 여부
         merged['ass_solved'] = merged['assessmentItemID'].map(prob_groupby['ass_solved']) # merged mapping
         test_tmp['ass_solved'] = test_tmp['assessmentItemID'].map(prob_groupby['ass_solved']) # test_tmp mapping
         test_last_sequence['ass_solved'] = test_last_sequence['assessmentItemID'].map(prob_groupby['ass_solved']) # test_last_sequence mapping 
@@ -1072,9 +1240,9 @@ class FE08(FeatureEngineer):
 
         # FE04 에서 maxprob feature 추가하는 방법 참고
         # 각 시험 속 문항번호를 수치형으로 만들어 추가한다.
-        merged['probnum'] = merged['assessmentItemID'].apply(lambda x: int(x[-3:]))
-        test_tmp['probnum'] = test_tmp['assessmentItemID'].apply(lambda x: int(x[-3:]))
-        test_last_sequence['probnum'] =test_last_sequence['assessmentItemID'].apply(lambda x: int(x[-3:]))
+        merged['probnum'] = kernels.last_digits(merged['assessmentItemID'])
+        test_tmp['probnum'] = kernels.last_digits(test_tmp['assessmentItemID'])
+        test_last_sequence['probnum'] =kernels.last_digits(test_last_sequence['assessmentItemID'])
 
         # 위 번호를 토대로 각 시험의 최종 문항을 피쳐로 추가한다.
         merged_tmp = merged.groupby('testId')
@@ -1093,13 +1261,13 @@ class FE08(FeatureEngineer):
             'answerCode': percentile
         })
         tag_groupby.columns = ['numUsers', 'meanAnswerRate'] # groupby 집계, numUsers : 문제를 푼 유저는 몇명인지
-        tag_groupby['tag_grade'] = tag_groupby['meanAnswerRate'].apply(lambda x: grade_map(x)) # 태그 평균 정답률을 이용한 난이도 정의
+        tag_groupby['tag_grade'] = kernels.grade(tag_groupby['meanAnswerRate']) # 태그 평균 정답률을 이용한 난이도 정의
         merged['tag_grade'] = merged['KnowledgeTag'].map(tag_groupby['tag_grade']) # merged mapping
         test_tmp['tag_grade'] = test_tmp['KnowledgeTag'].map(tag_groupby['tag_grade']) # test_tmp mapping
         test_last_sequence['tag_grade'] = test_last_sequence['KnowledgeTag'].map(tag_groupby['tag_grade']) # test_last_sequence mapping
 
         tag_solved_mean = tag_groupby['numUsers'].mean() # numUsers의 평균 (평균적으로 각 태그들은 몇 명에게 노출됐는가)
-        tag_groupby['tag_solved'] = tag_groupby['numUsers'].apply(lambda x:int(x>tag_solved_mean)) # 태그가 많이 노출된 편인지, 아닌지 여부
+        tag_groupby['tag_solved'] = kernels.above(tag_groupby['numUsers'], tag_solved_mean) # 태그가 많이 노출된 편인지, 아닌지 여부
         merged['tag_solved'] = merged['KnowledgeTag'].map(tag_groupby['tag_solved']) # merged mapping
         test_tmp['tag_solved'] = test_tmp['KnowledgeTag'].map(tag_groupby['tag_solved']) # test_tmp mapping
         test_last_sequence['tag_solved'] = test_last_sequence['KnowledgeTag'].map(tag_groupby['tag_solved']) # test_last_sequence mapping
@@ -1108,16 +1276,8 @@ class FE08(FeatureEngineer):
         # - 보통 시험의 마지막 문제는 elapsed가 0이다. (그 문제를 풀고 끝나기 때문에, 얼마나 걸렸는지 알 수가 없고, 그렇기 때문에 그 값을 0으로 대치하는 느낌)
         # - **이 값들을 효과적으로 대치할 수 있으면, test_last_sequence에 elapsed를 효과적으로 전달할 수 있기 때문에 미리 진행**
         # - 우선 merged에서, 시간이 900초 이상 (15분 이상)소요된 풀이시간은 모두 900초로 대치해주자 (대략 31421건)
-        merged['elapsed'] = merged['elapsed'].apply(lambda x : 900 if x > 900 else x)
-
         # - elapsed가 0이 아닌것과 0인것을 나눠서 일단 쪼개고 (인덱스는 건들지 말자), elapsed가 0인 data frame에 유저별 문제풀이 시간의 중앙값으로 대치하고 다시 합쳐주자
-        # - 합칠때는 concat으로 위아래로 붙인다음에 index 기준 정렬
-        merged_elapsed_not0 = merged[merged.elapsed != 0]
-        merged_elapsed_0 = merged[merged.elapsed == 0]
-        merged_elapsed_0['elapsed'] = merged_elapsed_0['userID'].map(merged.groupby('userID')['elapsed'].median())
-
-        merged = pd.concat([merged_elapsed_not0,merged_elapsed_0], axis=0)
-        merged = merged.sort_index()
+        self.add_block(merged, elapsed_fill_block)
         
         # - 이제 test_last_sequence에 있는 elapsed가 0인 애들은, 다른 사람들은 그 문제를 푸는데 얼마나 걸렸는지를 기준으로 대치할 수 있게 되었다
         test_last_sequence['elapsed'] = test_last_sequence['assessmentItemID'].map(merged.groupby('assessmentItemID')['elapsed'].median())
@@ -1128,8 +1288,8 @@ class FE08(FeatureEngineer):
         test_df = pd.concat([test_tmp, test_last_sequence], axis=0).sort_index()
 
         # - 이제 elapsed가 잘 대치 되어있기 때문에, mark_randomly feature를 만들 수 있다.
-        merged['mark_randomly'] = merged['elapsed'].apply(lambda x: int((x>0) & (x<=5)))     # 걸린 시간이 1초에서 5초 사이는 평균 정답률이 너무 낮아서 찍은 걸로 간주
-        test_df['mark_randomly'] = test_df['elapsed'].apply(lambda x: int((x>0) & (x<=5)))     # 걸린 시간이 1초에서 5초 사이는 평균 정답률이 너무 낮아서 찍은 걸로 간주
+        merged['mark_randomly'] = kernels.between(merged['elapsed'], 0, 5)     # 걸린 시간이 1초에서 5초 사이는 평균 정답률이 너무 낮아서 찍은 걸로 간주
+        test_df['mark_randomly'] = kernels.between(test_df['elapsed'], 0, 5)     # 걸린 시간이 1초에서 5초 사이는 평균 정답률이 너무 낮아서 찍은 걸로 간주
 
         # 수치형 feature 정규화
         scaler = StandardScaler()
@@ -1191,14 +1351,7 @@ class FE09(FeatureEngineer):
         def percentile(s):
             return np.sum(s) / len(s)
         
-        # grade를 나누기 위한 grade_map 함수 정의
-        def grade_map(x : float):
-            if x <= 0.4:
-                return 0
-            elif 0.4< x <0.8:
-                return 1
-            elif x >= 0.8:
-                return 2
+        # grade 구간화는 kernels.grade 사용 (0.4 이하 0, 0.8 미만 1, 그 이상 2)
         
         numeric_col = []
 
@@ -1207,23 +1360,13 @@ class FE09(FeatureEngineer):
         # test_df = pd.read_csv('../data/test_data.csv')
         train_df['Timestamp'] = pd.to_datetime(train_df['Timestamp'], format="%Y-%m-%d %H:%M:%S")
         test_df['Timestamp'] = pd.to_datetime(test_df['Timestamp'], format="%Y-%m-%d %H:%M:%S")
-        train_df['interaction'] = train_df.groupby(['userID','testId'])[['answerCode']].shift()['answerCode'].fillna(-1).astype(np.int16)
-        test_df['interaction'] = test_df.groupby(['userID','testId'])[['answerCode']].shift()['answerCode'].fillna(-1).astype(np.int16)
-        # interaction2
-        train_df['interaction_2'] = train_df.groupby(['userID','testId'])[['answerCode']].shift(2)['answerCode'].fillna(-1).astype(np.int16)
-        test_df['interaction_2'] = test_df.groupby(['userID','testId'])[['answerCode']].shift(2)['answerCode'].fillna(-1).astype(np.int16)
-        # interaction3
-        train_df['interaction_3'] = train_df.groupby(['userID','testId'])[['answerCode']].shift(3)['answerCode'].fillna(-1).astype(np.int16)
-        test_df['interaction_3'] = test_df.groupby(['userID','testId'])[['answerCode']].shift(3)['answerCode'].fillna(-1).astype(np.int16)
+        # interaction, interaction2, interaction3
+        self.add_block(train_df, interaction_block, lags=(1, 2, 3))
+        self.add_block(test_df, interaction_block, lags=(1, 2, 3))
       
 
-        diff = train_df.loc[:, ['userID','testId','Timestamp']].groupby(['userID','testId']).diff().fillna(pd.Timedelta(seconds=0))
-        diff = diff['Timestamp'].apply(lambda x: x.total_seconds())
-        train_df['elapsed'] = pd.concat([diff[1:], pd.Series([0.0])]).reset_index().iloc[:,1]  # 걸린 시간
-
-        diff = test_df.loc[:, ['userID','testId','Timestamp']].groupby(['userID','testId']).diff().fillna(pd.Timedelta(seconds=0))
-        diff = diff['Timestamp'].apply(lambda x: x.total_seconds())
-        test_df['elapsed'] = pd.concat([diff[1:], pd.Series([0.0])]).reset_index().iloc[:,1]  # 걸린 시간        
+        self.add_block(train_df, elapsed_block) # 걸린 시간
+        self.add_block(test_df, elapsed_block) # 걸린 시간
         
         #### 2. test_df 에서 test_tmp, test_last_sequence 떼어내기 ####
         # - test_tmp : not -1
@@ -1249,7 +1392,7 @@ class FE09(FeatureEngineer):
         test_tmp['counts'] = test_tmp['userID'].map(stu_groupby_merged['counts']) # test_tmp mapping
         test_last_sequence['counts'] = test_last_sequence['userID'].map(stu_groupby_merged['counts']) # test_last_sequence mapping
 
-        stu_groupby_merged['user_grade'] = stu_groupby_merged['meanAnswerRate'].apply(grade_map) # 유저의 평균 정답률을 이용한 실력,등급 정의
+        stu_groupby_merged['user_grade'] = kernels.grade(stu_groupby_merged['meanAnswerRate']) # 유저의 평균 정답률을 이용한 실력,등급 정의
         merged['user_grade'] = merged['userID'].map(stu_groupby_merged['user_grade']) # merged mapping
         test_tmp['user_grade'] = test_tmp['userID'].map(stu_groupby_merged['user_grade']) # test_tmp mapping
         test_last_sequence['user_grade'] = test_last_sequence['userID'].map(stu_groupby_merged['user_grade']) # test_last_sequence mapping
@@ -1260,13 +1403,13 @@ class FE09(FeatureEngineer):
             'answerCode': percentile
         })
         prob_groupby.columns = ['numUsers', 'meanAnswerRate'] # groupby 집계, numUsers : 문제를 푼 유저는 몇명인지
-        prob_groupby['ass_grade'] = prob_groupby['meanAnswerRate'].apply(grade_map) # 문제 평균 정답률을 이용한 난이도 정의
+        prob_groupby['ass_grade'] = kernels.grade(prob_groupby['meanAnswerRate']) # 문제 평균 정답률을 이용한 난이도 정의
         merged['ass_grade'] = merged['assessmentItemID'].map(prob_groupby['ass_grade']) # merged mapping
         test_tmp['ass_grade'] = test_tmp['assessmentItemID'].map(prob_groupby['ass_grade']) # test_tmp mapping
         test_last_sequence['ass_grade'] = test_last_sequence['assessmentItemID'].map(prob_groupby['ass_grade']) # test_last_sequence mapping
 
         prob_solved_mean = prob_groupby['numUsers'].mean() # numUsers의 평균 (평균적으로 각 문제들은 몇 명에게 노출됐는가)
-        prob_groupby['ass_solved'] = prob_groupby['numUsers'].apply(lambda x: int(x>prob_solved_mean)) # 문제가 많이 노출된 편인지, 아닌지 여부
+        prob_groupby['ass_solved'] = kernels.above(prob_groupby['numUsers'], prob_solved_mean) # 문제가 많이 노출된 편인지, 아닌지 여부
         merged['ass_solved'] = merged['assessmentItemID'].map(prob_groupby['ass_solved']) # merged mapping
         test_tmp['ass_solved'] = test_tmp['assessmentItemID'].map(prob_groupby['ass_solved']) # test_tmp mapping
         test_last_sequence['ass_solved'] = test_last_sequence['assessmentItemID'].map(prob_groupby['ass_solved']) # test_last_sequence mapping 
@@ -1313,9 +1456,9 @@ class FE09(FeatureEngineer):
 
         # FE04 에서 maxprob feature 추가하는 방법 참고
         # 각 시험 속 문항번호를 수치형으로 만들어 추가한다.
-        merged['probnum'] = merged['assessmentItemID'].apply(lambda x: int(x[-3:]))
-        test_tmp['probnum'] = test_tmp['assessmentItemID'].apply(lambda x: int(x[-3:]))
-        test_last_sequence['probnum'] =test_last_sequence['assessmentItemID'].apply(lambda x: int(x[-3:]))
+        merged['probnum'] = kernels.last_digits(merged['assessmentItemID'])
+        test_tmp['probnum'] = kernels.last_digits(test_tmp['assessmentItemID'])
+        test_last_sequence['probnum'] =kernels.last_digits(test_last_sequence['assessmentItemID'])
 
         # 위 번호를 토대로 각 시험의 최종 문항을 피쳐로 추가한다.
         merged_tmp = merged.groupby('testId')
@@ -1334,13 +1477,13 @@ class FE09(FeatureEngineer):
             'answerCode': percentile
         })
         tag_groupby.columns = ['numUsers', 'meanAnswerRate'] # groupby 집계, numUsers : 문제를 푼 유저는 몇명인지
-        tag_groupby['tag_grade'] = tag_groupby['meanAnswerRate'].apply(lambda x: grade_map(x)) # 태그 평균 정답률을 이용한 난이도 정의
+        tag_groupby['tag_grade'] = kernels.grade(tag_groupby['meanAnswerRate']) # 태그 평균 정답률을 이용한 난이도 정의
         merged['tag_grade'] = merged['KnowledgeTag'].map(tag_groupby['tag_grade']) # merged mapping
         test_tmp['tag_grade'] = test_tmp['KnowledgeTag'].map(tag_groupby['tag_grade']) # test_tmp mapping
         test_last_sequence['tag_grade'] = test_last_sequence['KnowledgeTag'].map(tag_groupby['tag_grade']) # test_last_sequence mapping
 
         tag_solved_mean = tag_groupby['numUsers'].mean() # numUsers의 평균 (평균적으로 각 태그들은 몇 명에게 노출됐는가)
-        tag_groupby['tag_solved'] = tag_groupby['numUsers'].apply(lambda x:int(x>tag_solved_mean)) # 태그가 많이 노출된 편인지, 아닌지 여부
+        tag_groupby['tag_solved'] = kernels.above(tag_groupby['numUsers'], tag_solved_mean) # 태그가 많이 노출된 편인지, 아닌지 여부
         merged['tag_solved'] = merged['KnowledgeTag'].map(tag_groupby['tag_solved']) # merged mapping
         test_tmp['tag_solved'] = test_tmp['KnowledgeTag'].map(tag_groupby['tag_solved']) # test_tmp mapping
         test_last_sequence['tag_solved'] = test_last_sequence['KnowledgeTag'].map(tag_groupby['tag_solved']) # test_last_sequence mapping
@@ -1349,16 +1492,8 @@ class FE09(FeatureEngineer):
         # - 보통 시험의 마지막 문제는 elapsed가 0이다. (그 문제를 풀고 끝나기 때문에, 얼마나 걸렸는지 알 수가 없고, 그렇기 때문에 그 값을 0으로 대치하는 느낌)
         # - **이 값들을 효과적으로 대치할 수 있으면, test_last_sequence에 elapsed를 효과적으로 전달할 수 있기 때문에 미리 진행**
         # - 우선 merged에서, 시간이 900초 이상 (15분 이상)소요된 풀이시간은 모두 900초로 대치해주자 (대략 31421건)
-        merged['elapsed'] = merged['elapsed'].apply(lambda x : 900 if x > 900 else x)
-
         # - elapsed가 0이 아닌것과 0인것을 나눠서 일단 쪼개고 (인덱스는 건들지 말자), elapsed가 0인 data frame에 유저별 문제풀이 시간의 중앙값으로 대치하고 다시 합쳐주자
-        # - 합칠때는 concat으로 위아래로 붙인다음에 index 기준 정렬
-        merged_elapsed_not0 = merged[merged.elapsed != 0]
-        merged_elapsed_0 = merged[merged.elapsed == 0]
-        merged_elapsed_0['elapsed'] = merged_elapsed_0['userID'].map(merged.groupby('userID')['elapsed'].median())
-
-        merged = pd.concat([merged_elapsed_not0,merged_elapsed_0], axis=0)
-        merged = merged.sort_index()
+        self.add_block(merged, elapsed_fill_block)
         
         # - 이제 test_last_sequence에 있는 elapsed가 0인 애들은, 다른 사람들은 그 문제를 푸는데 얼마나 걸렸는지를 기준으로 대치할 수 있게 되었다
         test_last_sequence['elapsed'] = test_last_sequence['assessmentItemID'].map(merged.groupby('assessmentItemID')['elapsed'].median())
@@ -1369,8 +1504,8 @@ class FE09(FeatureEngineer):
         test_df = pd.concat([test_tmp, test_last_sequence], axis=0).sort_index()
 
         # - 이제 elapsed가 잘 대치 되어있기 때문에, mark_randomly feature를 만들 수 있다.
-        merged['mark_randomly'] = merged['elapsed'].apply(lambda x: int((x>0) & (x<=5)))     # 걸린 시간이 1초에서 5초 사이는 평균 정답률이 너무 낮아서 찍은 걸로 간주
-        test_df['mark_randomly'] = test_df['elapsed'].apply(lambda x: int((x>0) & (x<=5)))     # 걸린 시간이 1초에서 5초 사이는 평균 정답률이 너무 낮아서 찍은 걸로 간주
+        merged['mark_randomly'] = kernels.between(merged['elapsed'], 0, 5)     # 걸린 시간이 1초에서 5초 사이는 평균 정답률이 너무 낮아서 찍은 걸로 간주
+        test_df['mark_randomly'] = kernels.between(test_df['elapsed'], 0, 5)     # 걸린 시간이 1초에서 5초 사이는 평균 정답률이 너무 낮아서 찍은 걸로 간주
 
         # 수치형 feature 정규화
         scaler = StandardScaler()
@@ -1440,14 +1575,7 @@ class FE10(FeatureEngineer):
         def percentile(s):
             return np.sum(s) / len(s)
         
-        # grade를 나누기 위한 grade_map 함수 정의
-        def grade_map(x : float):
-            if x <= 0.4:
-                return 0
-            elif 0.4< x <0.8:
-                return 1
-            elif x >= 0.8:
-                return 2
+        # grade 구간화는 kernels.grade 사용 (0.4 이하 0, 0.8 미만 1, 그 이상 2)
         
         numeric_col = []
 
@@ -1456,22 +1584,12 @@ class FE10(FeatureEngineer):
         # test_df = pd.read_csv('../data/test_data.csv')
         train_df['Timestamp'] = pd.to_datetime(train_df['Timestamp'], format="%Y-%m-%d %H:%M:%S")
         test_df['Timestamp'] = pd.to_datetime(test_df['Timestamp'], format="%Y-%m-%d %H:%M:%S")
-        train_df['interaction'] = train_df.groupby(['userID','testId'])[['answerCode']].shift()['answerCode'].fillna(-1).astype(np.int16)
-        test_df['interaction'] = test_df.groupby(['userID','testId'])[['answerCode']].shift()['answerCode'].fillna(-1).astype(np.int16)
-        # interaction2
-        train_df['interaction_2'] = train_df.groupby(['userID','testId'])[['answerCode']].shift(2)['answerCode'].fillna(-1).astype(np.int16)
-        test_df['interaction_2'] = test_df.groupby(['userID','testId'])[['answerCode']].shift(2)['answerCode'].fillna(-1).astype(np.int16)
-        # interaction3
-        train_df['interaction_3'] = train_df.groupby(['userID','testId'])[['answerCode']].shift(3)['answerCode'].fillna(-1).astype(np.int16)
-        test_df['interaction_3'] = test_df.groupby(['userID','testId'])[['answerCode']].shift(3)['answerCode'].fillna(-1).astype(np.int16)
-
-        diff = train_df.loc[:, ['userID','testId','Timestamp']].groupby(['userID','testId']).diff().fillna(pd.Timedelta(seconds=0))
-        diff = diff['Timestamp'].apply(lambda x: x.total_seconds())
-        train_df['elapsed'] = pd.concat([diff[1:], pd.Series([0.0])]).reset_index().iloc[:,1]  # 걸린 시간
-
-        diff = test_df.loc[:, ['userID','testId','Timestamp']].groupby(['userID','testId']).diff().fillna(pd.Timedelta(seconds=0))
-        diff = diff['Timestamp'].apply(lambda x: x.total_seconds())
-        test_df['elapsed'] = pd.concat([diff[1:], pd.Series([0.0])]).reset_index().iloc[:,1]  # 걸린 시간        
+        # interaction, interaction2, interaction3
+        self.add_block(train_df, interaction_block, lags=(1, 2, 3))
+        self.add_block(test_df, interaction_block, lags=(1, 2, 3))
+
+        self.add_block(train_df, elapsed_block) # 걸린 시간
+        self.add_block(test_df, elapsed_block) # 걸린 시간
         
         #### 2. test_df 에서 test_tmp, test_last_sequence 떼어내기 ####
         # - test_tmp : not -1
@@ -1494,7 +1612,7 @@ class FE10(FeatureEngineer):
         })
         stu_groupby_merged.columns = ['counts', 'meanAnswerRate'] # groupby 집계, counts : 유저가 푼 문제의 개수
 
-        stu_groupby_merged['user_grade'] = stu_groupby_merged['meanAnswerRate'].apply(grade_map) # 유저의 평균 정답률을 이용한 실력,등급 정의
+        stu_groupby_merged['user_grade'] = kernels.grade(stu_groupby_merged['meanAnswerRate']) # 유저의 평균 정답률을 이용한 실력,등급 정의
         merged['user_grade'] = merged['userID'].map(stu_groupby_merged['user_grade']) # merged mapping
         test_tmp['user_grade'] = test_tmp['userID'].map(stu_groupby_merged['user_grade']) # test_tmp mapping
         test_last_sequence['user_grade'] = test_last_sequence['userID'].map(stu_groupby_merged['user_grade']) # test_last_sequence mapping
@@ -1505,7 +1623,7 @@ class FE10(FeatureEngineer):
             'answerCode': percentile
         })
         prob_groupby.columns = ['numUsers', 'meanAnswerRate'] # groupby 집계, numUsers : 문제를 푼 유저는 몇명인지
-        prob_groupby['ass_grade'] = prob_groupby['meanAnswerRate'].apply(grade_map) # 문제 평균 정답률을 이용한 난이도 정의
+        prob_groupby['ass_grade'] = kernels.grade(prob_groupby['meanAnswerRate']) # 문제 평균 정답률을 이용한 난이도 정의
         merged['ass_grade'] = merged['assessmentItemID'].map(prob_groupby['ass_grade']) # merged mapping
         test_tmp['ass_grade'] = test_tmp['assessmentItemID'].map(prob_groupby['ass_grade']) # test_tmp mapping
         test_last_sequence['ass_grade'] = test_last_sequence['assessmentItemID'].map(prob_groupby['ass_grade']) # test_last_sequence mapping
@@ -1519,9 +1637,9 @@ class FE10(FeatureEngineer):
 
         # FE04 에서 maxprob feature 추가하는 방법 참고
         # 각 시험 속 문항번호를 수치형으로 만들어 추가한다.
-        merged['probnum'] = merged['assessmentItemID'].apply(lambda x: int(x[-3:]))
-        test_tmp['probnum'] = test_tmp['assessmentItemID'].apply(lambda x: int(x[-3:]))
-        test_last_sequence['probnum'] =test_last_sequence['assessmentItemID'].apply(lambda x: int(x[-3:]))
+        merged['probnum'] = kernels.last_digits(merged['assessmentItemID'])
+        test_tmp['probnum'] = kernels.last_digits(test_tmp['assessmentItemID'])
+        test_last_sequence['probnum'] =kernels.last_digits(test_last_sequence['assessmentItemID'])
 
         # 위 번호를 토대로 각 시험의 최종 문항을 피쳐로 추가한다.
         merged_tmp = merged.groupby('testId')
@@ -1539,16 +1657,8 @@ class FE10(FeatureEngineer):
         # - 보통 시험의 마지막 문제는 elapsed가 0이다. (그 문제를 풀고 끝나기 때문에, 얼마나 걸렸는지 알 수가 없고, 그렇기 때문에 그 값을 0으로 대치하는 느낌)
         # - **이 값들을 효과적으로 대치할 수 있으면, test_last_sequence에 elapsed를 효과적으로 전달할 수 있기 때문에 미리 진행**
         # - 우선 merged에서, 시간이 900초 이상 (15분 이상)소요된 풀이시간은 모두 900초로 대치해주자 (대략 31421건)
-        merged['elapsed'] = merged['elapsed'].apply(lambda x : 900 if x > 900 else x)
-
         # - elapsed가 0이 아닌것과 0인것을 나눠서 일단 쪼개고 (인덱스는 건들지 말자), elapsed가 0인 data frame에 유저별 문제풀이 시간의 중앙값으로 대치하고 다시 합쳐주자
-        # - 합칠때는 concat으로 위아래로 붙인다음에 index 기준 정렬
-        merged_elapsed_not0 = merged[merged.elapsed != 0]
-        merged_elapsed_0 = merged[merged.elapsed == 0]
-        merged_elapsed_0['elapsed'] = merged_elapsed_0['userID'].map(merged.groupby('userID')['elapsed'].median())
-
-        merged = pd.concat([merged_elapsed_not0,merged_elapsed_0], axis=0)
-        merged = merged.sort_index()
+        self.add_block(merged, elapsed_fill_block)
         
         # - 이제 test_last_sequence에 있는 elapsed가 0인 애들은, 다른 사람들은 그 문제를 푸는데 얼마나 걸렸는지를 기준으로 대치할 수 있게 되었다
         test_last_sequence['elapsed'] = test_last_sequence['assessmentItemID'].map(merged.groupby('assessmentItemID')['elapsed'].median())
@@ -1559,8 +1669,8 @@ class FE10(FeatureEngineer):
         test_df = pd.concat([test_tmp, test_last_sequence], axis=0).sort_index()
 
         # - 이제 elapsed가 잘 대치 되어있기 때문에, mark_randomly feature를 만들 수 있다.
-        merged['mark_randomly'] = merged['elapsed'].apply(lambda x: int((x>0) & (x<=5)))     # 걸린 시간이 1초에서 5초 사이는 평균 정답률이 너무 낮아서 찍은 걸로 간주
-        test_df['mark_randomly'] = test_df['elapsed'].apply(lambda x: int((x>0) & (x<=5)))     # 걸린 시간이 1초에서 5초 사이는 평균 정답률이 너무 낮아서 찍은 걸로 간주
+        merged['mark_randomly'] = kernels.between(merged['elapsed'], 0, 5)     # 걸린 시간이 1초에서 5초 사이는 평균 정답률이 너무 낮아서 찍은 걸로 간주
+        test_df['mark_randomly'] = kernels.between(test_df['elapsed'], 0, 5)     # 걸린 시간이 1초에서 5초 사이는 평균 정답률이 너무 낮아서 찍은 걸로 간주
 
 
         #### 4-2 : 문제 푸는데 걸린 시간의 이동평균
@@ -1571,12 +1681,9 @@ class FE10(FeatureEngineer):
             # decimals: 소수점 몇자리까지 볼지
             # order: 이동평균을 계산할 때 전 데이터 중 몇 개를 평균낼지
 
-            df[f'elapsed_ma_{order}'] = df.groupby(['userID'])['elapsed'].rolling(order).mean().values
-            df[f'elapsed_ma_{order}'] = df[f'elapsed_ma_{order}'].apply(lambda x: round(x, decimals))
-
-            # 결측치 처리 - 유저마다 결측치에서 가장 가까운 elapsed_ma 값으로 동일하게 바꿔줌
-            fill_nearest = lambda x: x.fillna(x.iloc[order-1, :])
-            df[f'elapsed_ma_{order}'] = df.loc[:, ['userID', f'elapsed_ma_{order}']].groupby('userID').apply(fill_nearest)[f'elapsed_ma_{order}']
+            # 결측치 처리 - 유저마다 결측치에서 가장 가까운 elapsed_ma 값으로 동일하게 바꿔줌 (fill_nearest)
+            window = kernels.segment_window(df['elapsed'].values, kernels.group_ids(df, ['userID']), windows=(order,), fill_nearest=True)
+            df[f'elapsed_ma_{order}'] = kernels.round_values(window[f'mean_{order}'], decimals)
         
             return df         
         
@@ -1648,14 +1755,7 @@ class FE11(FeatureEngineer):
         def percentile(s):
             return np.sum(s) / len(s)
         
-        # grade를 나누기 위한 grade_map 함수 정의
-        def grade_map(x : float):
-            if x <= 0.4:
-                return 0
-            elif 0.4< x <0.8:
-                return 1
-            elif x >= 0.8:
-                return 2
+        # grade 구간화는 kernels.grade 사용 (0.4 이하 0, 0.8 미만 1, 그 이상 2)
         
         numeric_col = []
 
@@ -1665,13 +1765,8 @@ class FE11(FeatureEngineer):
         train_df['Timestamp'] = pd.to_datetime(train_df['Timestamp'], format="%Y-%m-%d %H:%M:%S")
         test_df['Timestamp'] = pd.to_datetime(test_df['Timestamp'], format="%Y-%m-%d %H:%M:%S")
 
-        diff = train_df.loc[:, ['userID','testId','Timestamp']].groupby(['userID','testId']).diff().fillna(pd.Timedelta(seconds=0))
-        diff = diff['Timestamp'].apply(lambda x: x.total_seconds())
-        train_df['elapsed'] = pd.concat([diff[1:], pd.Series([0.0])]).reset_index().iloc[:,1]  # 걸린 시간
-
-        diff = test_df.loc[:, ['userID','testId','Timestamp']].groupby(['userID','testId']).diff().fillna(pd.Timedelta(seconds=0))
-        diff = diff['Timestamp'].apply(lambda x: x.total_seconds())
-        test_df['elapsed'] = pd.concat([diff[1:], pd.Series([0.0])]).reset_index().iloc[:,1]  # 걸린 시간        
+        self.add_block(train_df, elapsed_block) # 걸린 시간
+        self.add_block(test_df, elapsed_block) # 걸린 시간
         
         #### 2. test_df 에서 test_tmp, test_last_sequence 떼어내기 ####
         # - test_tmp : not -1
@@ -1688,7 +1783,7 @@ class FE11(FeatureEngineer):
         })
         stu_groupby_train.columns = ['counts', 'meanAnswerRate'] # groupby 집계, counts : 유저가 푼 문제의 개수
         train_df['counts'] = train_df['userID'].map(stu_groupby_train['counts']) # mapping
-        stu_groupby_train['user_grade'] = stu_groupby_train['meanAnswerRate'].apply(grade_map) # 유저의 평균 정답률을 이용한 실력,등급 정의
+        stu_groupby_train['user_grade'] = kernels.grade(stu_groupby_train['meanAnswerRate']) # 유저의 평균 정답률을 이용한 실력,등급 정의
         train_df['user_grade'] = train_df['userID'].map(stu_groupby_train['user_grade']) # mapping
         
         stu_groupby_test = test_df.groupby('userID').agg({
@@ -1697,7 +1792,7 @@ class FE11(FeatureEngineer):
         })
         stu_groupby_test.columns = ['counts', 'meanAnswerRate'] # groupby 집계, counts : 유저가 푼 문제의 개수
         test_df['counts'] = test_df['userID'].map(stu_groupby_test['counts']) # mapping
-        stu_groupby_test['user_grade'] = stu_groupby_test['meanAnswerRate'].apply(grade_map) # 유저의 평균 정답률을 이용한 실력,등급 정의
+        stu_groupby_test['user_grade'] = kernels.grade(stu_groupby_test['meanAnswerRate']) # 유저의 평균 정답률을 이용한 실력,등급 정의
         test_df['user_grade'] = test_df['userID'].map(stu_groupby_test['user_grade']) # mapping
         
         ## 2. prob_groupby_train : assessmentItemID 이용한 FE ## 
@@ -1706,11 +1801,11 @@ class FE11(FeatureEngineer):
             'answerCode': percentile
         })
         prob_groupby_train.columns = ['numUsers', 'meanAnswerRate'] # groupby 집계, numUsers : 문제를 푼 유저는 몇명인지
-        prob_groupby_train['ass_grade'] = prob_groupby_train['meanAnswerRate'].apply(grade_map) # 문제 평균 정답률을 이용한 난이도 정의
+        prob_groupby_train['ass_grade'] = kernels.grade(prob_groupby_train['meanAnswerRate']) # 문제 평균 정답률을 이용한 난이도 정의
         train_df['ass_grade'] = train_df['assessmentItemID'].map(prob_groupby_train['ass_grade']) # mapping
         
         prob_solved_mean = prob_groupby_train['numUsers'].mean() # numUsers의 평균 (평균적으로 각 문제들은 몇 명에게 노출됐는가)
-        prob_groupby_train['ass_solved'] = prob_groupby_train['numUsers'].apply(lambda x: int(x>prob_solved_mean)) # 문제가 많이 노출된 편인지, 아닌지 여부
+        prob_groupby_train['ass_solved'] = kernels.above(prob_groupby_train['numUsers'], prob_solved_mean) # 문제가 많이 노출된 편인지, 아닌지 여부
         train_df['ass_solved'] = train_df['assessmentItemID'].map(prob_groupby_train['ass_solved']) # mapping
 
         prob_groupby_test = test_df.groupby('assessmentItemID').agg({
@@ -1718,11 +1813,11 @@ class FE11(FeatureEngineer):
             'answerCode': percentile
         })
         prob_groupby_test.columns = ['numUsers', 'meanAnswerRate'] # groupby 집계, numUsers : 문제를 푼 유저는 몇명인지
-        prob_groupby_test['ass_grade'] = prob_groupby_test['meanAnswerRate'].apply(grade_map) # 문제 평균 정답률을 이용한 난이도 정의
+        prob_groupby_test['ass_grade'] = kernels.grade(prob_groupby_test['meanAnswerRate']) # 문제 평균 정답률을 이용한 난이도 정의
         test_df['ass_grade'] = test_df['assessmentItemID'].map(prob_groupby_test['ass_grade']) # mapping
         
         prob_solved_mean = prob_groupby_test['numUsers'].mean() # numUsers의 평균 (평균적으로 각 문제들은 몇 명에게 노출됐는가)
-        prob_groupby_test['ass_solved'] = prob_groupby_test['numUsers'].apply(lambda x: int(x>prob_solved_mean)) # 문제가 많이 노출된 편인지, 아닌지 여부
+        prob_groupby_test['ass_solved'] = kernels.above(prob_groupby_test['numUsers'], prob_solved_mean) # 문제가 많이 노출된 편인지, 아닌지 여부
         test_df['ass_solved'] = test_df['assessmentItemID'].map(prob_groupby_test['ass_solved']) # mapping
         
         # FE05 내용 추가
@@ -1763,8 +1858,8 @@ class FE11(FeatureEngineer):
 
         # FE04 에서 maxprob feature 추가하는 방법 참고
         # 각 시험 속 문항번호를 수치형으로 만들어 추가한다.
-        train_df['probnum'] = train_df['assessmentItemID'].apply(lambda x: int(x[-3:]))
-        test_df['probnum'] = test_df['assessmentItemID'].apply(lambda x: int(x[-3:]))
+        train_df['probnum'] = kernels.last_digits(train_df['assessmentItemID'])
+        test_df['probnum'] = kernels.last_digits(test_df['assessmentItemID'])
 
         # 위 번호를 토대로 각 시험의 최종 문항을 피쳐로 추가한다.
         train_groupby = train_df.groupby('testId')
@@ -1785,11 +1880,11 @@ class FE11(FeatureEngineer):
             'answerCode': percentile
         })
         tag_groupby_train.columns = ['numUsers', 'meanAnswerRate'] # groupby 집계, numUsers : 문제를 푼 유저는 몇명인지
-        tag_groupby_train['tag_grade'] = tag_groupby_train['meanAnswerRate'].apply(lambda x: grade_map(x)) # 태그 평균 정답률을 이용한 난이도 정의
+        tag_groupby_train['tag_grade'] = kernels.grade(tag_groupby_train['meanAnswerRate']) # 태그 평균 정답률을 이용한 난이도 정의
         train_df['tag_grade'] = train_df['KnowledgeTag'].map(tag_groupby_train['tag_grade']) # merged mapping
         
         tag_solved_mean = tag_groupby_train['numUsers'].mean() # numUsers의 평균 (평균적으로 각 태그들은 몇 명에게 노출됐는가)
-        tag_groupby_train['tag_solved'] = tag_groupby_train['numUsers'].apply(lambda x:int(x>tag_solved_mean)) # 태그가 많이 노출된 편인지, 아닌지 여부
+        tag_groupby_train['tag_solved'] = kernels.above(tag_groupby_train['numUsers'], tag_solved_mean) # 태그가 많이 노출된 편인지, 아닌지 여부
         train_df['tag_solved'] = train_df['KnowledgeTag'].map(tag_groupby_train['tag_solved']) # merged mapping
 
         tag_groupby_test = test_df.groupby('KnowledgeTag').agg({
@@ -1797,11 +1892,11 @@ class FE11(FeatureEngineer):
             'answerCode': percentile
         })
         tag_groupby_test.columns = ['numUsers', 'meanAnswerRate'] # groupby 집계, numUsers : 문제를 푼 유저는 몇명인지
-        tag_groupby_test['tag_grade'] = tag_groupby_test['meanAnswerRate'].apply(lambda x: grade_map(x)) # 태그 평균 정답률을 이용한 난이도 정의
+        tag_groupby_test['tag_grade'] = kernels.grade(tag_groupby_test['meanAnswerRate']) # 태그 평균 정답률을 이용한 난이도 정의
         test_df['tag_grade'] = test_df['KnowledgeTag'].map(tag_groupby_test['tag_grade']) # merged mapping
         
         tag_solved_mean = tag_groupby_test['numUsers'].mean() # numUsers의 평균 (평균적으로 각 태그들은 몇 명에게 노출됐는가)
-        tag_groupby_test['tag_solved'] = tag_groupby_test['numUsers'].apply(lambda x:int(x>tag_solved_mean)) # 태그가 많이 노출된 편인지, 아닌지 여부
+        tag_groupby_test['tag_solved'] = kernels.above(tag_groupby_test['numUsers'], tag_solved_mean) # 태그가 많이 노출된 편인지, 아닌지 여부
         test_df['tag_solved'] = test_df['KnowledgeTag'].map(tag_groupby_test['tag_solved']) # merged mapping
         
 
@@ -1809,29 +1904,14 @@ class FE11(FeatureEngineer):
         # - 보통 시험의 마지막 문제는 elapsed가 0이다. (그 문제를 풀고 끝나기 때문에, 얼마나 걸렸는지 알 수가 없고, 그렇기 때문에 그 값을 0으로 대치하는 느낌)
         # - **이 값들을 효과적으로 대치할 수 있으면, test_last_sequence에 elapsed를 효과적으로 전달할 수 있기 때문에 미리 진행**
         # - 우선 merged에서, 시간이 900초 이상 (15분 이상)소요된 풀이시간은 모두 900초로 대치해주자 (대략 31421건)
-        train_df['elapsed'] = train_df['elapsed'].apply(lambda x : 900 if x > 900 else x)
-        test_df['elapsed'] = test_df['elapsed'].apply(lambda x : 900 if x > 900 else x)
-
         # - elapsed가 0이 아닌것과 0인것을 나눠서 일단 쪼개고 (인덱스는 건들지 말자), elapsed가 0인 data frame에 유저별 문제풀이 시간의 중앙값으로 대치하고 다시 합쳐주자
-        # - 합칠때는 concat으로 위아래로 붙인다음에 index 기준 정렬
-        train_df_elapsed_not0 = train_df[train_df.elapsed != 0]
-        train_df_elapsed_0 = train_df[train_df.elapsed == 0]
-        train_df_elapsed_0['elapsed'] = train_df_elapsed_0['userID'].map(train_df.groupby('userID')['elapsed'].median())
-
-        train_df = pd.concat([train_df_elapsed_not0,train_df_elapsed_0], axis=0)
-        train_df =train_df.sort_index()
-        
-        test_df_elapsed_not0 = test_df[test_df.elapsed != 0]
-        test_df_elapsed_0 = test_df[test_df.elapsed == 0]
-        test_df_elapsed_0['elapsed'] = test_df_elapsed_0['userID'].map(test_df.groupby('userID')['elapsed'].median())
-
-        test_df = pd.concat([test_df_elapsed_not0,test_df_elapsed_0], axis=0)
-        test_df =test_df.sort_index()
+        self.add_block(train_df, elapsed_fill_block)
+        self.add_block(test_df, elapsed_fill_block)
         
         
         # - 이제 elapsed가 잘 대치 되어있기 때문에, mark_randomly feature를 만들 수 있다.
-        train_df['mark_randomly'] = train_df['elapsed'].apply(lambda x: int((x>0) & (x<=5)))     # 걸린 시간이 1초에서 5초 사이는 평균 정답률이 너무 낮아서 찍은 걸로 간주
-        test_df['mark_randomly'] = test_df['elapsed'].apply(lambda x: int((x>0) & (x<=5)))     # 걸린 시간이 1초에서 5초 사이는 평균 정답률이 너무 낮아서 찍은 걸로 간주
+        train_df['mark_randomly'] = kernels.between(train_df['elapsed'], 0, 5)     # 걸린 시간이 1초에서 5초 사이는 평균 정답률이 너무 낮아서 찍은 걸로 간주
+        test_df['mark_randomly'] = kernels.between(test_df['elapsed'], 0, 5)     # 걸린 시간이 1초에서 5초 사이는 평균 정답률이 너무 낮아서 찍은 걸로 간주
 
         # 수치형 feature 정규화
         scaler = StandardScaler()
@@ -1890,14 +1970,7 @@ class FE12(FeatureEngineer):
         def percentile(s):
             return np.sum(s) / len(s)
         
-        # grade를 나누기 위한 grade_map 함수 정의
-        def grade_map(x : float):
-            if x <= 0.4:
-                return 0
-            elif 0.4< x <0.8:
-                return 1
-            elif x >= 0.8:
-                return 2
+        # grade 구간화는 kernels.grade 사용 (0.4 이하 0, 0.8 미만 1, 그 이상 2)
         
         numeric_col = []
 
@@ -1907,16 +1980,11 @@ class FE12(FeatureEngineer):
         train_df['Timestamp'] = pd.to_datetime(train_df['Timestamp'], format="%Y-%m-%d %H:%M:%S")
         test_df['Timestamp'] = pd.to_datetime(test_df['Timestamp'], format="%Y-%m-%d %H:%M:%S")
 
-        train_df['interaction'] = train_df.groupby(['userID','testId'])[['answerCode']].shift()['answerCode'].fillna(-1).astype(np.int16)
-        test_df['interaction'] = test_df.groupby(['userID','testId'])[['answerCode']].shift()['answerCode'].fillna(-1).astype(np.int16)
+        self.add_block(train_df, interaction_block)
+        self.add_block(test_df, interaction_block)
 
-        diff = train_df.loc[:, ['userID','testId','Timestamp']].groupby(['userID','testId']).diff().fillna(pd.Timedelta(seconds=0))
-        diff = diff['Timestamp'].apply(lambda x: x.total_seconds())
-        train_df['elapsed'] = pd.concat([diff[1:], pd.Series([0.0])]).reset_index().iloc[:,1]  # 걸린 시간
-
-        diff = test_df.loc[:, ['userID','testId','Timestamp']].groupby(['userID','testId']).diff().fillna(pd.Timedelta(seconds=0))
-        diff = diff['Timestamp'].apply(lambda x: x.total_seconds())
-        test_df['elapsed'] = pd.concat([diff[1:], pd.Series([0.0])]).reset_index().iloc[:,1]  # 걸린 시간        
+        self.add_block(train_df, elapsed_block) # 걸린 시간
+        self.add_block(test_df, elapsed_block) # 걸린 시간
         
         #### 2. test_df 에서 test_tmp, test_last_sequence 떼어내기 ####
         # - test_tmp : not -1
@@ -1942,7 +2010,7 @@ class FE12(FeatureEngineer):
         test_tmp['counts'] = test_tmp['userID'].map(stu_groupby_merged['counts']) # test_tmp mapping
         test_last_sequence['counts'] = test_last_sequence['userID'].map(stu_groupby_merged['counts']) # test_last_sequence mapping
 
-        stu_groupby_merged['user_grade'] = stu_groupby_merged['meanAnswerRate'].apply(grade_map) # 유저의 평균 정답률을 이용한 실력,등급 정의
+        stu_groupby_merged['user_grade'] = kernels.grade(stu_groupby_merged['meanAnswerRate']) # 유저의 평균 정답률을 이용한 실력,등급 정의
         merged['user_grade'] = merged['userID'].map(stu_groupby_merged['user_grade']) # merged mapping
         test_tmp['user_grade'] = test_tmp['userID'].map(stu_groupby_merged['user_grade']) # test_tmp mapping
         test_last_sequence['user_grade'] = test_last_sequence['userID'].map(stu_groupby_merged['user_grade']) # test_last_sequence mapping
@@ -1953,7 +2021,7 @@ class FE12(FeatureEngineer):
             'answerCode': percentile
         })
         prob_groupby.columns = ['numUsers', 'meanAnswerRate'] # groupby 집계, numUsers : 문제를 푼 유저는 몇명인지
-        prob_groupby['ass_grade'] = prob_groupby['meanAnswerRate'].apply(grade_map) # 문제 평균 정답률을 이용한 난이도 정의
+        prob_groupby['ass_grade'] = kernels.grade(prob_groupby['meanAnswerRate']) # 문제 평균 정답률을 이용한 난이도 정의
         merged['ass_grade'] = merged['assessmentItemID'].map(prob_groupby['ass_grade']) # merged mapping
         test_tmp['ass_grade'] = test_tmp['assessmentItemID'].map(prob_groupby['ass_grade']) # test_tmp mapping
         test_last_sequence['ass_grade'] = test_last_sequence['assessmentItemID'].map(prob_groupby['ass_grade']) # test_last_sequence mapping
@@ -1969,9 +2037,9 @@ class FE12(FeatureEngineer):
         
         # FE04 에서 maxprob feature 추가하는 방법 참고
         # 각 시험 속 문항번호를 수치형으로 만들어 추가한다.
-        merged['probnum'] = merged['assessmentItemID'].apply(lambda x: int(x[-3:]))
-        test_tmp['probnum'] = test_tmp['assessmentItemID'].apply(lambda x: int(x[-3:]))
-        test_last_sequence['probnum'] =test_last_sequence['assessmentItemID'].apply(lambda x: int(x[-3:]))
+        merged['probnum'] = kernels.last_digits(merged['assessmentItemID'])
+        test_tmp['probnum'] = kernels.last_digits(test_tmp['assessmentItemID'])
+        test_last_sequence['probnum'] =kernels.last_digits(test_last_sequence['assessmentItemID'])
 
         # 위 번호를 토대로 각 시험의 최종 문항을 피쳐로 추가한다.
         merged_tmp = merged.groupby('testId')
@@ -1988,16 +2056,8 @@ class FE12(FeatureEngineer):
         # - 보통 시험의 마지막 문제는 elapsed가 0이다. (그 문제를 풀고 끝나기 때문에, 얼마나 걸렸는지 알 수가 없고, 그렇기 때문에 그 값을 0으로 대치하는 느낌)
         # - **이 값들을 효과적으로 대치할 수 있으면, test_last_sequence에 elapsed를 효과적으로 전달할 수 있기 때문에 미리 진행**
         # - 우선 merged에서, 시간이 900초 이상 (15분 이상)소요된 풀이시간은 모두 900초로 대치해주자 (대략 31421건)
-        merged['elapsed'] = merged['elapsed'].apply(lambda x : 900 if x > 900 else x)
-
         # - elapsed가 0이 아닌것과 0인것을 나눠서 일단 쪼개고 (인덱스는 건들지 말자), elapsed가 0인 data frame에 유저별 문제풀이 시간의 중앙값으로 대치하고 다시 합쳐주자
-        # - 합칠때는 concat으로 위아래로 붙인다음에 index 기준 정렬
-        merged_elapsed_not0 = merged[merged.elapsed != 0]
-        merged_elapsed_0 = merged[merged.elapsed == 0]
-        merged_elapsed_0['elapsed'] = merged_elapsed_0['userID'].map(merged.groupby('userID')['elapsed'].median())
-
-        merged = pd.concat([merged_elapsed_not0,merged_elapsed_0], axis=0)
-        merged = merged.sort_index()
+        self.add_block(merged, elapsed_fill_block)
         
         # - 이제 test_last_sequence에 있는 elapsed가 0인 애들은, 다른 사람들은 그 문제를 푸는데 얼마나 걸렸는지를 기준으로 대치할 수 있게 되었다
         test_last_sequence['elapsed'] = test_last_sequence['assessmentItemID'].map(merged.groupby('assessmentItemID')['elapsed'].median())
@@ -2008,8 +2068,8 @@ class FE12(FeatureEngineer):
         test_df = pd.concat([test_tmp, test_last_sequence], axis=0).sort_index()
 
         # - 이제 elapsed가 잘 대치 되어있기 때문에, mark_randomly feature를 만들 수 있다.
-        merged['mark_randomly'] = merged['elapsed'].apply(lambda x: int((x>0) & (x<=5)))     # 걸린 시간이 1초에서 5초 사이는 평균 정답률이 너무 낮아서 찍은 걸로 간주
-        test_df['mark_randomly'] = test_df['elapsed'].apply(lambda x: int((x>0) & (x<=5)))     # 걸린 시간이 1초에서 5초 사이는 평균 정답률이 너무 낮아서 찍은 걸로 간주
+        merged['mark_randomly'] = kernels.between(merged['elapsed'], 0, 5)     # 걸린 시간이 1초에서 5초 사이는 평균 정답률이 너무 낮아서 찍은 걸로 간주
+        test_df['mark_randomly'] = kernels.between(test_df['elapsed'], 0, 5)     # 걸린 시간이 1초에서 5초 사이는 평균 정답률이 너무 낮아서 찍은 걸로 간주
 
         # 수치형 feature 정규화
         scaler = StandardScaler()
@@ -2063,46 +2123,8 @@ class FE13(FeatureEngineer):
         def percentile(s):
             return np.sum(s) / len(s)
         
-        # grade를 나누기 위한 grade_map 함수 정의
-        def grade_map(x : float):
-            if x <= 0.4:
-                return 0
-            elif 0.4< x <0.8:
-                return 1
-            elif x >= 0.8:
-                return 2
-        
-        def cate_map(x: float):
-            if np.isnan(x):
-                return -1
-            else:
-                x = round(x * 100)
-                x = x//10
-                return x
-
-        def elpased_map(x:float):
-            if x == 0:
-                return 0
-            elif x <= 3.0:
-                return 1
-            elif x <= 8.0:
-                return 2
-            elif x <= 14.0:
-                return 3
-            elif x <= 20.0:
-                return 4
-            elif x <= 25.0:
-                return 5
-            elif x <= 32.0:
-                return 6
-            elif x <= 45.0:
-                return 7
-            elif x <= 69.0:
-                return 8
-            elif x <= 133.0:
-                return 9
-            elif x <= 900.0:
-                return 10
+        # grade 구간화는 kernels.grade 사용 (0.4 이하 0, 0.8 미만 1, 그 이상 2)
+        
 
         numeric_col = []
 
@@ -2112,16 +2134,11 @@ class FE13(FeatureEngineer):
         train_df['Timestamp'] = pd.to_datetime(train_df['Timestamp'], format="%Y-%m-%d %H:%M:%S")
         test_df['Timestamp'] = pd.to_datetime(test_df['Timestamp'], format="%Y-%m-%d %H:%M:%S")
 
-        train_df['interaction'] = train_df.groupby(['userID','testId'])[['answerCode']].shift()['answerCode'].fillna(-1).astype(np.int16)
-        test_df['interaction'] = test_df.groupby(['userID','testId'])[['answerCode']].shift()['answerCode'].fillna(-1).astype(np.int16)
-
-        diff = train_df.loc[:, ['userID','testId','Timestamp']].groupby(['userID','testId']).diff().fillna(pd.Timedelta(seconds=0))
-        diff = diff['Timestamp'].apply(lambda x: x.total_seconds())
-        train_df['elapsed'] = pd.concat([diff[1:], pd.Series([0.0])]).reset_index().iloc[:,1]  # 걸린 시간
+        self.add_block(train_df, interaction_block)
+        self.add_block(test_df, interaction_block)
 
-        diff = test_df.loc[:, ['userID','testId','Timestamp']].groupby(['userID','testId']).diff().fillna(pd.Timedelta(seconds=0))
-        diff = diff['Timestamp'].apply(lambda x: x.total_seconds())
-        test_df['elapsed'] = pd.concat([diff[1:], pd.Series([0.0])]).reset_index().iloc[:,1]  # 걸린 시간        
+        self.add_block(train_df, elapsed_block) # 걸린 시간
+        self.add_block(test_df, elapsed_block) # 걸린 시간
         
         #### 2. test_df 에서 test_tmp, test_last_sequence 떼어내기 ####
         # - test_tmp : not -1
@@ -2147,12 +2164,12 @@ class FE13(FeatureEngineer):
         test_tmp['counts'] = test_tmp['userID'].map(stu_groupby_merged['counts']) # test_tmp mapping
         test_last_sequence['counts'] = test_last_sequence['userID'].map(stu_groupby_merged['counts']) # test_last_sequence mapping
 
-        stu_groupby_merged['user_grade'] = stu_groupby_merged['meanAnswerRate'].apply(grade_map) # 유저의 평균 정답률을 이용한 실력,등급 정의
+        stu_groupby_merged['user_grade'] = kernels.grade(stu_groupby_merged['meanAnswerRate']) # 유저의 평균 정답률을 이용한 실력,등급 정의
         merged['user_grade'] = merged['userID'].map(stu_groupby_merged['user_grade']) # merged mapping
         test_tmp['user_grade'] = test_tmp['userID'].map(stu_groupby_merged['user_grade']) # test_tmp mapping
         test_last_sequence['user_grade'] = test_last_sequence['userID'].map(stu_groupby_merged['user_grade']) # test_last_sequence mapping
         
-        stu_groupby_merged['user_mean'] = stu_groupby_merged['meanAnswerRate'].apply(cate_map) # 유저의 평균 정답률로 10개 범주화
+        stu_groupby_merged['user_mean'] = kernels.percent_bucket(stu_groupby_merged['meanAnswerRate']) # 유저의 평균 정답률로 10개 범주화
         merged['user_mean'] = merged['userID'].map(stu_groupby_merged['user_mean']) # merged mapping
         test_tmp['user_mean'] = test_tmp['userID'].map(stu_groupby_merged['user_mean']) # test_tmp mapping
         test_last_sequence['user_mean'] = test_last_sequence['userID'].map(stu_groupby_merged['user_mean']) # test_last_sequence mapping
@@ -2163,12 +2180,12 @@ class FE13(FeatureEngineer):
             'answerCode': percentile
         })
         prob_groupby.columns = ['numUsers', 'meanAnswerRate'] # groupby 집계, numUsers : 문제를 푼 유저는 몇명인지
-        prob_groupby['ass_grade'] = prob_groupby['meanAnswerRate'].apply(grade_map) # 문제 평균 정답률을 이용한 난이도 정의
+        prob_groupby['ass_grade'] = kernels.grade(prob_groupby['meanAnswerRate']) # 문제 평균 정답률을 이용한 난이도 정의
         merged['ass_grade'] = merged['assessmentItemID'].map(prob_groupby['ass_grade']) # merged mapping
         test_tmp['ass_grade'] = test_tmp['assessmentItemID'].map(prob_groupby['ass_grade']) # test_tmp mapping
         test_last_sequence['ass_grade'] = test_last_sequence['assessmentItemID'].map(prob_groupby['ass_grade']) # test_last_sequence mapping
 
-        prob_groupby['ass_mean'] = prob_groupby['meanAnswerRate'].apply(cate_map) # 문제 평균 정답률을 이용한 난이도 정의
+        prob_groupby['ass_mean'] = kernels.percent_bucket(prob_groupby['meanAnswerRate']) # 문제 평균 정답률을 이용한 난이도 정의
         merged['ass_mean'] = merged['assessmentItemID'].map(prob_groupby['ass_mean']) # merged mapping
         test_tmp['ass_mean'] = test_tmp['assessmentItemID'].map(prob_groupby['ass_mean']) # test_tmp mapping
         test_last_sequence['ass_mean'] = test_last_sequence['assessmentItemID'].map(prob_groupby['ass_mean']) # test_last_sequence mapping
@@ -2188,12 +2205,12 @@ class FE13(FeatureEngineer):
             'answerCode': percentile
         })
         test_groupby.columns = ['numUsers', 'meanAnswerRate'] # groupby 집계, numUsers : 문제를 푼 유저는 몇명인지
-        test_groupby['test_grade'] = test_groupby['meanAnswerRate'].apply(grade_map) # 문제 평균 정답률을 이용한 난이도 정의
+        test_groupby['test_grade'] = kernels.grade(test_groupby['meanAnswerRate']) # 문제 평균 정답률을 이용한 난이도 정의
         merged['test_grade'] = merged['testId'].map(test_groupby['test_grade']) # merged mapping
         test_tmp['test_grade'] = test_tmp['testId'].map(test_groupby['test_grade']) # test_tmp mapping
         test_last_sequence['test_grade'] = test_last_sequence['testId'].map(test_groupby['test_grade']) # test_last_sequence mapping
 
-        test_groupby['test_mean'] = test_groupby['meanAnswerRate'].apply(cate_map) # 문제 평균 정답률을 이용한 난이도 정의
+        test_groupby['test_mean'] = kernels.percent_bucket(test_groupby['meanAnswerRate']) # 문제 평균 정답률을 이용한 난이도 정의
         merged['test_mean'] = merged['testId'].map(test_groupby['test_mean']) # merged mapping
         test_tmp['test_mean'] = test_tmp['testId'].map(test_groupby['test_mean']) # test_tmp mapping
         test_last_sequence['test_mean'] = test_last_sequence['testId'].map(test_groupby['test_mean']) # test_last_sequence mapping
@@ -2209,9 +2226,9 @@ class FE13(FeatureEngineer):
 
         # FE04 에서 maxprob feature 추가하는 방법 참고
         # 각 시험 속 문항번호를 수치형으로 만들어 추가한다.
-        merged['probnum'] = merged['assessmentItemID'].apply(lambda x: int(x[-3:]))
-        test_tmp['probnum'] = test_tmp['assessmentItemID'].apply(lambda x: int(x[-3:]))
-        test_last_sequence['probnum'] =test_last_sequence['assessmentItemID'].apply(lambda x: int(x[-3:]))
+        merged['probnum'] = kernels.last_digits(merged['assessmentItemID'])
+        test_tmp['probnum'] = kernels.last_digits(test_tmp['assessmentItemID'])
+        test_last_sequence['probnum'] =kernels.last_digits(test_last_sequence['assessmentItemID'])
 
         # 위 번호를 토대로 각 시험의 최종 문항을 피쳐로 추가한다.
         merged_tmp = merged.groupby('testId')
@@ -2228,16 +2245,8 @@ class FE13(FeatureEngineer):
         # - 보통 시험의 마지막 문제는 elapsed가 0이다. (그 문제를 풀고 끝나기 때문에, 얼마나 걸렸는지 알 수가 없고, 그렇기 때문에 그 값을 0으로 대치하는 느낌)
         # - **이 값들을 효과적으로 대치할 수 있으면, test_last_sequence에 elapsed를 효과적으로 전달할 수 있기 때문에 미리 진행**
         # - 우선 merged에서, 시간이 900초 이상 (15분 이상)소요된 풀이시간은 모두 900초로 대치해주자 (대략 31421건)
-        merged['elapsed'] = merged['elapsed'].apply(lambda x : 900 if x > 900 else x)
-
         # - elapsed가 0이 아닌것과 0인것을 나눠서 일단 쪼개고 (인덱스는 건들지 말자), elapsed가 0인 data frame에 유저별 문제풀이 시간의 중앙값으로 대치하고 다시 합쳐주자
-        # - 합칠때는 concat으로 위아래로 붙인다음에 index 기준 정렬
-        merged_elapsed_not0 = merged[merged.elapsed != 0]
-        merged_elapsed_0 = merged[merged.elapsed == 0]
-        merged_elapsed_0['elapsed'] = merged_elapsed_0['userID'].map(merged.groupby('userID')['elapsed'].median())
-
-        merged = pd.concat([merged_elapsed_not0,merged_elapsed_0], axis=0)
-        merged = merged.sort_index()
+        self.add_block(merged, elapsed_fill_block)
         
         # - 이제 test_last_sequence에 있는 elapsed가 0인 애들은, 다른 사람들은 그 문제를 푸는데 얼마나 걸렸는지를 기준으로 대치할 수 있게 되었다
         test_last_sequence['elapsed'] = test_last_sequence['assessmentItemID'].map(merged.groupby('assessmentItemID')['elapsed'].median())
@@ -2248,13 +2257,13 @@ class FE13(FeatureEngineer):
         test_df = pd.concat([test_tmp, test_last_sequence], axis=0).sort_index()
 
         # - 이제 elapsed가 잘 대치 되어있기 때문에, mark_randomly feature를 만들 수 있다.
-        merged['mark_randomly'] = merged['elapsed'].apply(lambda x: int((x>0) & (x<=5)))     # 걸린 시간이 1초에서 5초 사이는 평균 정답률이 너무 낮아서 찍은 걸로 간주
-        test_df['elapsed'] = test_df['elapsed'].apply(lambda x : 900 if x > 900 else x)
-        test_df['mark_randomly'] = test_df['elapsed'].apply(lambda x: int((x>0) & (x<=5)))     # 걸린 시간이 1초에서 5초 사이는 평균 정답률이 너무 낮아서 찍은 걸로 간주
+        merged['mark_randomly'] = kernels.between(merged['elapsed'], 0, 5)     # 걸린 시간이 1초에서 5초 사이는 평균 정답률이 너무 낮아서 찍은 걸로 간주
+        test_df['elapsed'] = kernels.clip_upper(test_df['elapsed'], 900)
+        test_df['mark_randomly'] = kernels.between(test_df['elapsed'], 0, 5)     # 걸린 시간이 1초에서 5초 사이는 평균 정답률이 너무 낮아서 찍은 걸로 간주
         
         # elapsed로 구간 범주화
-        merged['elapsed_c'] = merged['elapsed'].apply(elpased_map)
-        test_df['elapsed_c'] = test_df['elapsed'].apply(elpased_map)
+        merged['elapsed_c'] = kernels.elapsed_bucket(merged['elapsed'])
+        test_df['elapsed_c'] = kernels.elapsed_bucket(test_df['elapsed'])
         
         numeric_col.append('elapsed')
 
@@ -2323,46 +2332,8 @@ class FE14(FeatureEngineer):
         def percentile(s):
             return np.sum(s) / len(s)
         
-        # grade를 나누기 위한 grade_map 함수 정의
-        def grade_map(x : float):
-            if x <= 0.4:
-                return 0
-            elif 0.4< x <0.8:
-                return 1
-            elif x >= 0.8:
-                return 2
-        
-        def cate_map(x: float):
-            if np.isnan(x):
-                return -1
-            else:
-                x = round(x * 100)
-                x = x//10
-                return x
-
-        def elpased_map(x:float):
-            if x == 0:
-                return 0
-            elif x <= 3.0:
-                return 1
-            elif x <= 8.0:
-                return 2
-            elif x <= 14.0:
-                return 3
-            elif x <= 20.0:
-                return 4
-            elif x <= 25.0:
-                return 5
-            elif x <= 32.0:
-                return 6
-            elif x <= 45.0:
-                return 7
-            elif x <= 69.0:
-                return 8
-            elif x <= 133.0:
-                return 9
-            elif x <= 900.0:
-                return 10
+        # grade 구간화는 kernels.grade 사용 (0.4 이하 0, 0.8 미만 1, 그 이상 2)
+        
 
         numeric_col = []
 
@@ -2372,24 +2343,14 @@ class FE14(FeatureEngineer):
         train_df['Timestamp'] = pd.to_datetime(train_df['Timestamp'], format="%Y-%m-%d %H:%M:%S")
         test_df['Timestamp'] = pd.to_datetime(test_df['Timestamp'], format="%Y-%m-%d %H:%M:%S")
 
-        train_df['interaction'] = train_df.groupby(['userID','testId'])[['answerCode']].shift()['answerCode'].fillna(-1).astype(np.int16)
-        test_df['interaction'] = test_df.groupby(['userID','testId'])[['answerCode']].shift()['answerCode'].fillna(-1).astype(np.int16)
-
-        diff = train_df.loc[:, ['userID','testId','Timestamp']].groupby(['userID','testId']).diff().fillna(pd.Timedelta(seconds=0))
-        diff = diff['Timestamp'].apply(lambda x: x.total_seconds())
-        train_df['elapsed'] = pd.concat([diff[1:], pd.Series([0.0])]).reset_index().iloc[:,1]  # 걸린 시간
-
-        diff = test_df.loc[:, ['userID','testId','Timestamp']].groupby(['userID','testId']).diff().fillna(pd.Timedelta(seconds=0))
-        diff = diff['Timestamp'].apply(lambda x: x.total_seconds())
-        test_df['elapsed'] = pd.concat([diff[1:], pd.Series([0.0])]).reset_index().iloc[:,1]  # 걸린 시간        
+        self.add_block(train_df, interaction_block)
+        self.add_block(test_df, interaction_block)
 
-        train_df['user_correct_answer'] = train_df.groupby('userID')['answerCode'].transform(lambda x: x.cumsum().shift(1)).fillna(0)
-        train_df['user_total_answer'] = train_df.groupby('userID')['answerCode'].cumcount().fillna(0)
-        train_df['user_acc'] = (train_df['user_correct_answer']/train_df['user_total_answer']).fillna(0)
+        self.add_block(train_df, elapsed_block) # 걸린 시간
+        self.add_block(test_df, elapsed_block) # 걸린 시간
 
-        test_df['user_correct_answer'] = test_df.groupby('userID')['answerCode'].transform(lambda x: x.cumsum().shift(1)).fillna(0)
-        test_df['user_total_answer'] = test_df.groupby('userID')['answerCode'].cumcount().fillna(0)
-        test_df['user_acc'] = (test_df['user_correct_answer']/test_df['user_total_answer']).fillna(0)
+        self.add_block(train_df, cum_answer_block)
+        self.add_block(test_df, cum_answer_block)
 
         # numeric_col.append('user_acc')
         # train_df.drop(['user_correct_answer', 'user_total_answer'], axis=1)
@@ -2419,12 +2380,12 @@ class FE14(FeatureEngineer):
         test_tmp['counts'] = test_tmp['userID'].map(stu_groupby_merged['counts']) # test_tmp mapping
         test_last_sequence['counts'] = test_last_sequence['userID'].map(stu_groupby_merged['counts']) # test_last_sequence mapping
 
-        stu_groupby_merged['user_grade'] = stu_groupby_merged['meanAnswerRate'].apply(grade_map) # 유저의 평균 정답률을 이용한 실력,등급 정의
+        stu_groupby_merged['user_grade'] = kernels.grade(stu_groupby_merged['meanAnswerRate']) # 유저의 평균 정답률을 이용한 실력,등급 정의
         merged['user_grade'] = merged['userID'].map(stu_groupby_merged['user_grade']) # merged mapping
         test_tmp['user_grade'] = test_tmp['userID'].map(stu_groupby_merged['user_grade']) # test_tmp mapping
         test_last_sequence['user_grade'] = test_last_sequence['userID'].map(stu_groupby_merged['user_grade']) # test_last_sequence mapping
         
-        stu_groupby_merged['user_mean'] = stu_groupby_merged['meanAnswerRate'].apply(cate_map) # 유저의 평균 정답률로 10개 범주화
+        stu_groupby_merged['user_mean'] = kernels.percent_bucket(stu_groupby_merged['meanAnswerRate']) # 유저의 평균 정답률로 10개 범주화
         merged['user_mean'] = merged['userID'].map(stu_groupby_merged['user_mean']) # merged mapping
         test_tmp['user_mean'] = test_tmp['userID'].map(stu_groupby_merged['user_mean']) # test_tmp mapping
         test_last_sequence['user_mean'] = test_last_sequence['userID'].map(stu_groupby_merged['user_mean']) # test_last_sequence mapping
@@ -2435,12 +2396,12 @@ class FE14(FeatureEngineer):
             'answerCode': percentile
         })
         prob_groupby.columns = ['numUsers', 'meanAnswerRate'] # groupby 집계, numUsers : 문제를 푼 유저는 몇명인지
-        prob_groupby['ass_grade'] = prob_groupby['meanAnswerRate'].apply(grade_map) # 문제 평균 정답률을 이용한 난이도 정의
+        prob_groupby['ass_grade'] = kernels.grade(prob_groupby['meanAnswerRate']) # 문제 평균 정답률을 이용한 난이도 정의
         merged['ass_grade'] = merged['assessmentItemID'].map(prob_groupby['ass_grade']) # merged mapping
         test_tmp['ass_grade'] = test_tmp['assessmentItemID'].map(prob_groupby['ass_grade']) # test_tmp mapping
         test_last_sequence['ass_grade'] = test_last_sequence['assessmentItemID'].map(prob_groupby['ass_grade']) # test_last_sequence mapping
 
-        prob_groupby['ass_mean'] = prob_groupby['meanAnswerRate'].apply(cate_map) # 문제 평균 정답률을 이용한 난이도 정의
+        prob_groupby['ass_mean'] = kernels.percent_bucket(prob_groupby['meanAnswerRate']) # 문제 평균 정답률을 이용한 난이도 정의
         merged['ass_mean'] = merged['assessmentItemID'].map(prob_groupby['ass_mean']) # merged mapping
         test_tmp['ass_mean'] = test_tmp['assessmentItemID'].map(prob_groupby['ass_mean']) # test_tmp mapping
         test_last_sequence['ass_mean'] = test_last_sequence['assessmentItemID'].map(prob_groupby['ass_mean']) # test_last_sequence mapping
@@ -2460,12 +2421,12 @@ class FE14(FeatureEngineer):
             'answerCode': percentile
         })
         test_groupby.columns = ['numUsers', 'meanAnswerRate'] # groupby 집계, numUsers : 문제를 푼 유저는 몇명인지
-        test_groupby['test_grade'] = test_groupby['meanAnswerRate'].apply(grade_map) # 문제 평균 정답률을 이용한 난이도 정의
+        test_groupby['test_grade'] = kernels.grade(test_groupby['meanAnswerRate']) # 문제 평균 정답률을 이용한 난이도 정의
         merged['test_grade'] = merged['testId'].map(test_groupby['test_grade']) # merged mapping
         test_tmp['test_grade'] = test_tmp['testId'].map(test_groupby['test_grade']) # test_tmp mapping
         test_last_sequence['test_grade'] = test_last_sequence['testId'].map(test_groupby['test_grade']) # test_last_sequence mapping
 
-        test_groupby['test_mean'] = test_groupby['meanAnswerRate'].apply(cate_map) # 문제 평균 정답률을 이용한 난이도 정의
+        test_groupby['test_mean'] = kernels.percent_bucket(test_groupby['meanAnswerRate']) # 문제 평균 정답률을 이용한 난이도 정의
         merged['test_mean'] = merged['testId'].map(test_groupby['test_mean']) # merged mapping
         test_tmp['test_mean'] = test_tmp['testId'].map(test_groupby['test_mean']) # test_tmp mapping
         test_last_sequence['test_mean'] = test_last_sequence['testId'].map(test_groupby['test_mean']) # test_last_sequence mapping
@@ -2481,9 +2442,9 @@ class FE14(FeatureEngineer):
 
         # FE04 에서 maxprob feature 추가하는 방법 참고
         # 각 시험 속 문항번호를 수치형으로 만들어 추가한다.
-        merged['probnum'] = merged['assessmentItemID'].apply(lambda x: int(x[-3:]))
-        test_tmp['probnum'] = test_tmp['assessmentItemID'].apply(lambda x: int(x[-3:]))
-        test_last_sequence['probnum'] =test_last_sequence['assessmentItemID'].apply(lambda x: int(x[-3:]))
+        merged['probnum'] = kernels.last_digits(merged['assessmentItemID'])
+        test_tmp['probnum'] = kernels.last_digits(test_tmp['assessmentItemID'])
+        test_last_sequence['probnum'] =kernels.last_digits(test_last_sequence['assessmentItemID'])
 
         # 위 번호를 토대로 각 시험의 최종 문항을 피쳐로 추가한다.
         merged_tmp = merged.groupby('testId')
@@ -2500,16 +2461,8 @@ class FE14(FeatureEngineer):
         # - 보통 시험의 마지막 문제는 elapsed가 0이다. (그 문제를 풀고 끝나기 때문에, 얼마나 걸렸는지 알 수가 없고, 그렇기 때문에 그 값을 0으로 대치하는 느낌)
         # - **이 값들을 효과적으로 대치할 수 있으면, test_last_sequence에 elapsed를 효과적으로 전달할 수 있기 때문에 미리 진행**
         # - 우선 merged에서, 시간이 900초 이상 (15분 이상)소요된 풀이시간은 모두 900초로 대치해주자 (대략 31421건)
-        merged['elapsed'] = merged['elapsed'].apply(lambda x : 900 if x > 900 else x)
-
         # - elapsed가 0이 아닌것과 0인것을 나눠서 일단 쪼개고 (인덱스는 건들지 말자), elapsed가 0인 data frame에 유저별 문제풀이 시간의 중앙값으로 대치하고 다시 합쳐주자
-        # - 합칠때는 concat으로 위아래로 붙인다음에 index 기준 정렬
-        merged_elapsed_not0 = merged[merged.elapsed != 0]
-        merged_elapsed_0 = merged[merged.elapsed == 0]
-        merged_elapsed_0['elapsed'] = merged_elapsed_0['userID'].map(merged.groupby('userID')['elapsed'].median())
-
-        merged = pd.concat([merged_elapsed_not0,merged_elapsed_0], axis=0)
-        merged = merged.sort_index()
+        self.add_block(merged, elapsed_fill_block)
         
         # - 이제 test_last_sequence에 있는 elapsed가 0인 애들은, 다른 사람들은 그 문제를 푸는데 얼마나 걸렸는지를 기준으로 대치할 수 있게 되었다
         test_last_sequence['elapsed'] = test_last_sequence['assessmentItemID'].map(merged.groupby('assessmentItemID')['elapsed'].median())
@@ -2520,13 +2473,13 @@ class FE14(FeatureEngineer):
         test_df = pd.concat([test_tmp, test_last_sequence], axis=0).sort_index()
 
         # - 이제 elapsed가 잘 대치 되어있기 때문에, mark_randomly feature를 만들 수 있다.
-        merged['mark_randomly'] = merged['elapsed'].apply(lambda x: int((x>0) & (x<=5)))     # 걸린 시간이 1초에서 5초 사이는 평균 정답률이 너무 낮아서 찍은 걸로 간주
-        test_df['elapsed'] = test_df['elapsed'].apply(lambda x : 900 if x > 900 else x)
-        test_df['mark_randomly'] = test_df['elapsed'].apply(lambda x: int((x>0) & (x<=5)))     # 걸린 시간이 1초에서 5초 사이는 평균 정답률이 너무 낮아서 찍은 걸로 간주
+        merged['mark_randomly'] = kernels.between(merged['elapsed'], 0, 5)     # 걸린 시간이 1초에서 5초 사이는 평균 정답률이 너무 낮아서 찍은 걸로 간주
+        test_df['elapsed'] = kernels.clip_upper(test_df['elapsed'], 900)
+        test_df['mark_randomly'] = kernels.between(test_df['elapsed'], 0, 5)     # 걸린 시간이 1초에서 5초 사이는 평균 정답률이 너무 낮아서 찍은 걸로 간주
         
         # elapsed로 구간 범주화
-        merged['elapsed_c'] = merged['elapsed'].apply(elpased_map)
-        test_df['elapsed_c'] = test_df['elapsed'].apply(elpased_map)
+        merged['elapsed_c'] = kernels.elapsed_bucket(merged['elapsed'])
+        test_df['elapsed_c'] = kernels.elapsed_bucket(test_df['elapsed'])
         
         numeric_col.append('elapsed')
 
@@ -2595,46 +2548,8 @@ class FE15(FeatureEngineer):
         def percentile(s):
             return np.sum(s) / len(s)
         
-        # grade를 나누기 위한 grade_map 함수 정의
-        def grade_map(x : float):
-            if x <= 0.4:
-                return 0
-            elif 0.4< x <0.8:
-                return 1
-            elif x >= 0.8:
-                return 2
-        
-        def cate_map(x: float):
-            if np.isnan(x):
-                return -1
-            else:
-                x = round(x * 100)
-                x = x//10
-                return x
-
-        def elpased_map(x:float):
-            if x == 0:
-                return 0
-            elif x <= 3.0:
-                return 1
-            elif x <= 8.0:
-                return 2
-            elif x <= 14.0:
-                return 3
-            elif x <= 20.0:
-                return 4
-            elif x <= 25.0:
-                return 5
-            elif x <= 32.0:
-                return 6
-            elif x <= 45.0:
-                return 7
-            elif x <= 69.0:
-                return 8
-            elif x <= 133.0:
-                return 9
-            elif x <= 900.0:
-                return 10
+        # grade 구간화는 kernels.grade 사용 (0.4 이하 0, 0.8 미만 1, 그 이상 2)
+        
 
         numeric_col = []
 
@@ -2644,24 +2559,14 @@ class FE15(FeatureEngineer):
         train_df['Timestamp'] = pd.to_datetime(train_df['Timestamp'], format="%Y-%m-%d %H:%M:%S")
         test_df['Timestamp'] = pd.to_datetime(test_df['Timestamp'], format="%Y-%m-%d %H:%M:%S")
 
-        train_df['interaction'] = train_df.groupby(['userID','testId'])[['answerCode']].shift()['answerCode'].fillna(-1).astype(np.int16)
-        test_df['interaction'] = test_df.groupby(['userID','testId'])[['answerCode']].shift()['answerCode'].fillna(-1).astype(np.int16)
-
-        diff = train_df.loc[:, ['userID','testId','Timestamp']].groupby(['userID','testId']).diff().fillna(pd.Timedelta(seconds=0))
-        diff = diff['Timestamp'].apply(lambda x: x.total_seconds())
-        train_df['elapsed'] = pd.concat([diff[1:], pd.Series([0.0])]).reset_index().iloc[:,1]  # 걸린 시간
-
-        diff = test_df.loc[:, ['userID','testId','Timestamp']].groupby(['userID','testId']).diff().fillna(pd.Timedelta(seconds=0))
-        diff = diff['Timestamp'].apply(lambda x: x.total_seconds())
-        test_df['elapsed'] = pd.concat([diff[1:], pd.Series([0.0])]).reset_index().iloc[:,1]  # 걸린 시간        
+        self.add_block(train_df, interaction_block)
+        self.add_block(test_df, interaction_block)
 
-        train_df['user_correct_answer'] = train_df.groupby('userID')['answerCode'].transform(lambda x: x.cumsum().shift(1)).fillna(0)
-        train_df['user_total_answer'] = train_df.groupby('userID')['answerCode'].cumcount().fillna(0)
-        train_df['user_acc'] = (train_df['user_correct_answer']/train_df['user_total_answer']).fillna(0)
+        self.add_block(train_df, elapsed_block) # 걸린 시간
+        self.add_block(test_df, elapsed_block) # 걸린 시간
 
-        test_df['user_correct_answer'] = test_df.groupby('userID')['answerCode'].transform(lambda x: x.cumsum().shift(1)).fillna(0)
-        test_df['user_total_answer'] = test_df.groupby('userID')['answerCode'].cumcount().fillna(0)
-        test_df['user_acc'] = (test_df['user_correct_answer']/test_df['user_total_answer']).fillna(0)
+        self.add_block(train_df, cum_answer_block)
+        self.add_block(test_df, cum_answer_block)
 
         # numeric_col.append('user_acc')
         # train_df.drop(['user_correct_answer', 'user_total_answer'], axis=1)
@@ -2691,12 +2596,12 @@ class FE15(FeatureEngineer):
         test_tmp['counts'] = test_tmp['userID'].map(stu_groupby_merged['counts']) # test_tmp mapping
         test_last_sequence['counts'] = test_last_sequence['userID'].map(stu_groupby_merged['counts']) # test_last_sequence mapping
 
-        stu_groupby_merged['user_grade'] = stu_groupby_merged['meanAnswerRate'].apply(grade_map) # 유저의 평균 정답률을 이용한 실력,등급 정의
+        stu_groupby_merged['user_grade'] = kernels.grade(stu_groupby_merged['meanAnswerRate']) # 유저의 평균 정답률을 이용한 실력,등급 정의
         merged['user_grade'] = merged['userID'].map(stu_groupby_merged['user_grade']) # merged mapping
         test_tmp['user_grade'] = test_tmp['userID'].map(stu_groupby_merged['user_grade']) # test_tmp mapping
         test_last_sequence['user_grade'] = test_last_sequence['userID'].map(stu_groupby_merged['user_grade']) # test_last_sequence mapping
         
-        stu_groupby_merged['user_mean'] = stu_groupby_merged['meanAnswerRate'].apply(cate_map) # 유저의 평균 정답률로 10개 범주화
+        stu_groupby_merged['user_mean'] = kernels.percent_bucket(stu_groupby_merged['meanAnswerRate']) # 유저의 평균 정답률로 10개 범주화
         merged['user_mean'] = merged['userID'].map(stu_groupby_merged['user_mean']) # merged mapping
         test_tmp['user_mean'] = test_tmp['userID'].map(stu_groupby_merged['user_mean']) # test_tmp mapping
         test_last_sequence['user_mean'] = test_last_sequence['userID'].map(stu_groupby_merged['user_mean']) # test_last_sequence mapping
@@ -2707,12 +2612,12 @@ class FE15(FeatureEngineer):
             'answerCode': percentile
         })
         prob_groupby.columns = ['numUsers', 'meanAnswerRate'] # groupby 집계, numUsers : 문제를 푼 유저는 몇명인지
-        prob_groupby['ass_grade'] = prob_groupby['meanAnswerRate'].apply(grade_map) # 문제 평균 정답률을 이용한 난이도 정의
+        prob_groupby['ass_grade'] = kernels.grade(prob_groupby['meanAnswerRate']) # 문제 평균 정답률을 이용한 난이도 정의
         merged['ass_grade'] = merged['assessmentItemID'].map(prob_groupby['ass_grade']) # merged mapping
         test_tmp['ass_grade'] = test_tmp['assessmentItemID'].map(prob_groupby['ass_grade']) # test_tmp mapping
         test_last_sequence['ass_grade'] = test_last_sequence['assessmentItemID'].map(prob_groupby['ass_grade']) # test_last_sequence mapping
 
-        prob_groupby['ass_mean'] = prob_groupby['meanAnswerRate'].apply(cate_map) # 문제 평균 정답률을 이용한 난이도 정의
+        prob_groupby['ass_mean'] = kernels.percent_bucket(prob_groupby['meanAnswerRate']) # 문제 평균 정답률을 이용한 난이도 정의
         merged['ass_mean'] = merged['assessmentItemID'].map(prob_groupby['ass_mean']) # merged mapping
         test_tmp['ass_mean'] = test_tmp['assessmentItemID'].map(prob_groupby['ass_mean']) # test_tmp mapping
         test_last_sequence['ass_mean'] = test_last_sequence['assessmentItemID'].map(prob_groupby['ass_mean']) # test_last_sequence mapping
@@ -2732,12 +2637,12 @@ class FE15(FeatureEngineer):
             'answerCode': percentile
         })
         test_groupby.columns = ['numUsers', 'meanAnswerRate'] # groupby 집계, numUsers : 문제를 푼 유저는 몇명인지
-        test_groupby['test_grade'] = test_groupby['meanAnswerRate'].apply(grade_map) # 문제 평균 정답률을 이용한 난이도 정의
+        test_groupby['test_grade'] = kernels.grade(test_groupby['meanAnswerRate']) # 문제 평균 정답률을 이용한 난이도 정의
         merged['test_grade'] = merged['testId'].map(test_groupby['test_grade']) # merged mapping
         test_tmp['test_grade'] = test_tmp['testId'].map(test_groupby['test_grade']) # test_tmp mapping
         test_last_sequence['test_grade'] = test_last_sequence['testId'].map(test_groupby['test_grade']) # test_last_sequence mapping
 
-        test_groupby['test_mean'] = test_groupby['meanAnswerRate'].apply(cate_map) # 문제 평균 정답률을 이용한 난이도 정의
+        test_groupby['test_mean'] = kernels.percent_bucket(test_groupby['meanAnswerRate']) # 문제 평균 정답률을 이용한 난이도 정의
         merged['test_mean'] = merged['testId'].map(test_groupby['test_mean']) # merged mapping
         test_tmp['test_mean'] = test_tmp['testId'].map(test_groupby['test_mean']) # test_tmp mapping
         test_last_sequence['test_mean'] = test_last_sequence['testId'].map(test_groupby['test_mean']) # test_last_sequence mapping
@@ -2753,9 +2658,9 @@ class FE15(FeatureEngineer):
 
         # FE04 에서 maxprob feature 추가하는 방법 참고
         # 각 시험 속 문항번호를 수치형으로 만들어 추가한다.
-        merged['probnum'] = merged['assessmentItemID'].apply(lambda x: int(x[-3:]))
-        test_tmp['probnum'] = test_tmp['assessmentItemID'].apply(lambda x: int(x[-3:]))
-        test_last_sequence['probnum'] =test_last_sequence['assessmentItemID'].apply(lambda x: int(x[-3:]))
+        merged['probnum'] = kernels.last_digits(merged['assessmentItemID'])
+        test_tmp['probnum'] = kernels.last_digits(test_tmp['assessmentItemID'])
+        test_last_sequence['probnum'] =kernels.last_digits(test_last_sequence['assessmentItemID'])
 
         # 위 번호를 토대로 각 시험의 최종 문항을 피쳐로 추가한다.
         merged_tmp = merged.groupby('testId')
@@ -2772,16 +2677,8 @@ class FE15(FeatureEngineer):
         # - 보통 시험의 마지막 문제는 elapsed가 0이다. (그 문제를 풀고 끝나기 때문에, 얼마나 걸렸는지 알 수가 없고, 그렇기 때문에 그 값을 0으로 대치하는 느낌)
         # - **이 값들을 효과적으로 대치할 수 있으면, test_last_sequence에 elapsed를 효과적으로 전달할 수 있기 때문에 미리 진행**
         # - 우선 merged에서, 시간이 900초 이상 (15분 이상)소요된 풀이시간은 모두 900초로 대치해주자 (대략 31421건)
-        merged['elapsed'] = merged['elapsed'].apply(lambda x : 900 if x > 900 else x)
-
         # - elapsed가 0이 아닌것과 0인것을 나눠서 일단 쪼개고 (인덱스는 건들지 말자), elapsed가 0인 data frame에 유저별 문제풀이 시간의 중앙값으로 대치하고 다시 합쳐주자
-        # - 합칠때는 concat으로 위아래로 붙인다음에 index 기준 정렬
-        merged_elapsed_not0 = merged[merged.elapsed != 0]
-        merged_elapsed_0 = merged[merged.elapsed == 0]
-        merged_elapsed_0['elapsed'] = merged_elapsed_0['userID'].map(merged.groupby('userID')['elapsed'].median())
-
-        merged = pd.concat([merged_elapsed_not0,merged_elapsed_0], axis=0)
-        merged = merged.sort_index()
+        self.add_block(merged, elapsed_fill_block)
         
         # - 이제 test_last_sequence에 있는 elapsed가 0인 애들은, 다른 사람들은 그 문제를 푸는데 얼마나 걸렸는지를 기준으로 대치할 수 있게 되었다
         test_last_sequence['elapsed'] = test_last_sequence['assessmentItemID'].map(merged.groupby('assessmentItemID')['elapsed'].median())
@@ -2792,13 +2689,13 @@ class FE15(FeatureEngineer):
         test_df = pd.concat([test_tmp, test_last_sequence], axis=0).sort_index()
 
         # - 이제 elapsed가 잘 대치 되어있기 때문에, mark_randomly feature를 만들 수 있다.
-        merged['mark_randomly'] = merged['elapsed'].apply(lambda x: int((x>0) & (x<=5)))     # 걸린 시간이 1초에서 5초 사이는 평균 정답률이 너무 낮아서 찍은 걸로 간주
-        test_df['elapsed'] = test_df['elapsed'].apply(lambda x : 900 if x > 900 else x)
-        test_df['mark_randomly'] = test_df['elapsed'].apply(lambda x: int((x>0) & (x<=5)))     # 걸린 시간이 1초에서 5초 사이는 평균 정답률이 너무 낮아서 찍은 걸로 간주
+        merged['mark_randomly'] = kernels.between(merged['elapsed'], 0, 5)     # 걸린 시간이 1초에서 5초 사이는 평균 정답률이 너무 낮아서 찍은 걸로 간주
+        test_df['elapsed'] = kernels.clip_upper(test_df['elapsed'], 900)
+        test_df['mark_randomly'] = kernels.between(test_df['elapsed'], 0, 5)     # 걸린 시간이 1초에서 5초 사이는 평균 정답률이 너무 낮아서 찍은 걸로 간주
         
         # elapsed로 구간 범주화
-        merged['elapsed_c'] = merged['elapsed'].apply(elpased_map)
-        test_df['elapsed_c'] = test_df['elapsed'].apply(elpased_map)
+        merged['elapsed_c'] = kernels.elapsed_bucket(merged['elapsed'])
+        test_df['elapsed_c'] = kernels.elapsed_bucket(test_df['elapsed'])
         
         numeric_col.append('elapsed')
 
@@ -2851,8 +2748,9 @@ def main():
     if not os.path.exists(BASE_DATA_PATH):
         os.mkdir(BASE_DATA_PATH)
     
-    base_train_df = pd.read_csv(os.path.join(BASE_DATA_PATH, 'train_data.csv'), parse_dates=['Timestamp'])
-    base_test_df = pd.read_csv(os.path.join(BASE_DATA_PATH, 'test_data.csv'), parse_dates=['Timestamp'])
+    # Timestamp 파싱은 원본 csv 마다 한 번만 (.raw_cache 의 parquet 에서 읽음)
+    base_train_df = read_raw(os.path.join(BASE_DATA_PATH, 'train_data.csv'))
+    base_test_df = read_raw(os.path.join(BASE_DATA_PATH, 'test_data.csv'))
 
     # # 클래스 생성 후 여기에 번호대로 추가해주세요.
     # FE00(BASE_DATA_PATH, base_train_df, base_test_df).run()
@@ -2867,6 +2765,18 @@ def main():
     # FE09(BASE_DATA_PATH, base_train_df, base_test_df).run()
     FE10(BASE_DATA_PATH, base_train_df, base_test_df).run()
 
+    # 여러 클래스를 한 번에 만들 때는 프로세스 풀로 (base df 는 fork 로 공유)
+    # run_parallel([FE00, FE01, FE02, FE03, FE04, FE05, FE06, FE07, FE08, FE09, FE10, FE11, FE12, FE13, FE14, FE15],
+    #     BASE_DATA_PATH, base_train_df, base_test_df, n_jobs=8)
+
+    # 실시간 추론용 유저/문제/태그/시험지 집계 (새 풀이 기록은 store.update(row), 피쳐는 store.features(row))
+    # store = OnlineAggregates().fit(pd.concat([base_train_df, base_test_df]))
+    # store.snapshot(os.path.join(BASE_DATA_PATH, 'online_aggregates.pkl'))
+
+    # 메모리에 다 안 올라가는 로그는 userID 샤드 단위 streaming 모드로 (shard_* 가 구현된 클래스만)
+    # FE06(BASE_DATA_PATH, None, None).run_streaming(
+    #     os.path.join(BASE_DATA_PATH, 'train_data.csv'), os.path.join(BASE_DATA_PATH, 'test_data.csv'), n_shards=16)
+
 
 if __name__=='__main__':
     main()
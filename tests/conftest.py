@@ -0,0 +1,5 @@
+import os
+import sys
+
+# 저장소 루트 (preprocess.py, fe 패키지) 를 import 경로에
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,80 @@
+import os
+import sys
+from argparse import Namespace
+
+import numpy as np
+import pytest
+import torch
+
+pytest.importorskip('transformers') # dkt/src/model.py 가 BERT 를 import
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'dkt'))
+
+from src.model import SelfAttention6, SAKT
+from src.online import OnlineScorer
+
+
+MAX_LEN = 8
+ARGS = Namespace(
+    cate_num=3, cont_num=2, offset=40, offsets=[40], cate_emb_dim=8, cate_proj_dim=16, cont_proj_dim=16,
+    hidden_dim=32, attention_dim=24, ffnn_dim=32, n_heads=2, n_layers=2, drop_out=0.2,
+    max_seq_len=MAX_LEN, batch_size=4, device='cpu',
+)
+
+
+def stream(n_users=6, n_events=20, seed=0):
+    # 유저별 풀이 기록 (cate, cont, 정답 여부), window (MAX_LEN) 보다 길어서 cache 에서 오래된 풀이가 빠짐
+    rng = np.random.default_rng(seed)
+    cate = rng.integers(1, ARGS.offset, (n_users, n_events, ARGS.cate_num))
+    cont = rng.standard_normal((n_users, n_events, ARGS.cont_num)).astype(np.float32)
+    answer = rng.integers(0, 2, (n_users, n_events))
+    lengths = rng.integers(1, n_events + 1, n_users)
+    return cate, cont, answer, lengths
+
+
+def windows(cate, cont, answer, users, ends):
+    # 유저마다 ends 번째 풀이까지 마지막 MAX_LEN 개를 학습 배치처럼 왼쪽 패딩해서 한 배치로
+    B = len(users)
+    c = np.zeros((B, MAX_LEN, ARGS.cate_num), dtype=np.int64)
+    x = np.zeros((B, MAX_LEN, ARGS.cont_num), dtype=np.float32)
+    m = np.zeros((B, MAX_LEN), dtype=np.int64)
+    y = np.zeros((B, MAX_LEN), dtype=np.int64)
+    for row, (user, end) in enumerate(zip(users, ends)):
+        n = min(end, MAX_LEN)
+        c[row, MAX_LEN - n:], x[row, MAX_LEN - n:] = cate[user, end - n:end], cont[user, end - n:end]
+        m[row, MAX_LEN - n:], y[row, MAX_LEN - n:] = 1, answer[user, end - n:end]
+    return [torch.as_tensor(a) for a in (c, x, m, y)]
+
+
+def batch_prob(model, cate, cont, answer, users, ends):
+    with torch.no_grad():
+        out = model(*windows(cate, cont, answer, users, ends))
+    return torch.sigmoid(out[:, -1]).numpy()
+
+
+@pytest.mark.parametrize('cls', [SelfAttention6, SAKT])
+def test_step_matches_batched_forward(cls):
+    # 배치 안 행 위치와 상관없이 (batch > 2) window forward 의 마지막 값과 같아야 함
+    torch.manual_seed(0)
+    model = cls(ARGS).eval()
+    cate, cont, answer, lengths = stream()
+    scorer = OnlineScorer(model)
+    for t in range(lengths.max()):
+        users = [u for u in range(len(lengths)) if t < lengths[u]]
+        previous = answer[users, t - 1] if t > 0 else np.zeros(len(users), dtype=np.int64)
+        probs = scorer.score(users, cate[users, t], cont[users, t], previous)
+        expected = batch_prob(model, cate, cont, answer, users, [t + 1] * len(users))
+        np.testing.assert_allclose(probs, expected, atol=1e-5)
+
+
+@pytest.mark.parametrize('cls', [SelfAttention6, SAKT])
+def test_start_then_score(cls):
+    torch.manual_seed(0)
+    model = cls(ARGS).eval()
+    cate, cont, answer, lengths = stream()
+    users = list(range(len(lengths)))
+    scorer = OnlineScorer(model)
+    scorer.start(users, *windows(cate, cont, answer, users, lengths - 1)) # 마지막 풀이 전까지, 길이 1 유저는 빈 window
+    last = lengths - 1
+    previous = np.where(last > 0, answer[users, last - 1], 0)
+    probs = scorer.score(users, cate[users, last], cont[users, last], previous)
+    np.testing.assert_allclose(probs, batch_prob(model, cate, cont, answer, users, lengths), atol=1e-5)
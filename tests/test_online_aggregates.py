@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+
+from fe.online import OnlineAggregates
+
+
+def interactions(n=400, seed=0):
+    rng = np.random.default_rng(seed)
+    item = rng.integers(0, 30, n)
+    return pd.DataFrame({
+        'userID': rng.integers(0, 12, n),
+        'assessmentItemID': [f'A{i:03}' for i in item],
+        'KnowledgeTag': 7000 + item % 7,
+        'testId': [f'T{i % 5}' for i in item],
+        'answerCode': np.where(rng.random(n) < 0.05, -1, rng.integers(0, 2, n)),
+    })
+
+
+def test_update_matches_fit():
+    df = interactions()
+    fitted = OnlineAggregates().fit(df)
+
+    # 앞 절반으로 fit 하고 나머지는 한 행씩 update
+    store = OnlineAggregates().fit(df.iloc[:200])
+    for row in df.iloc[200:].to_dict('records'):
+        store.update(row)
+
+    assert store.stats == fitted.stats
+    assert store.total == fitted.total
+    pd.testing.assert_frame_equal(store.transform(df), fitted.transform(df))
+
+
+def test_features_match_transform():
+    df = interactions()
+    store = OnlineAggregates().fit(df.iloc[:300])
+    batch = store.transform(df)
+    for i, row in enumerate(df.to_dict('records')):
+        online = store.features(row)
+        for col in batch.columns:
+            expected = batch[col].iloc[i]
+            assert (pd.isna(expected) and pd.isna(online[col])) or expected == online[col], (i, col)
+
+
+def test_snapshot_round_trip(tmp_path):
+    df = interactions()
+    store = OnlineAggregates().fit(df)
+    store.snapshot(str(tmp_path / 'aggregates.pkl'))
+    loaded = OnlineAggregates.load(str(tmp_path / 'aggregates.pkl'))
+    assert loaded.stats == store.stats and loaded.total == store.total
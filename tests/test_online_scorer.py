@@ -0,0 +1,108 @@
+import os
+import sys
+from argparse import Namespace
+
+import numpy as np
+import pytest
+import torch
+
+pytest.importorskip('transformers') # dkt/src/model.py 가 BERT 를 import
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'dkt'))
+
+from src.model import LSTM, GRU
+from src.online import OnlineScorer
+
+
+MAX_LEN = 10
+ARGS = Namespace(
+    cate_num=3, cont_num=2, offset=40, cate_emb_dim=8, cate_proj_dim=16, cont_proj_dim=16,
+    hidden_dim=32, n_layers=2, drop_out=0.2, max_seq_len=MAX_LEN, device='cpu',
+)
+
+
+def stream(n_users=5, n_events=MAX_LEN, seed=0):
+    # 유저별 풀이 기록 (cate, cont), 유저마다 길이가 다름
+    rng = np.random.default_rng(seed)
+    cate = rng.integers(2, ARGS.offset, (n_users, n_events, ARGS.cate_num))
+    cont = rng.standard_normal((n_users, n_events, ARGS.cont_num)).astype(np.float32)
+    lengths = rng.integers(1, n_events + 1, n_users)
+    return cate, cont, lengths
+
+
+def window(cate, cont, user, end):
+    # 유저의 end 번째 풀이까지 마지막 MAX_LEN 개, 학습 배치와 같은 왼쪽 패딩
+    n = min(end, MAX_LEN)
+    c = np.zeros((1, MAX_LEN, ARGS.cate_num), dtype=np.int64)
+    x = np.zeros((1, MAX_LEN, ARGS.cont_num), dtype=np.float32)
+    m = np.zeros((1, MAX_LEN), dtype=np.int64)
+    c[0, MAX_LEN - n:], x[0, MAX_LEN - n:], m[0, MAX_LEN - n:] = cate[user, end - n:end], cont[user, end - n:end], 1
+    return torch.as_tensor(c), torch.as_tensor(x), torch.as_tensor(m)
+
+
+def window_prob(model, cate, cont, user, end):
+    with torch.no_grad():
+        out = model(*window(cate, cont, user, end), None)
+    return torch.sigmoid(out.reshape(-1)[-1]).item()
+
+
+@pytest.mark.parametrize('cls', [LSTM, GRU])
+def test_step_matches_window_forward(cls):
+    torch.manual_seed(0)
+    model = cls(ARGS).eval()
+    cate, cont, lengths = stream()
+    scorer = OnlineScorer(model)
+    for t in range(cate.shape[1]):
+        users = [u for u in range(len(lengths)) if t < lengths[u]]
+        probs = scorer.score(users, cate[users, t], cont[users, t])
+        expected = [window_prob(model, cate, cont, u, t + 1) for u in users]
+        np.testing.assert_allclose(probs, expected, atol=1e-6)
+
+
+@pytest.mark.parametrize('cls', [LSTM, GRU])
+def test_start_then_score(cls):
+    torch.manual_seed(0)
+    model = cls(ARGS).eval()
+    cate, cont, lengths = stream()
+    users = list(range(len(lengths)))
+    history = [window(cate, cont, u, lengths[u] - 1) for u in users] # 마지막 풀이 전까지, 길이 1 유저는 빈 window
+    scorer = OnlineScorer(model)
+    scorer.start(users, *[torch.cat(parts) for parts in zip(*history)])
+    last = lengths - 1
+    probs = scorer.score(users, cate[users, last], cont[users, last])
+    np.testing.assert_allclose(probs, [window_prob(model, cate, cont, u, lengths[u]) for u in users], atol=1e-6)
+
+
+def test_snapshot_round_trip(tmp_path):
+    torch.manual_seed(0)
+    model = LSTM(ARGS).eval()
+    cate, cont, _ = stream()
+    scorer = OnlineScorer(model)
+    for t in range(3):
+        scorer.score([10, 20, 30], cate[:3, t], cont[:3, t])
+
+    scorer.snapshot(str(tmp_path / 'scorer.pkl'))
+    loaded = OnlineScorer.load(str(tmp_path / 'scorer.pkl'), model)
+    assert loaded.slots == scorer.slots
+    np.testing.assert_array_equal(
+        loaded.score([30, 10, 40], cate[:3, 3], cont[:3, 3], commit=False),
+        scorer.score([30, 10, 40], cate[:3, 3], cont[:3, 3], commit=False),
+    )
+
+
+def test_commit_false_and_reset():
+    torch.manual_seed(0)
+    model = GRU(ARGS).eval()
+    cate, cont, _ = stream()
+    scorer = OnlineScorer(model)
+    first = scorer.score([1, 2], cate[:2, 0], cont[:2, 0], commit=False)
+    np.testing.assert_array_equal(scorer.score([1, 2], cate[:2, 0], cont[:2, 0]), first) # commit=False 는 state 를 안 바꿈
+    assert not np.allclose(scorer.score([1, 2], cate[:2, 0], cont[:2, 0], commit=False), first)
+    scorer.reset([1, 2])
+    np.testing.assert_array_equal(scorer.score([1, 2], cate[:2, 0], cont[:2, 0]), first)
+
+
+def test_duplicate_users_rejected():
+    scorer = OnlineScorer(LSTM(ARGS))
+    cate, cont, _ = stream()
+    with pytest.raises(ValueError):
+        scorer.score([1, 1], cate[:2, 0], cont[:2, 0])
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+
+from fe.sequences import PackedSequences, gather_padded
+
+
+MAX_LEN = 8
+
+
+def logs(n=300, seed=0):
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame({
+        'userID': rng.integers(0, 25, n),
+        'assessmentItemID': rng.integers(2, 50, n),
+        'elapsed': rng.random(n).astype(np.float32),
+        'answerCode': rng.integers(0, 2, n),
+    })
+    return df.sample(frac=1, random_state=0).reset_index(drop=True) # userID 순서가 아니어도 됨
+
+
+def pandas_windows(df, cols, max_len):
+    # 예전 방식: groupby(userID).apply 로 유저별 시퀀스를 만들고 마지막 max_len 개를 왼쪽 패딩
+    group = df.groupby('userID').apply(lambda r: tuple(r[col].values for col in cols))
+    out, masks = [], []
+    for seqs in group.values:
+        n = min(len(seqs[0]), max_len)
+        window = np.zeros((max_len, len(cols)))
+        window[max_len - n:] = np.stack([seq[-n:] for seq in seqs], axis=1)
+        mask = np.zeros(max_len, dtype=bool)
+        mask[max_len - n:] = True
+        out.append(window)
+        masks.append(mask)
+    return group.index.values, np.stack(out), np.stack(masks)
+
+
+def test_last_window_matches_pandas_grouping():
+    df = logs()
+    cols = ['assessmentItemID', 'elapsed', 'answerCode']
+    data = PackedSequences.from_frame(df)
+    users, expected, expected_mask = pandas_windows(df, cols, MAX_LEN)
+
+    index = np.arange(len(data))
+    pos, mask = data.last_window(index, MAX_LEN)
+    out = gather_padded(data.matrix(cols, np.float64), pos, mask)
+
+    np.testing.assert_array_equal(data.users, users)
+    np.testing.assert_array_equal(mask, expected_mask)
+    np.testing.assert_allclose(out, expected)
+
+
+def test_window_matches_truncated_frame():
+    # ends 를 유저 중간으로 주면, 그 앞까지 자른 데이터의 last_window 와 같음
+    df = logs()
+    data = PackedSequences.from_frame(df)
+    index = np.arange(len(data))
+    ends = data.starts + (data.lengths() + 1) // 2
+    pos, mask = data.window(index, ends, MAX_LEN)
+
+    order = df.groupby('userID').cumcount()
+    half = df[order < df.groupby('userID')['userID'].transform('size').add(1) // 2]
+    _, expected, expected_mask = pandas_windows(half, ['assessmentItemID'], MAX_LEN)
+
+    np.testing.assert_array_equal(mask, expected_mask)
+    np.testing.assert_array_equal(gather_padded(data.values['assessmentItemID'], pos, mask), expected[:, :, 0])
+
+
+def test_sliding_windows_cover_every_row():
+    data = PackedSequences.from_frame(logs())
+    users, ends = data.sliding_windows(MAX_LEN, stride=3)
+    pos, mask = data.window(users, ends, MAX_LEN)
+    covered = np.zeros(len(data.values['answerCode']), dtype=bool)
+    covered[pos[mask]] = True
+    assert covered.all()
+    assert (mask.sum(1) == np.minimum(data.lengths()[users], MAX_LEN)).all()
+
+
+def test_subset_shares_values():
+    data = PackedSequences.from_frame(logs())
+    part = data.subset([3, 1])
+    assert part.values is data.values
+    np.testing.assert_array_equal(part.column(0, 'answerCode'), data.column(3, 'answerCode'))
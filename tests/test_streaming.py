@@ -0,0 +1,106 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+import preprocess
+from fe.ingest import read_raw
+from fe.streaming import ShardWriter
+
+
+def raw_logs(users, rows_per_user=6, seed=0):
+    rng = np.random.default_rng(seed)
+    rows = []
+    for user in users:
+        start = pd.Timestamp('2020-01-01') + pd.Timedelta(days=int(user))
+        for i in range(rows_per_user):
+            item = int(rng.integers(1, 4))
+            rows.append({
+                'userID': user,
+                'assessmentItemID': f'A06000{item}00{i % 3}',
+                'testId': f'A06000000{item}',
+                'answerCode': int(rng.integers(0, 2)),
+                'Timestamp': start + pd.Timedelta(seconds=30 * i),
+                'KnowledgeTag': 7000 + item,
+            })
+    return pd.DataFrame(rows)
+
+
+def test_shard_writer_skips_empty_parts(tmp_path):
+    df = raw_logs([0, 1])
+    writer = ShardWriter(str(tmp_path / 'out'))
+    writer.write(df)
+    writer.write(pd.DataFrame(columns=df.columns).astype(df.dtypes))
+    writer.close()
+    pd.testing.assert_frame_equal(pd.read_parquet(tmp_path / 'out.parquet'), df)
+
+
+def test_run_streaming_with_train_only_user(tmp_path, monkeypatch):
+    # 유저 9 는 train 에만 있어서 마지막 샤드의 test 가 비어 있음
+    monkeypatch.setattr(preprocess, 'BASE_DATA_PATH', str(tmp_path))
+    train, test = raw_logs([1, 2, 3, 9]), raw_logs([1, 2, 3])
+    test.loc[test.groupby('userID').tail(1).index, 'answerCode'] = -1
+    train.to_csv(tmp_path / 'train_data.csv', index=False)
+    test.to_csv(tmp_path / 'test_data.csv', index=False)
+
+    preprocess.FE06(str(tmp_path), None, None, use_cache=False, profile=False).run_streaming(
+        str(tmp_path / 'train_data.csv'), str(tmp_path / 'test_data.csv'), n_shards=4
+    )
+
+    for name in ['train_data', 'test_data', 'le_train_data', 'le_test_data']:
+        df = pd.read_parquet(tmp_path / 'FE06' / f'{name}.parquet')
+        assert len(df) > 0
+    assert 9 in set(pd.read_parquet(tmp_path / 'FE06' / 'train_data.parquet')['userID'])
+    assert 9 not in set(pd.read_parquet(tmp_path / 'FE06' / 'test_data.parquet')['userID'])
+
+
+def test_run_streaming_matches_run(tmp_path, monkeypatch):
+    # streaming 모드 (샤드 여러 개) 결과는 run() 결과와 같아야 함
+    train, test = raw_logs([1, 2, 3, 5, 8, 9], seed=1), raw_logs([1, 2, 3, 5, 8], seed=2)
+    test.loc[test.groupby('userID').tail(1).index, 'answerCode'] = -1
+    for mode in ['batch', 'stream']:
+        base = tmp_path / mode
+        base.mkdir()
+        train.to_csv(base / 'train_data.csv', index=False)
+        test.to_csv(base / 'test_data.csv', index=False)
+        monkeypatch.setattr(preprocess, 'BASE_DATA_PATH', str(base))
+        if mode == 'batch':
+            preprocess.FE06(
+                str(base), read_raw(str(base / 'train_data.csv')), read_raw(str(base / 'test_data.csv')), use_cache=False, profile=False
+            ).run()
+        else:
+            preprocess.FE06(str(base), None, None, use_cache=False, profile=False).run_streaming(
+                str(base / 'train_data.csv'), str(base / 'test_data.csv'), n_shards=3
+            )
+
+    for name in ['train_data', 'test_data', 'le_train_data', 'le_test_data']:
+        pd.testing.assert_frame_equal(
+            pd.read_parquet(tmp_path / 'stream' / 'FE06' / f'{name}.parquet'),
+            pd.read_parquet(tmp_path / 'batch' / 'FE06' / f'{name}.parquet'),
+            obj=name,
+        )
+    with open(tmp_path / 'stream' / 'FE06' / 'vocab.json') as f, open(tmp_path / 'batch' / 'FE06' / 'vocab.json') as g:
+        assert json.load(f) == json.load(g)
+
+
+def test_run_streaming_requires_shard_methods(tmp_path):
+    fe = preprocess.FE05(str(tmp_path), None, None, use_cache=False, profile=False)
+    try:
+        fe.run_streaming(str(tmp_path / 'train_data.csv'), str(tmp_path / 'test_data.csv'))
+    except NotImplementedError as e:
+        assert 'FE05' in str(e)
+    else:
+        raise AssertionError('FE05 는 streaming 모드를 지원하지 않음')
+
+
+def test_run_removes_other_format(tmp_path, monkeypatch):
+    # 로더는 parquet 이 있으면 parquet 을 읽으므로 csv 로 다시 저장하면 이전 parquet 이 남으면 안 됨
+    monkeypatch.setattr(preprocess, 'BASE_DATA_PATH', str(tmp_path))
+    train, test = raw_logs([1, 2, 3]), raw_logs([4, 5])
+    for file_format in ['parquet', 'csv']:
+        preprocess.FE06(str(tmp_path), train.copy(), test.copy(), file_format=file_format, use_cache=False, profile=False).run()
+
+    for name in ['train_data', 'test_data', 'le_train_data', 'le_test_data']:
+        assert os.path.isfile(tmp_path / 'FE06' / f'{name}.csv')
+        assert not os.path.exists(tmp_path / 'FE06' / f'{name}.parquet')
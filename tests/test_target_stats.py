@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+
+from fe.target_stats import expanding_target_stats, DEFAULT_KEYS
+
+
+def interactions(n=300, seed=0):
+    # 시각을 분 단위 몇 개로만 뽑아서 같은 시각 풀이가 많음
+    rng = np.random.default_rng(seed)
+    item = rng.integers(0, 20, n)
+    return pd.DataFrame({
+        'userID': rng.integers(0, 8, n),
+        'assessmentItemID': [f'A{i:03}' for i in item],
+        'KnowledgeTag': 7000 + item % 5,
+        'testId': [f'T{i % 4}' for i in item],
+        'answerCode': np.where(rng.random(n) < 0.05, -1, rng.integers(0, 2, n)),
+        'Timestamp': pd.Timestamp('2020-01-01') + pd.to_timedelta(rng.integers(0, 40, n), unit='min'),
+    })
+
+
+def test_same_timestamp_is_not_earlier():
+    df = pd.DataFrame({
+        'userID': [1, 2, 2],
+        'assessmentItemID': ['A', 'A', 'A'],
+        'KnowledgeTag': [1, 1, 1],
+        'testId': ['T', 'T', 'T'],
+        'answerCode': [1, 0, 1],
+        'Timestamp': pd.to_datetime(['2020-01-01 00:00:00', '2020-01-01 00:00:00', '2020-01-01 00:00:01']),
+    })
+    stats = expanding_target_stats(df)
+    # 같은 시각인 다른 유저의 정답은 집계에 들어가지 않음
+    assert stats['item_correct'].tolist() == [0, 0, 1]
+    assert stats['item_attempts'].tolist() == [0, 0, 2]
+    assert stats['user_attempts'].tolist() == [0, 0, 1]
+
+
+def test_matches_strictly_earlier_rows():
+    df = interactions()
+    stats = expanding_target_stats(df, smoothing=10, prior=0.5)
+    labeled = df['answerCode'] >= 0
+    for name, cols in DEFAULT_KEYS.items():
+        for i in range(len(df)):
+            earlier = (df['Timestamp'] < df['Timestamp'].iloc[i]) & labeled
+            for col in cols:
+                earlier &= df[col] == df[col].iloc[i]
+            correct, attempts = df.loc[earlier, 'answerCode'].sum(), earlier.sum()
+            assert stats[f'{name}_correct'].iloc[i] == correct, (name, i)
+            assert stats[f'{name}_attempts'].iloc[i] == attempts, (name, i)
+            assert np.isclose(stats[f'{name}_rate'].iloc[i], (correct + 10 * 0.5) / (attempts + 10))
+
+
+def test_row_order_without_time_col():
+    df = interactions(50)
+    stats = expanding_target_stats(df, {'user': ['userID']}, time_col=None)
+    y = df['answerCode'].clip(lower=0)
+    expected = y.groupby(df['userID']).cumsum() - y
+    np.testing.assert_array_equal(stats['user_correct'].values, expected.values)
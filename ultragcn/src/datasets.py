@@ -48,11 +48,18 @@ def prepare_dataset(device, params):
     return constraint_mat, ii_constraint_mat, ii_neighbor_mat, train_loader, valid_loader, pos_edges, neg_edges, valid_label, params
 
 
+def load_frame(data_dir, name):
+    # parquet 이 있으면 parquet, 없으면 csv
+    path = os.path.join(data_dir, name)
+    if os.path.exists(path + ".parquet"):
+        return pd.read_parquet(path + ".parquet")
+    return pd.read_csv(path + ".csv")
+
+
 def load_data(basepath, fe_num):
-    path1 = os.path.join(basepath, f"FE{fe_num}", "train_data.csv")
-    path2 = os.path.join(basepath, f"FE{fe_num}", "test_data.csv")
-    train = pd.read_csv(path1) # merged_train
-    test = pd.read_csv(path2)
+    data_dir = os.path.join(basepath, f"FE{fe_num}")
+    train = load_frame(data_dir, "train_data") # merged_train
+    test = load_frame(data_dir, "test_data")
 
     train.drop_duplicates(
         subset=["userID", "assessmentItemID_c"], keep="last", inplace=True